@@ -1,57 +1,120 @@
 #!/usr/bin/env python3
+import time
 import argparse
+import asyncio
 import json
 from datetime import datetime, timedelta
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue, Range
+from qdrant_client import models
+from storage_backend import create_client, create_async_client, default_location
+from payload_schema import build_filter, decode_results, level_name, to_epoch_ms
+from query_cache import QueryResultCache
+from log_context import fetch_context
+from diversify import group_key, mmr_rerank
+from fanout_search import fanout_search
+from log_aggregations import LogAggregator, facet_field
+from embedders import EmbedderRegistry
+from projection import ProjectionRegistry
+from bulk_load import IndexingTail, tail_search, tail_parts, merge_hits, merge_groups
 
 class AdvancedLogSearchClient:
-    def __init__(self, host="localhost", port=6333):
-        self.client = QdrantClient(host=host, port=port)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, host=None, port=6333, client=None, model=None, cache=True):
+        self.client = client or create_client(host, port)
+        # model - эмбеддер для коллекций с моделью по умолчанию (остальные - по semlog-meta)
+        self.models = EmbedderRegistry(self.client, default=model)
+        # cache=False - каждый запрос идет в хранилище (бенчмарки)
+        self.cache = QueryResultCache(self.client) if cache else None
+        self.projections = ProjectionRegistry(self.client)
+        self.tail = IndexingTail(self.client)  # коллекции в bulk-load: хвост - точным поиском
+    
+    def _search_filter(self, level=None, source=None, hours=None, until=None):
+        """Окно времени: hours часов до until (epoch ms, по умолчанию - до "сейчас")"""
+        end = until if until is not None else int(time.time() * 1000)
+        since = end - int(hours * 3600 * 1000) if hours else None
+        return build_filter(level=level, source=source, since=since, until=until)
+    
+    def _embed(self, query, collection_name):
+        """Вектор запроса моделью коллекции; для коллекции с PCA проекцией - спроецированный"""
+        model = self.models.get(collection_name)
+        if self.cache is not None:
+            vector = self.cache.embed(model, query)
+        else:
+            vector = model.encode(query).tolist()
+        return self.projections.project(collection_name, vector)
     
     def search_logs(self, query, collection_name="universal-logs", 
-                   limit=10, min_score=0.3, level=None, source=None, hours=None):
-        """Расширенный поиск с фильтрами по времени"""
+                   limit=10, min_score=0.3, level=None, source=None, hours=None, until=None):
+        """Расширенный поиск с фильтрами по времени
+
+        until - конец окна (datetime/ISO/epoch ms); окно, закрытое в прошлом,
+        кэшируется надолго - новые точки в него уже не попадают.
+        """
+        until = to_epoch_ms(until) if until is not None else None
         
         # Строим фильтры
-        filter_conditions = []
-        
-        if level:
-            filter_conditions.append(
-                FieldCondition(key="level", match=MatchValue(value=level))
-            )
-        
-        if source:
-            filter_conditions.append(
-                FieldCondition(key="source", match=MatchValue(value=source))
-            )
+        search_filter = self._search_filter(level, source, hours, until)
         
-        if hours:
-            time_threshold = (datetime.now() - timedelta(hours=hours)).isoformat()
-            filter_conditions.append(
-                FieldCondition(
-                    key="timestamp",
-                    range=Range(gte=time_threshold)
-                )
+        # Повторный запрос с теми же параметрами - из кэша
+        query_vector = self._embed(query, collection_name)
+        if self.cache is not None:
+            key = self.cache.make_key(
+                collection_name, query_vector,
+                {"level": level, "source": source, "hours": hours, "until": until}, limit, min_score
             )
-        
-        search_filter = Filter(must=filter_conditions) if filter_conditions else None
-        
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
         # Поиск
-        query_vector = self.model.encode(query).tolist()
-        results = self.client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            query_filter=search_filter,
-            limit=limit,
-            with_payload=True,
-            score_threshold=min_score
+        results = tail_search(
+            self.client, collection_name, query_vector, search_filter, limit,
+            score_threshold=min_score, since=self.tail.since(collection_name)
         )
         
+        results = decode_results(results)
+        if self.cache is not None:
+            # Окно до "сейчас" открыто - живет до новых точек
+            self.cache.put(key, results, until=until / 1000 if until is not None else None)
         return results
     
+    def search_grouped(self, query, collection_name="universal-logs", group_by="source",
+                       group_size=3, limit=10, min_score=0.3, level=None, source=None, hours=None):
+        """Поиск с группировкой по payload полю: limit групп по group_size результатов"""
+        query_vector = self._embed(query, collection_name)
+        parts = tail_parts(self._search_filter(level, source, hours), self.tail.since(collection_name))
+        groups = merge_groups([
+            self.client.search_groups(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                group_by=group_key(group_by),
+                query_filter=part_filter,
+                search_params=params,
+                limit=limit,
+                group_size=group_size,
+                with_payload=True,
+                score_threshold=min_score
+            )
+            for part_filter, params in parts
+        ], limit, group_size)
+        return [(group.id, decode_results(group.hits)) for group in groups]
+    
+    def search_diverse(self, query, collection_name="universal-logs", limit=10, oversample=4,
+                       diversity=0.3, min_score=0.3, level=None, source=None, hours=None):
+        """MMR поверх limit * oversample кандидатов: меньше дубликатов одного сообщения"""
+        query_vector = self._embed(query, collection_name)
+        candidates = tail_search(
+            self.client, collection_name, query_vector, self._search_filter(level, source, hours),
+            limit * oversample, score_threshold=min_score,
+            since=self.tail.since(collection_name), with_vectors=True
+        )
+        results = mmr_rerank(query_vector, candidates, limit, diversity)
+        for result in results:
+            result.vector = None  # векторы нужны были только для MMR
+        return decode_results(results)
+    
+    def get_context(self, results, collection_name="universal-logs", before=20, after=20):
+        """Соседние события того же источника вокруг каждого результата"""
+        return fetch_context(self.client, collection_name, results, before=before, after=after)
+    
     def get_collection_stats(self, collection_name):
         """Статистика коллекции"""
         try:
@@ -67,33 +130,58 @@ class AdvancedLogSearchClient:
         except Exception as e:
             return {"error": str(e)}
     
-    def find_similar_logs(self, log_id, collection_name="universal-logs", limit=5):
-        """Поиск похожих логов по ID"""
+    def find_similar_logs(self, log_ids, collection_name="universal-logs", limit=5,
+                          negative_ids=None, level=None, source=None, hours=None):
+        """Логи, похожие на указанные ID (и непохожие на negative_ids) - recommend на сервере"""
+        positive = [log_ids] if isinstance(log_ids, int) else list(log_ids)
         try:
-            # Получаем вектор по ID
-            points = self.client.retrieve(
-                collection_name=collection_name,
-                ids=[log_id],
-                with_vectors=True
-            )
-            
-            if not points:
-                return []
-            
-            point = points[0]
-            similar_results = self.client.search(
-                collection_name=collection_name,
-                query_vector=point.vector,
-                limit=limit + 1,  # +1 потому что найдет сам себя
+            # Векторы не покидают Qdrant, сами примеры исключаются сервером
+            parts = tail_parts(self._search_filter(level, source, hours),
+                               self.tail.since(collection_name))
+            results = merge_hits([
+                self.client.recommend(
+                    collection_name=collection_name,
+                    positive=positive,
+                    negative=list(negative_ids or []),
+                    query_filter=part_filter,
+                    search_params=params,
+                    limit=limit,
+                    with_payload=True
+                )
+                for part_filter, params in parts
+            ], limit)
+            return decode_results(results)
+        except Exception as e:
+            print(f"❌ Ошибка: {e}")
+            return []
+    
+    def find_similar_batch(self, log_ids, collection_name="universal-logs", limit=5,
+                           negative_ids=None, level=None, source=None, hours=None):
+        """Похожие для каждого ID отдельно - один recommend_batch на все ID"""
+        parts = tail_parts(self._search_filter(level, source, hours), self.tail.since(collection_name))
+        # На каждый ID - запрос на каждую часть коллекции (индекс / хвост bulk-load)
+        requests = [
+            models.RecommendRequest(
+                positive=[log_id],
+                negative=list(negative_ids or []),
+                filter=part_filter,
+                params=params,
+                limit=limit,
                 with_payload=True
             )
-            
-            # Исключаем исходный лог из результатов
-            return [r for r in similar_results if r.id != log_id]
-            
+            for log_id in log_ids
+            for part_filter, params in parts
+        ]
+        try:
+            responses = self.client.recommend_batch(collection_name=collection_name, requests=requests)
+            n = len(parts)
+            return {
+                log_id: decode_results(merge_hits(responses[i * n:(i + 1) * n], limit))
+                for i, log_id in enumerate(log_ids)
+            }
         except Exception as e:
             print(f"❌ Ошибка: {e}")
-            return []
+            return {}
     
     def export_results(self, results, filename="search_results.json"):
         """Экспорт результатов в JSON"""
@@ -110,6 +198,46 @@ class AdvancedLogSearchClient:
         
         print(f"✅ Результаты экспортированы в {filename}")
 
+def print_histogram(report, width=40):
+    """Гистограмма корзин полосами + топ значений разбивки в каждой корзине"""
+    peak = max((item["count"] for item in report["buckets"]), default=0) or 1
+    print(f"\n📈 {report['collection']}: {report['total']} событий, "
+          f"корзина {report['bucket']} сек" +
+          (f", разбивка по {report['group_by']}" if report["group_by"] else ""))
+    print("=" * 80)
+    for item in report["buckets"]:
+        label = datetime.fromtimestamp(item["start"] / 1000).strftime("%m-%d %H:%M:%S")
+        bar = "█" * round(item["count"] / peak * width)
+        groups = " ".join(f"{value}:{count}" for value, count in list(item["groups"].items())[:3])
+        print(f"{label} {item['count']:>7} {bar:<{width}} {groups}")
+    if report["groups"]:
+        print("-" * 80)
+        for value, count in report["groups"].items():
+            print(f"   {value}: {count}")
+    stats = report["stats"]
+    print(f"⏱️  {stats['elapsed_ms']:.1f} ms: {stats['buckets']} корзин, "
+          f"{stats['cached']} из кэша, {stats['queries']} запросов count/facet")
+
+async def run_histogram(args):
+    """--histogram: один агрегатор на весь --watch, закрытые корзины берутся из кэша"""
+    aggregator = LogAggregator(create_async_client(args.location))
+    try:
+        while True:
+            since = datetime.now() - timedelta(hours=args.hours or 6)
+            report = await aggregator.histogram(
+                args.collection, since, bucket=args.bucket, level=args.level,
+                source=args.source, group_by=args.group_by
+            )
+            print_histogram(report)
+            if args.export:
+                with open(args.export, "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+            if not args.watch:
+                return report
+            await asyncio.sleep(args.watch)
+    finally:
+        await aggregator.close()
+
 def main():
     parser = argparse.ArgumentParser(description="Qdrant Log Search Client")
     parser.add_argument("query", nargs="?", help="Поисковый запрос")
@@ -121,16 +249,60 @@ def main():
                        help="Фильтр по уровню")
     parser.add_argument("--source", help="Фильтр по источнику")
     parser.add_argument("--hours", type=int, help="Фильтр по времени (последние N часов)")
+    parser.add_argument("--until",
+                       help="Конец окна (ISO время): --hours считаются до него; "
+                            "результаты по окну в прошлом кэшируются дольше")
     parser.add_argument("--min-score", type=float, default=0.3,
                        help="Минимальная схожесть")
     parser.add_argument("--stats", action="store_true", 
                        help="Показать статистику коллекции")
-    parser.add_argument("--similar-to", type=int, 
-                       help="Найти похожие на лог с указанным ID")
+    parser.add_argument("--similar-to", type=int, nargs="+",
+                       help="Найти похожие на логи с указанными ID")
+    parser.add_argument("--not-like", type=int, nargs="+",
+                       help="ID логов-антипримеров для --similar-to")
+    parser.add_argument("--each", action="store_true",
+                       help="С --similar-to: похожие для каждого ID отдельно (один batch запрос)")
+    parser.add_argument("--collections", nargs="+",
+                       help="Искать сразу в нескольких коллекциях: glob шаблоны/список через запятую")
+    parser.add_argument("--aliases", nargs="+",
+                       help="Искать в коллекциях за алиасами, подходящими под шаблоны")
+    parser.add_argument("--timeout", type=float, default=2.0,
+                       help="Таймаут поиска в одной коллекции для --collections/--aliases, сек")
+    parser.add_argument("--group-by",
+                       help="Группировать результаты: source, template, level или любое payload поле")
+    parser.add_argument("--group-size", type=int, default=3, help="Результатов в группе")
+    parser.add_argument("--diverse", action="store_true",
+                       help="MMR: разнообразные результаты вместо дубликатов")
+    parser.add_argument("--diversity", type=float, default=0.3,
+                       help="Вес разнообразия для --diverse (0 - только релевантность)")
+    parser.add_argument("--context", "-C", type=int, default=0,
+                       help="Показать N событий до и после каждого результата (тот же источник)")
+    parser.add_argument("--histogram", action="store_true",
+                       help="Гистограмма событий по времени (count/facet, без выгрузки точек); "
+                            "--hours (по умолчанию 6), --level/--source, --group-by source|level")
+    parser.add_argument("--bucket", type=int, default=60, help="Размер корзины для --histogram, сек")
+    parser.add_argument("--watch", type=float,
+                       help="С --histogram: перестраивать каждые N секунд")
     parser.add_argument("--export", help="Экспорт результатов в файл")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL, :memory: или embedded:/path (по умолчанию $QDRANT_HOST)")
     
     args = parser.parse_args()
-    client = AdvancedLogSearchClient()
+    if args.histogram:
+        # Разбивка гистограммы - только по индексированным полям (facet)
+        if args.group_by:
+            try:
+                facet_field(args.group_by)
+            except ValueError as e:
+                parser.error(f"--histogram --group-by: {e}")
+        # Только count/facet запросы - модель эмбеддингов не нужна
+        try:
+            asyncio.run(run_histogram(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    client = AdvancedLogSearchClient(args.location)
     
     if args.stats:
         # Показать статистику
@@ -140,12 +312,20 @@ def main():
         return
     
     if args.similar_to:
-        # Поиск похожих логов
-        results = client.find_similar_logs(args.similar_to, args.collection, args.limit)
-        print(f"🔍 Логи похожие на ID {args.similar_to}:")
-        for i, result in enumerate(results, 1):
-            print(f"{i}. [{result.payload.get('level')}] {result.payload.get('message')}")
-            print(f"   Схожесть: {result.score:.3f}, ID: {result.id}\n")
+        # Поиск похожих логов (фильтры --level/--source/--hours применяются)
+        filters = dict(negative_ids=args.not_like, level=args.level,
+                       source=args.source, hours=args.hours)
+        if args.each:
+            groups = client.find_similar_batch(args.similar_to, args.collection, args.limit, **filters)
+        else:
+            groups = {tuple(args.similar_to): client.find_similar_logs(
+                args.similar_to, args.collection, args.limit, **filters)}
+        for log_id, results in groups.items():
+            ids = ", ".join(map(str, log_id)) if isinstance(log_id, tuple) else log_id
+            print(f"🔍 Логи похожие на ID {ids}:")
+            for i, result in enumerate(results, 1):
+                print(f"{i}. [{result.payload.get('level')}] {result.payload.get('message')}")
+                print(f"   Схожесть: {result.score:.3f}, ID: {result.id}\n")
         return
     
     if not args.query:
@@ -153,16 +333,59 @@ def main():
         parser.print_help()
         return
     
+    filters = dict(min_score=args.min_score, level=args.level,
+                   source=args.source, hours=args.hours)
+    
+    if args.collections or args.aliases:
+        # Параллельный поиск по многим коллекциям с общим top-k
+        merged, reports = asyncio.run(fanout_search(
+            args.query, args.collections, args.aliases, args.location, client.models.load(),
+            args.timeout, limit=args.limit, **filters
+        ))
+        print(f"\n🔍 Результаты поиска: '{args.query}'")
+        print(f"📁 Коллекций: {len(reports)}")
+        for report in sorted(reports, key=lambda r: -r["latency_ms"]):
+            status = "✅" if report["status"] == "ok" else "⏱️ " if report["status"] == "timeout" else "❌"
+            print(f"   {status} {report['collection']}: {report['latency_ms']:.1f} ms, "
+                  f"{report['hits']} результатов {report.get('error', '')}")
+        print("=" * 80)
+        for i, (collection_name, result) in enumerate(merged, 1):
+            payload = result.payload
+            print(f"{i}. [{payload.get('level', 'UNKNOWN')}] {payload.get('message')}")
+            print(f"   📁 {collection_name} | 📍 {payload.get('source', 'unknown')} | 🕒 {payload.get('timestamp', 'N/A')}")
+            print(f"   🎯 Схожесть: {result.score:.3f} | 🆔 {result.id}")
+            print("-" * 60)
+        return
+    
+    if args.group_by:
+        # Группы вместо плоского top-k
+        groups = client.search_grouped(args.query, args.collection, args.group_by,
+                                       args.group_size, args.limit, **filters)
+        print(f"\n🔍 Результаты поиска: '{args.query}' (группы по {args.group_by})")
+        print(f"📊 Групп: {len(groups)}")
+        print("=" * 80)
+        for value, hits in groups:
+            if group_key(args.group_by) == "lvl":
+                value = level_name(value)
+            print(f"📦 {args.group_by}={value}")
+            for result in hits:
+                print(f"   [{result.payload.get('level')}] {result.payload.get('message')}")
+                print(f"   🎯 {result.score:.3f} | 📍 {result.payload.get('source')} | 🆔 {result.id}")
+            print("-" * 60)
+        return
+    
     # Выполняем поиск
-    results = client.search_logs(
-        query=args.query,
-        collection_name=args.collection,
-        limit=args.limit,
-        min_score=args.min_score,
-        level=args.level,
-        source=args.source,
-        hours=args.hours
-    )
+    if args.diverse:
+        results = client.search_diverse(args.query, args.collection, args.limit,
+                                        diversity=args.diversity, **filters)
+    else:
+        results = client.search_logs(
+            query=args.query,
+            collection_name=args.collection,
+            limit=args.limit,
+            until=args.until,
+            **filters
+        )
     
     # Вывод результатов
     print(f"\n🔍 Результаты поиска: '{args.query}'")
@@ -170,9 +393,17 @@ def main():
     print(f"📊 Найдено: {len(results)} результатов")
     print("=" * 80)
     
+    context = client.get_context(results, args.collection, args.context, args.context) \
+        if args.context and results else {}
+    
     for i, result in enumerate(results, 1):
         payload = result.payload
+        around = context.get(result.id, {})
+        for point in around.get("before", []):
+            print(f"   │ {point.payload.get('timestamp')} [{point.payload.get('level')}] {point.payload.get('message')}")
         print(f"{i}. [{payload.get('level', 'UNKNOWN')}] {payload.get('message')}")
+        for point in around.get("after", []):
+            print(f"   │ {point.payload.get('timestamp')} [{point.payload.get('level')}] {point.payload.get('message')}")
         print(f"   📍 {payload.get('source', 'unknown')} | 🕒 {payload.get('timestamp', 'N/A')}")
         print(f"   🎯 Схожесть: {result.score:.3f} | 🆔 {result.id}")
         print("-" * 60)
@@ -1,46 +1,47 @@
 #!/usr/bin/env python3
 import sys
 import json
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+import time
+from storage_backend import create_client
+from payload_schema import build_filter, decode_results
+from query_cache import QueryResultCache
+from embedders import embedder_for
+from projection import load_projection
+from bulk_load import IndexingTail, tail_search
 
 class LogSearchClient:
-    def __init__(self, host="localhost", port=6333, collection_name="universal-logs"):
-        self.client = QdrantClient(host=host, port=port)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, host=None, port=6333, collection_name="universal-logs"):
+        self.client = create_client(host, port)
+        self.model = embedder_for(self.client, collection_name)
         self.collection_name = collection_name
+        self.cache = QueryResultCache(self.client)
+        self.projection = load_projection(self.client, collection_name)
+        self.tail = IndexingTail(self.client)
     
     def semantic_search(self, query, limit=10, min_score=0.3, filters=None):
         """Семантический поиск по логам"""
-        # Преобразуем запрос в вектор
-        query_vector = self.model.encode(query).tolist()
+        # Преобразуем запрос в вектор (повторные запросы - из LRU)
+        query_vector = self.cache.embed(self.model, query)
+        if self.projection:
+            query_vector = self.projection.apply(query_vector).tolist()
+        key = self.cache.make_key(self.collection_name, query_vector, filters, limit, min_score)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         
         # Строим фильтр если указан
         search_filter = None
         if filters:
-            filter_conditions = []
-            if filters.get('level'):
-                filter_conditions.append(
-                    FieldCondition(key="level", match=MatchValue(value=filters['level']))
-                )
-            if filters.get('source'):
-                filter_conditions.append(
-                    FieldCondition(key="source", match=MatchValue(value=filters['source']))
-                )
-            if filter_conditions:
-                search_filter = Filter(must=filter_conditions)
+            search_filter = build_filter(level=filters.get('level'), source=filters.get('source'))
         
         # Выполняем поиск
-        results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            query_filter=search_filter,
-            limit=limit,
-            with_payload=True,
-            score_threshold=min_score
+        results = tail_search(
+            self.client, self.collection_name, query_vector, search_filter, limit,
+            score_threshold=min_score, since=self.tail.since(self.collection_name)
         )
         
+        results = decode_results(results)
+        self.cache.put(key, results)
         return results
     
     def print_results(self, results, query):
@@ -103,8 +104,11 @@ class LogSearchClient:
                     filters['source'] = source_filter
                 
                 # Выполняем поиск
+                start = time.perf_counter()
                 results = self.semantic_search(query, limit=8, filters=filters if filters else None)
                 self.print_results(results, query)
+                source = "кэш" if self.cache.last_hit else "поиск"
+                print(f"⏱️  {(time.perf_counter() - start) * 1000:.1f} ms ({source})")
                 
             except KeyboardInterrupt:
                 print("\n👋 До свидания!")
@@ -0,0 +1,6 @@
+# benchmarks - Воспроизводимые бенчмарки ингеста и поиска
+#
+# Запуск из каталога processor/:
+#   python3 -m benchmarks ingest --lines 20000 --location :memory:
+#   python3 -m benchmarks search --location :memory: --queries 200
+#   python3 -m benchmarks parser --lines 50000
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# python3 -m benchmarks {ingest,search} - запуск бенчмарков
+import argparse
+from benchmarks.results import write_results
+from benchmarks.ingest_bench import run_ingest
+from benchmarks.search_bench import run_search, run_cached, search_client_for
+from benchmarks.parser_bench import run_parser
+
+def main():
+    parser = argparse.ArgumentParser(description="semlog benchmarks")
+    parser.add_argument("suite", choices=["ingest", "search", "parser"])
+    parser.add_argument("--location", default=":memory:",
+                       help="Адрес Qdrant или :memory:")
+    parser.add_argument("--lines", type=int, default=10000, help="Объем синтетических логов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cardinality", type=int, default=1000,
+                       help="Число различных значений в шаблонах")
+    parser.add_argument("--batch-size", type=int, default=15)
+    parser.add_argument("--queries", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--output-dir", default="bench_results")
+    args = parser.parse_args()
+
+    params = vars(args).copy()
+
+    if args.suite == "parser":
+        results = run_parser(args.lines, seed=args.seed, cardinality=args.cardinality)
+        write_results("parser", params, results, args.output_dir)
+        return
+
+    if args.suite == "ingest":
+        results, _ = run_ingest(args.lines, args.location, seed=args.seed,
+                                cardinality=args.cardinality, batch_size=args.batch_size)
+        write_results("ingest", params, results, args.output_dir)
+        return
+
+    # search: сначала наполняем коллекцию, затем меряем запросы
+    ingest, processor = run_ingest(args.lines, args.location, seed=args.seed,
+                                   cardinality=args.cardinality,
+                                   batch_size=args.batch_size, keep=True)
+    try:
+        client = search_client_for(processor)
+        results = run_search(client, processor.collection_name,
+                             queries=args.queries, limit=args.limit)
+        results["cached"] = run_cached(search_client_for(processor, cache=True),
+                                       processor.collection_name,
+                                       queries=args.queries, limit=args.limit)
+        write_results("search", params, {"ingest": ingest, "search": results}, args.output_dir)
+    finally:
+        processor.client.delete_collection(processor.collection_name)
+
+if __name__ == "__main__":
+    main()
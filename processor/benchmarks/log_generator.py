@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# log_generator.py - Синтетические логи в реалистичной смеси форматов
+import json
+import random
+from datetime import datetime, timedelta
+
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+SERVICES = ["auth", "billing", "gateway", "orders", "search", "notifier"]
+
+TEMPLATES = [
+    "User {id} logged in from {ip}",
+    "Database connection failed: timeout after {n}ms",
+    "Slow query on table {table}: {n}ms",
+    "Cache miss for key {table}:{id}",
+    "Payment {id} processed in {n}ms",
+    "High memory usage: {n}MB",
+    "Request to {path} completed with status {status}",
+    "Retrying job {id} (attempt {n})",
+    "Connection reset by peer {ip}",
+    "Config reloaded, {n} keys changed",
+]
+
+PATHS = ["/api/users", "/api/orders", "/api/login", "/health", "/static/app.js", "/api/search"]
+TABLES = ["users", "orders", "payments", "sessions", "events"]
+METHODS = ["GET", "GET", "GET", "POST", "PUT", "DELETE"]
+STATUSES = [200, 200, 200, 201, 301, 404, 500, 502]
+
+DEFAULT_MIX = {
+    "json": 0.25,
+    "bracketed": 0.25,
+    "nginx": 0.2,
+    "stacktrace": 0.05,
+    "template": 0.25,
+}
+
+class SyntheticLogGenerator:
+    def __init__(self, seed=42, mix=None, cardinality=1000, start_time=None):
+        self.random = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        self.cardinality = cardinality  # число различных значений id/ip в шаблонах
+        self.clock = start_time or datetime(2024, 1, 15, 10, 0, 0)
+
+        self.formats = list(self.mix.keys())
+        self.weights = [self.mix[f] for f in self.formats]
+
+    def tick(self):
+        """Монотонное время с джиттером"""
+        self.clock += timedelta(milliseconds=self.random.randint(1, 50))
+        return self.clock
+
+    def fill_template(self):
+        template = self.random.choice(TEMPLATES)
+        return template.format(
+            id=self.random.randrange(self.cardinality),
+            ip=f"10.0.{self.random.randrange(self.cardinality) % 256}.{self.random.randrange(256)}",
+            n=self.random.randint(1, 5000),
+            table=self.random.choice(TABLES),
+            path=self.random.choice(PATHS),
+            status=self.random.choice(STATUSES),
+        )
+
+    def json_line(self):
+        return json.dumps({
+            "timestamp": self.tick().isoformat() + "Z",
+            "level": self.random.choice(LEVELS),
+            "message": self.fill_template(),
+            "source": self.random.choice(SERVICES),
+            "service": self.random.choice(SERVICES),
+            "trace_id": f"{self.random.getrandbits(64):016x}",
+            "status": self.random.choice(STATUSES),
+        })
+
+    def bracketed_line(self):
+        ts = self.tick().strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{self.random.choice(LEVELS)}] {ts} {self.fill_template()}"
+
+    def nginx_line(self):
+        ts = self.tick().strftime("%d/%b/%Y:%H:%M:%S +0000")
+        ip = f"192.168.{self.random.randrange(self.cardinality) % 256}.{self.random.randrange(256)}"
+        method = self.random.choice(METHODS)
+        path = self.random.choice(PATHS)
+        status = self.random.choice(STATUSES)
+        size = self.random.randint(100, 50000)
+        return f'{ip} - - [{ts}] "{method} {path} HTTP/1.1" {status} {size} "-" "curl/8.0"'
+
+    def stacktrace_lines(self):
+        if self.random.random() < 0.5:
+            lines = ["Traceback (most recent call last):"]
+            for depth in range(self.random.randint(3, 12)):
+                module = self.random.choice(SERVICES)
+                lines.append(f'  File "/app/{module}/handler.py", line {self.random.randint(1, 900)}, in handle_{depth}')
+                lines.append(f"    result = process(request, depth={depth})")
+            lines.append(f"ValueError: invalid value for {self.random.choice(TABLES)} {self.random.randrange(self.cardinality)}")
+        else:
+            service = self.random.choice(SERVICES)
+            lines = [f"ERROR {self.tick().isoformat()} Unhandled exception in {service}",
+                     f"java.lang.NullPointerException: {self.random.choice(TABLES)} is null"]
+            for depth in range(self.random.randint(5, 30)):
+                lines.append(f"\tat com.example.{service}.Handler{depth}.run(Handler{depth}.java:{self.random.randint(1, 500)})")
+        return lines
+
+    def template_line(self):
+        return self.fill_template()
+
+    def lines(self, count):
+        """Генерирует не менее count строк (stack trace может выйти за границу)"""
+        produced = 0
+        while produced < count:
+            kind = self.random.choices(self.formats, self.weights)[0]
+            if kind == "stacktrace":
+                chunk = self.stacktrace_lines()
+            else:
+                chunk = [getattr(self, f"{kind}_line")()]
+            for line in chunk:
+                yield line
+            produced += len(chunk)
+
+    def lines_by_format(self, count):
+        """Строки, сгруппированные по формату (для парсерных бенчмарков)"""
+        result = {}
+        for kind in self.formats:
+            if kind == "stacktrace":
+                chunk = []
+                while len(chunk) < count:
+                    chunk.extend(self.stacktrace_lines())
+                result[kind] = chunk[:count]
+            else:
+                generate = getattr(self, f"{kind}_line")
+                result[kind] = [generate() for _ in range(count)]
+        return result
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetic log generator")
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cardinality", type=int, default=1000)
+    args = parser.parse_args()
+
+    generator = SyntheticLogGenerator(seed=args.seed, cardinality=args.cardinality)
+    for line in generator.lines(args.lines):
+        print(line)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# parser_bench.py - Микробенчмарк разбора строк по форматам
+import sys
+import time
+from log_parser import LogParser
+from benchmarks.log_generator import SyntheticLogGenerator
+
+def run_parser(lines=20000, seed=42, cardinality=1000, repeat=3):
+    """lines/sec LogParser.parse по каждому формату и по смеси"""
+    generator = SyntheticLogGenerator(seed=seed, cardinality=cardinality)
+    corpora = generator.lines_by_format(lines)
+    corpora["mixed"] = list(SyntheticLogGenerator(seed=seed, cardinality=cardinality).lines(lines))
+
+    parser = LogParser()
+    results = {}
+    for name, corpus in corpora.items():
+        best = None
+        formats = {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in corpus:
+                parser.parse(line)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        for line in corpus[:1000]:
+            parsed_format = parser.parse(line)["format"]
+            formats[parsed_format] = formats.get(parsed_format, 0) + 1
+
+        results[name] = {
+            "lines": len(corpus),
+            "best_seconds": best,
+            "lines_per_sec": len(corpus) / best if best else None,
+            "us_per_line": best / len(corpus) * 1e6 if best else None,
+            "detected_formats_first_1000": formats,
+        }
+        print(f"⚡ {name}: {results[name]['lines_per_sec']:,.0f} lines/sec "
+              f"({results[name]['us_per_line']:.2f} us/line)", file=sys.stderr)
+    return results
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# results.py - Сохранение результатов бенчмарков в JSON
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+def percentile(values, pct):
+    """Перцентиль с линейной интерполяцией"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def latency_summary(seconds):
+    """p50/p95/p99 в миллисекундах"""
+    ms = [s * 1000 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": sum(ms) / len(ms) if ms else None,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else None,
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def write_results(name, params, results, output_dir="bench_results"):
+    """Пишем результаты с окружением, чтобы прогоны можно было сравнивать"""
+    os.makedirs(output_dir, exist_ok=True)
+    started = datetime.now()
+    report = {
+        "benchmark": name,
+        "timestamp": started.isoformat(),
+        "git_revision": git_revision(),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": params,
+        "results": results,
+    }
+    filename = os.path.join(output_dir, f"{name}-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Results: {filename}", file=sys.stderr)
+    return filename
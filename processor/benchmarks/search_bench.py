@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# search_bench.py - Латентность search_logs с фильтрами и без
+import sys
+import time
+from advanced_search import AdvancedLogSearchClient
+from benchmarks.results import latency_summary
+
+QUERIES = [
+    "database connection failed",
+    "slow query",
+    "user login",
+    "high memory usage",
+    "null pointer exception",
+    "payment processed",
+    "connection reset",
+    "request completed with server error",
+]
+
+SCENARIOS = {
+    "no_filter": {},
+    "level": {"level": "ERROR"},
+    "source": {"source": "auth"},
+    "level_source": {"level": "ERROR", "source": "auth"},
+    "hours": {"hours": 24},
+}
+
+def run_search(client, collection_name, queries=200, limit=10, min_score=0.0, warmup=10):
+    """Меряем p50/p95/p99 search_logs по сценариям фильтрации"""
+    results = {}
+    for scenario, filters in SCENARIOS.items():
+        for i in range(warmup):
+            client.search_logs(QUERIES[i % len(QUERIES)], collection_name,
+                               limit=limit, min_score=min_score, **filters)
+
+        latencies = []
+        hits = 0
+        for i in range(queries):
+            start = time.perf_counter()
+            found = client.search_logs(QUERIES[i % len(QUERIES)], collection_name,
+                                       limit=limit, min_score=min_score, **filters)
+            latencies.append(time.perf_counter() - start)
+            hits += len(found)
+
+        summary = latency_summary(latencies)
+        summary["mean_hits"] = hits / queries if queries else 0
+        results[scenario] = summary
+        print(f"🔍 {scenario}: p50={summary['p50_ms']:.2f}ms "
+              f"p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms", file=sys.stderr)
+    return results
+
+def run_cached(client, collection_name, queries=200, limit=10, min_score=0.0):
+    """Повторяющиеся запросы через кэш результатов: первый круг - промахи, дальше попадания"""
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        client.search_logs(QUERIES[i % len(QUERIES)], collection_name,
+                           limit=limit, min_score=min_score)
+        latencies.append(time.perf_counter() - start)
+
+    summary = latency_summary(latencies)
+    summary.update(client.cache.stats())
+    print(f"⚡ cached: p50={summary['p50_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms "
+          f"hit_rate={summary['hit_rate']:.2f}", file=sys.stderr)
+    return summary
+
+def search_client_for(processor, cache=False):
+    """Клиент поиска поверх того же подключения и модели, что у процессора"""
+    return AdvancedLogSearchClient(client=processor.client, model=processor.model, cache=cache)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# bulk_load.py - Режим массовой загрузки с отложенной индексацией
+#
+# Во время шторма инцидента построение HNSW конкурирует с записью. Контроллер
+# следит за скоростью записи процессора: выше --bulk-load-rate коллекция
+# переводится в bulk-load (indexing_threshold=0 - HNSW не строится, меньше
+# сегментов - крупнее сегменты), после hold секунд ниже exit_rate настройки
+# оптимизатора возвращаются, и Qdrant достраивает индекс в фоне.
+#
+# Пока индекс не догнал запись, в semlog-meta лежит граница хвоста (ts, мс):
+# клиенты поиска ищут точки с ts >= границы точным перебором (exact=True),
+# остальные - обычным поиском по индексу, и сливают top-k.
+import sys
+import time
+import heapq
+import threading
+from qdrant_client import models
+from collection_meta import read_meta, write_meta, delete_meta
+
+META_KIND = "bulk-load"
+BULK_INDEXING_THRESHOLD = 0   # 0 - индексация выключена
+BULK_SEGMENT_NUMBER = 2       # меньше сегментов - крупнее сегменты, меньше слияний
+DEFAULT_INDEXING_THRESHOLD = 20000  # значение Qdrant по умолчанию (KB)
+TAIL_MARGIN = 300             # сек: события из буферов с отметкой времени до входа в bulk
+
+class BulkLoadController:
+    """Переключение коллекции в bulk-load и обратно по скорости записи (фоновый поток)"""
+
+    def __init__(self, client, collection_name, enter_rate=2000.0, exit_rate=None,
+                 hold=30.0, interval=5.0):
+        self.client = client
+        self.collection_name = collection_name
+        # None - только завершаем bulk-load, оставшийся от прошлого запуска
+        self.enter_rate = enter_rate                  # точек/сек для входа в bulk-load
+        if exit_rate is None and enter_rate is not None:
+            exit_rate = enter_rate / 4
+        self.exit_rate = exit_rate
+        self.hold = hold                              # сек ниже exit_rate до выхода
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.written = 0
+        self.window_start = time.monotonic()
+        self.rate = 0.0                               # EWMA точек/сек
+        self.state = "normal"                         # normal / bulk / indexing
+        self.since = None                             # граница хвоста, epoch мс
+        self.calm_since = None
+        self.saved = None                             # настройки оптимизатора до bulk-load
+        self.exited_at = time.monotonic()
+        self.switches = 0
+        self.stopped = threading.Event()
+
+        # Встроенное хранилище - всегда точный перебор, переключать нечего
+        self.supported = hasattr(client, "update_collection")
+        if not self.supported:
+            print("⚠️  Storage backend has no optimizer settings, bulk-load mode disabled",
+                  file=sys.stderr)
+            return
+        # Процессор перезапустился посреди bulk-load - продолжаем с той же границы
+        meta = read_meta(client, META_KIND, collection_name)
+        if meta:
+            self.state, self.since = meta["state"], meta["since"]
+            self.saved = meta.get("saved")
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def observe(self, points):
+        """Вызывается после каждого успешного upsert"""
+        with self.lock:
+            self.written += points
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Bulk-load check failed: {e}", file=sys.stderr)
+
+    def tick(self):
+        now = time.monotonic()
+        with self.lock:
+            sample = self.written / max(now - self.window_start, 1e-6)
+            self.written, self.window_start = 0, now
+        self.rate = 0.5 * sample + 0.5 * self.rate
+
+        if self.state != "bulk" and self.enter_rate is not None and self.rate >= self.enter_rate:
+            self.enter()
+        elif self.state == "bulk":
+            if self.enter_rate is None:
+                self.exit()
+            elif self.rate >= self.exit_rate:
+                self.calm_since = None
+            elif self.calm_since is None:
+                self.calm_since = now
+            elif now - self.calm_since >= self.hold:
+                self.exit()
+        elif self.state == "indexing":
+            self.check_indexed()
+
+    def optimizer_settings(self):
+        config = self.client.get_collection(self.collection_name).config.optimizer_config
+        # 0 - индексация была выключена и до bulk-load, возвращаем как было
+        threshold = config.indexing_threshold
+        if threshold is None:
+            threshold = DEFAULT_INDEXING_THRESHOLD
+        return {"indexing_threshold": threshold,
+                "default_segment_number": config.default_segment_number}
+
+    def save_state(self):
+        write_meta(self.client, META_KIND, self.collection_name,
+                   {"state": self.state, "since": self.since, "saved": self.saved})
+
+    def enter(self):
+        # Из indexing обратно в bulk граница и сохраненные настройки остаются прежними
+        if self.state == "normal":
+            self.saved = self.optimizer_settings()
+            self.since = int((time.time() - TAIL_MARGIN) * 1000)
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=models.OptimizersConfigDiff(
+                indexing_threshold=BULK_INDEXING_THRESHOLD,
+                default_segment_number=BULK_SEGMENT_NUMBER
+            )
+        )
+        self.state = "bulk"
+        self.calm_since = None
+        self.switches += 1
+        self.save_state()
+        print(f"🚚 Bulk-load on for {self.collection_name}: {self.rate:.0f} points/sec, "
+              f"indexing deferred", file=sys.stderr)
+
+    def exit(self):
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=models.OptimizersConfigDiff(**self.saved)
+        )
+        self.state = "indexing"
+        self.exited_at = time.monotonic()
+        self.save_state()
+        print(f"🏗️  Bulk-load off for {self.collection_name}: {self.rate:.0f} points/sec, "
+              f"building index", file=sys.stderr)
+
+    def check_indexed(self):
+        """Оптимизатор закончил - хвост больше не нужен"""
+        # Сразу после выхода оптимизатор мог еще не начать перестройку
+        if time.monotonic() - self.exited_at < self.hold:
+            return
+        info = self.client.get_collection(self.collection_name)
+        if info.status != models.CollectionStatus.GREEN:
+            return
+        delete_meta(self.client, META_KIND, self.collection_name)
+        self.state, self.since, self.saved = "normal", None, None
+        print(f"✅ Index caught up for {self.collection_name}", file=sys.stderr)
+
+    def stats(self):
+        return {"state": self.state, "rate": round(self.rate, 1), "switches": self.switches}
+
+    def close(self):
+        """Остановка процессора: коллекцию не оставляем без индексации"""
+        self.stopped.set()
+        if not self.supported:
+            return
+        if self.state == "bulk":
+            try:
+                self.exit()
+            except Exception as e:
+                print(f"🚨 {self.collection_name} left in bulk-load (indexing_threshold=0): {e}. "
+                      f"Restart the processor to restore optimizer settings", file=sys.stderr)
+                return
+        if self.state == "indexing":
+            print(f"⚠️  Index for {self.collection_name} is still building: searches use exact "
+                  f"search over the tail until a processor on this collection sees it finished",
+                  file=sys.stderr)
+
+def has_bulk_state(client, collection_name):
+    """В semlog-meta осталось состояние bulk-load (процессор остановился посреди)"""
+    return hasattr(client, "update_collection") and \
+        read_meta(client, META_KIND, collection_name) is not None
+
+class IndexingTail:
+    """Граница непроиндексированного хвоста коллекций (перечитывается раз в interval сек)"""
+
+    def __init__(self, client, interval=5.0):
+        self.client = client
+        self.interval = interval
+        self.cached = {}  # коллекция -> (прочитано в, граница или None)
+
+    def since(self, collection_name):
+        now = time.monotonic()
+        cached = self.cached.get(collection_name)
+        if cached is None or now - cached[0] >= self.interval:
+            meta = read_meta(self.client, META_KIND, collection_name)
+            cached = self.cached[collection_name] = (now, meta["since"] if meta else None)
+        return cached[1]
+
+def _with(query_filter, condition):
+    return models.Filter(must=[query_filter, condition] if query_filter else [condition])
+
+def tail_parts(query_filter, since):
+    """[(фильтр, SearchParams)] запросов поиска по коллекции
+
+    Без границы - один обычный запрос. С границей - индексная часть (ts < since
+    и старые точки без ts) по индексу и хвост (ts >= since) точным перебором.
+    """
+    if since is None:
+        return [(query_filter, None)]
+    head = models.Filter(should=[
+        models.FieldCondition(key="ts", range=models.Range(lt=since)),
+        models.IsEmptyCondition(is_empty=models.PayloadField(key="ts")),
+    ])
+    tail = models.FieldCondition(key="ts", range=models.Range(gte=since))
+    return [(_with(query_filter, head), None),
+            (_with(query_filter, tail), models.SearchParams(exact=True))]
+
+def merge_hits(parts, limit):
+    """Общий top-k результатов частей (точка попадает только в одну часть)"""
+    if len(parts) == 1:
+        return parts[0]
+    return heapq.nlargest(limit, [hit for part in parts for hit in part],
+                          key=lambda point: point.score)
+
+def merge_groups(parts, limit, group_size):
+    """Слияние GroupsResult частей: группы по id, в группе - лучшие group_size"""
+    if len(parts) == 1:
+        return parts[0].groups
+    hits = {}
+    for part in parts:
+        for group in part.groups:
+            hits.setdefault(group.id, []).extend(group.hits)
+    groups = [
+        models.PointGroup(id=group_id, hits=heapq.nlargest(
+            group_size, members, key=lambda point: point.score))
+        for group_id, members in hits.items()
+    ]
+    return heapq.nlargest(limit, groups, key=lambda group: group.hits[0].score)
+
+def tail_search(client, collection_name, query_vector, query_filter=None, limit=10,
+                score_threshold=None, since=None, with_vectors=False):
+    """search(): хвост с ts >= since - точным перебором, остальное - по индексу
+
+    Без границы (коллекция не в bulk-load) - обычный поиск одним запросом.
+    """
+    parts = tail_parts(query_filter, since)
+    if len(parts) == 1:
+        return client.search(
+            collection_name=collection_name,
+            query_vector=query_vector,
+            query_filter=query_filter,
+            limit=limit,
+            with_payload=True,
+            with_vectors=with_vectors,
+            score_threshold=score_threshold
+        )
+
+    # Обе части одним запросом к серверу
+    responses = client.search_batch(collection_name=collection_name, requests=[
+        models.SearchRequest(vector=query_vector, filter=part_filter, params=params,
+                             limit=limit, with_payload=True, with_vector=with_vectors,
+                             score_threshold=score_threshold)
+        for part_filter, params in parts
+    ])
+    return merge_hits(responses, limit)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# collection_meta.py - Метаданные коллекций логов в служебной коллекции semlog-meta
+#
+# Одна точка на (вид, коллекция): id = crc32("<kind>:<collection>"), вектор-заглушка
+# размерности 1, все данные - в payload. Работает и с Qdrant, и со встроенным хранилищем.
+#
+# Метаданные привязаны к физической коллекции: имя алиаса (reindex.py --alias)
+# разрешается в коллекцию за ним, и чтение/запись через алиас видят те же записи.
+import zlib
+from qdrant_client import models
+
+META_COLLECTION = "semlog-meta"
+
+def meta_point_id(kind, collection_name):
+    return zlib.crc32(f"{kind}:{collection_name}".encode("utf-8"))
+
+def ensure_meta_collection(client):
+    if not client.collection_exists(META_COLLECTION):
+        client.create_collection(
+            collection_name=META_COLLECTION,
+            vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT)
+        )
+
+def resolve_alias(client, collection_name):
+    """Коллекция за алиасом или само имя (нет такого алиаса / хранилище без алиасов)"""
+    if not hasattr(client, "get_aliases"):
+        return collection_name
+    try:
+        aliases = client.get_aliases().aliases
+    except Exception:
+        return collection_name
+    for alias in aliases:
+        if alias.alias_name == collection_name:
+            return alias.collection_name
+    return collection_name
+
+async def resolve_alias_async(client, collection_name):
+    """То же для AsyncQdrantClient"""
+    if not hasattr(client, "get_aliases"):
+        return collection_name
+    try:
+        aliases = (await client.get_aliases()).aliases
+    except Exception:
+        return collection_name
+    for alias in aliases:
+        if alias.alias_name == collection_name:
+            return alias.collection_name
+    return collection_name
+
+def write_meta(client, kind, collection_name, payload):
+    """Сохраняем (перезаписываем) метаданные вида kind для коллекции"""
+    collection_name = resolve_alias(client, collection_name)
+    ensure_meta_collection(client)
+    client.upsert(
+        collection_name=META_COLLECTION,
+        points=[models.PointStruct(
+            id=meta_point_id(kind, collection_name),
+            vector=[1.0],
+            payload={"kind": kind, "collection": collection_name, **payload}
+        )]
+    )
+
+def _meta_ids(kind, collection_name, target):
+    # Записи под именем алиаса могли остаться от запусков до разрешения алиасов
+    names = [target] if target == collection_name else [target, collection_name]
+    return [meta_point_id(kind, name) for name in names]
+
+def _first(points, ids):
+    by_id = {point.id: point.payload for point in points}
+    return next((by_id[i] for i in ids if i in by_id), None)
+
+def read_meta(client, kind, collection_name):
+    """payload метаданных или None (нет записи или нет коллекции semlog-meta)"""
+    ids = _meta_ids(kind, collection_name, resolve_alias(client, collection_name))
+    try:
+        points = client.retrieve(META_COLLECTION, ids=ids, with_payload=True)
+    except Exception:
+        return None
+    return _first(points, ids)
+
+async def read_meta_async(client, kind, collection_name):
+    """То же для AsyncQdrantClient"""
+    ids = _meta_ids(kind, collection_name, await resolve_alias_async(client, collection_name))
+    try:
+        points = await client.retrieve(META_COLLECTION, ids=ids, with_payload=True)
+    except Exception:
+        return None
+    return _first(points, ids)
+
+def delete_meta(client, kind, collection_name):
+    try:
+        client.delete(META_COLLECTION, points_selector=models.PointIdsList(
+            points=_meta_ids(kind, collection_name, resolve_alias(client, collection_name))
+        ))
+    except Exception:
+        pass
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# diversify.py - Группировка и разнообразие результатов поиска
+import numpy as np
+
+# Короткие имена для --group-by -> поля компактной схемы
+GROUP_KEYS = {"source": "src", "template": "tpl", "level": "lvl", "format": "fmt"}
+
+def group_key(name):
+    """'source' -> 'src'; любое другое имя payload поля - как есть"""
+    return GROUP_KEYS.get(name, name)
+
+def mmr_rerank(query_vector, candidates, limit=10, diversity=0.3):
+    """Maximal Marginal Relevance по кандидатам с векторами (with_vectors=True)
+
+    На каждом шаге берем кандидата с максимумом
+    (1 - diversity) * sim(query, c) - diversity * max sim(c, уже выбранные)
+    """
+    candidates = [c for c in candidates if c.vector is not None]
+    if len(candidates) <= 1:
+        return candidates[:limit]
+
+    vectors = np.asarray([c.vector for c in candidates], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    relevance = vectors @ (query / max(np.linalg.norm(query), 1e-12))
+
+    selected = []
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    while len(selected) < min(limit, len(candidates)):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = (1 - diversity) * relevance - diversity * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+    return [candidates[i] for i in selected]
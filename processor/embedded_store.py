@@ -0,0 +1,828 @@
+#!/usr/bin/env python3
+# embedded_store.py - Встроенное векторное хранилище для edge-хостов без сервера Qdrant
+#
+# Реализует подмножество API QdrantClient, которое используют процессоры и
+# клиенты поиска, поэтому подключается через storage_backend.create_client().
+#
+# Раскладка на диске:
+#   <root>/<collection>/meta.json             - параметры, размеры сегментов, колонки
+#   <root>/<collection>/dict-<n>.jsonl        - словарь значений keyword-колонки n
+#   <root>/<collection>/seg-00000/vectors.f16 - float16 [capacity, dim], memmap
+#                                 ids.i64, deleted.u8, offsets.i64
+#                                 payload.jsonl - полный payload, append-only
+#                                 col-<n>.i32 / col-<n>.f64 - колоночные поля
+#
+# Колонки создаются через create_payload_index и используются для pre-filter
+# масок; фильтры по остальным полям проверяются построчно по payload.jsonl.
+import os
+import json
+import fcntl
+import shutil
+import threading
+from itertools import islice
+from types import SimpleNamespace
+import numpy as np
+from qdrant_client import models
+
+SEGMENT_CAPACITY = 65536  # строк в сегменте
+SEARCH_BLOCK = 16384      # строк в блоке матричного умножения
+DENSE_MASK_RATIO = 0.5    # выше этой доли считаем блоки целиком, ниже - только отобранные строки
+SCROLL_BLOCK = 4096       # строк, на которых за раз считается фильтр страницы scroll
+
+KEYWORD_SCHEMAS = {"keyword", "text", "uuid", "datetime"}
+NUMERIC_SCHEMAS = {"integer", "float", "bool"}
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _schema_name(field_schema):
+    """PayloadSchemaType / строка / *IndexParams -> имя типа"""
+    value = getattr(field_schema, "type", field_schema)
+    return str(getattr(value, "value", value)).lower()
+
+def _predicate(condition):
+    """Python-предикат для значения поля по FieldCondition"""
+    match = condition.match
+    rng = condition.range
+
+    if isinstance(match, models.MatchValue):
+        expected = match.value
+        check = lambda v: v == expected
+    elif isinstance(match, models.MatchAny):
+        allowed = set(match.any)
+        check = lambda v: v in allowed
+    elif isinstance(match, models.MatchExcept):
+        excluded = set(match.except_)
+        check = lambda v: v not in excluded
+    elif isinstance(match, models.MatchText):
+        text = match.text
+        check = lambda v: isinstance(v, str) and text in v
+    elif rng is not None:
+        def check(v):
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                return False
+            return ((rng.gt is None or v > rng.gt) and (rng.gte is None or v >= rng.gte)
+                    and (rng.lt is None or v < rng.lt) and (rng.lte is None or v <= rng.lte))
+    else:
+        raise NotImplementedError(f"Unsupported condition for embedded store: {condition}")
+
+    def evaluate(value):
+        if value is None:
+            return False
+        if isinstance(value, list):
+            return any(check(v) for v in value)
+        return check(value)
+    return evaluate
+
+class _Segment:
+    def __init__(self, path, dim, capacity, size=0, create=False):
+        if create:
+            os.makedirs(path, exist_ok=True)
+        mode = "w+" if create else "r+"
+        self.path = path
+        self.capacity = capacity
+        self.size = size
+        self.vectors = np.memmap(os.path.join(path, "vectors.f16"), np.float16, mode,
+                                 shape=(capacity, dim))
+        self.ids = np.memmap(os.path.join(path, "ids.i64"), np.int64, mode, shape=(capacity,))
+        self.deleted = np.memmap(os.path.join(path, "deleted.u8"), np.uint8, mode,
+                                 shape=(capacity,))
+        self.offsets = np.memmap(os.path.join(path, "offsets.i64"), np.int64, mode,
+                                 shape=(capacity + 1,))
+        payload_path = os.path.join(path, "payload.jsonl")
+        if create:
+            open(payload_path, "wb").close()
+        self.payload_file = open(payload_path, "rb")
+        self.columns = {}
+
+    def open_column(self, number, kind, create=False):
+        suffix, dtype, empty = ("i32", np.int32, -1) if kind == "keyword" else ("f64", np.float64, np.nan)
+        filename = os.path.join(self.path, f"col-{number}.{suffix}")
+        create = create or not os.path.exists(filename)
+        column = np.memmap(filename, dtype, "w+" if create else "r+", shape=(self.capacity,))
+        if create:
+            column[:] = empty
+        self.columns[number] = column
+        return column
+
+    def payloads(self, rows):
+        result = []
+        for row in rows:
+            start, stop = int(self.offsets[row]), int(self.offsets[row + 1])
+            self.payload_file.seek(start)
+            result.append(json.loads(self.payload_file.read(stop - start)))
+        return result
+
+    def flush(self):
+        for array in (self.vectors, self.ids, self.deleted, self.offsets, *self.columns.values()):
+            array.flush()
+
+    def close(self):
+        self.payload_file.close()
+
+class _Collection:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.meta_mtime = None
+        self.segments = []
+        self.id_map = {}          # point id -> (segment, row)
+        self.dictionaries = {}    # column n -> список значений
+        self.dictionary_index = {}  # column n -> {value: code}
+        self.dictionary_pos = {}  # column n -> прочитанная позиция в dict-<n>.jsonl
+        self.overwrites = 0
+        self.refresh()
+
+    # ---- метаданные ----
+
+    @staticmethod
+    def create(path, dim, distance, capacity=SEGMENT_CAPACITY):
+        os.makedirs(path)
+        meta = {"dim": dim, "distance": distance, "capacity": capacity,
+                "segments": [], "columns": {}, "overwrites": 0}
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return _Collection(path)
+
+    def write_meta(self):
+        self.meta["segments"] = [s.size for s in self.segments]
+        self.meta["overwrites"] = self.overwrites
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self.meta_mtime = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+
+    def refresh(self):
+        """Подхватываем записи другого процесса (дешевая проверка mtime)"""
+        meta_path = os.path.join(self.path, "meta.json")
+        mtime = os.stat(meta_path).st_mtime_ns
+        if mtime == self.meta_mtime:
+            return
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.meta_mtime = mtime
+        self.dim = self.meta["dim"]
+        self.distance = self.meta["distance"]
+
+        for key, column in self.meta["columns"].items():
+            self.load_dictionary(column)
+
+        sizes = self.meta["segments"]
+        rebuild = self.meta["overwrites"] != self.overwrites
+        self.overwrites = self.meta["overwrites"]
+
+        for number, size in enumerate(sizes):
+            if number < len(self.segments):
+                segment = self.segments[number]
+                old_size = segment.size
+            else:
+                segment = _Segment(self.segment_path(number), self.dim, self.meta["capacity"])
+                self.segments.append(segment)
+                old_size = 0
+            for column in self.meta["columns"].values():
+                if column["n"] not in segment.columns:
+                    segment.open_column(column["n"], column["type"])
+            segment.size = size
+            if not rebuild:
+                for row in range(old_size, size):
+                    if not segment.deleted[row]:
+                        self.id_map[int(segment.ids[row])] = (number, row)
+
+        if rebuild:
+            self.rebuild_id_map()
+
+    def rebuild_id_map(self):
+        self.id_map = {}
+        for number, segment in enumerate(self.segments):
+            live = np.flatnonzero(segment.deleted[:segment.size] == 0)
+            for row, point_id in zip(live, segment.ids[live]):
+                self.id_map[int(point_id)] = (number, int(row))
+
+    def load_dictionary(self, column):
+        number = column["n"]
+        if column["type"] != "keyword":
+            return
+        values = self.dictionaries.setdefault(number, [])
+        index = self.dictionary_index.setdefault(number, {})
+        filename = os.path.join(self.path, f"dict-{number}.jsonl")
+        if not os.path.exists(filename):
+            return
+        with open(filename, "rb") as f:
+            f.seek(self.dictionary_pos.get(number, 0))
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                value = json.loads(line)
+                index[value] = len(values)
+                values.append(value)
+            self.dictionary_pos[number] = f.tell()
+
+    def segment_path(self, number):
+        return os.path.join(self.path, f"seg-{number:05d}")
+
+    def writer_lock(self):
+        """Межпроцессная блокировка записи: несколько процессоров на одну коллекцию"""
+        handle = open(os.path.join(self.path, "write.lock"), "w")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    # ---- колонки ----
+
+    def add_column(self, key, kind):
+        columns = self.meta["columns"]
+        if key in columns:
+            return
+        number = len(columns)
+        columns[key] = {"n": number, "type": kind}
+        if kind == "keyword":
+            self.dictionaries[number] = []
+            self.dictionary_index[number] = {}
+            self.dictionary_pos[number] = 0
+
+        # Заполняем колонку по уже записанным payload
+        for segment in self.segments:
+            column = segment.open_column(number, kind, create=True)
+            if segment.size:
+                payloads = segment.payloads(range(segment.size))
+                column[:segment.size] = [self.encode_value(key, p.get(key)) for p in payloads]
+        self.write_meta()
+
+    def encode_value(self, key, value):
+        column = self.meta["columns"][key]
+        if column["type"] == "keyword":
+            if value is None or isinstance(value, (list, dict)):
+                return -1
+            number = column["n"]
+            index = self.dictionary_index[number]
+            code = index.get(value)
+            if code is None:
+                code = len(self.dictionaries[number])
+                index[value] = code
+                self.dictionaries[number].append(value)
+                with open(os.path.join(self.path, f"dict-{number}.jsonl"), "ab") as f:
+                    f.write(json.dumps(value, ensure_ascii=False).encode() + b"\n")
+                    self.dictionary_pos[number] = f.tell()
+            return code
+        if isinstance(value, (bool, int, float)):
+            return float(value)
+        return np.nan
+
+    # ---- запись ----
+
+    def upsert(self, points):
+        with self.lock:
+            handle = self.writer_lock()
+            try:
+                self.refresh()
+                self.append(points)
+                self.write_meta()
+            finally:
+                handle.close()
+
+    def append(self, points):
+        points = list(points)
+        if not points:
+            return
+        vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {vectors.shape}")
+        if self.distance == "Cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+        position = 0
+        while position < len(points):
+            if not self.segments or self.segments[-1].size >= self.segments[-1].capacity:
+                self.new_segment()
+            number = len(self.segments) - 1
+            segment = self.segments[number]
+            start = segment.size
+            count = min(segment.capacity - start, len(points) - position)
+            chunk = points[position:position + count]
+
+            segment.vectors[start:start + count] = vectors[position:position + count]
+            segment.deleted[start:start + count] = 0
+
+            payloads = [p.payload or {} for p in chunk]
+            lines = [json.dumps(p, ensure_ascii=False).encode() + b"\n" for p in payloads]
+            with open(os.path.join(segment.path, "payload.jsonl"), "ab") as f:
+                offset = f.tell()
+                f.write(b"".join(lines))
+            for i, line in enumerate(lines):
+                segment.offsets[start + i] = offset
+                offset += len(line)
+            segment.offsets[start + count] = offset
+
+            for key, column in self.meta["columns"].items():
+                segment.columns[column["n"]][start:start + count] = [
+                    self.encode_value(key, p.get(key)) for p in payloads
+                ]
+
+            for i, point in enumerate(chunk):
+                if not isinstance(point.id, int):
+                    raise ValueError("Embedded store supports integer point ids only")
+                previous = self.id_map.get(point.id)
+                if previous is not None:
+                    self.segments[previous[0]].deleted[previous[1]] = 1
+                    self.overwrites += 1
+                segment.ids[start + i] = point.id
+                self.id_map[point.id] = (number, start + i)
+
+            segment.size = start + count
+            segment.flush()
+            position += count
+
+    def new_segment(self):
+        number = len(self.segments)
+        segment = _Segment(self.segment_path(number), self.dim, self.meta["capacity"], create=True)
+        for column in self.meta["columns"].values():
+            segment.open_column(column["n"], column["type"], create=True)
+        self.segments.append(segment)
+
+    def delete_matching(self, query_filter):
+        """Удаление по фильтру: маска по сегменту целиком, без списка строк в Python"""
+        with self.lock:
+            handle = self.writer_lock()
+            try:
+                self.refresh()
+                for segment in self.segments:
+                    if not segment.size:
+                        continue
+                    rows = np.flatnonzero(self.mask(segment, query_filter))
+                    if not len(rows):
+                        continue
+                    segment.deleted[rows] = 1
+                    for point_id in segment.ids[rows].tolist():
+                        self.id_map.pop(point_id, None)
+                    self.overwrites += len(rows)
+                    segment.deleted.flush()
+                self.write_meta()
+            finally:
+                handle.close()
+
+    def delete_rows(self, refs):
+        with self.lock:
+            handle = self.writer_lock()
+            try:
+                self.refresh()
+                for number, row in refs:
+                    segment = self.segments[number]
+                    if not segment.deleted[row]:
+                        segment.deleted[row] = 1
+                        self.id_map.pop(int(segment.ids[row]), None)
+                        self.overwrites += 1
+                for segment in self.segments:
+                    segment.deleted.flush()
+                self.write_meta()
+            finally:
+                handle.close()
+
+    # ---- фильтры ----
+
+    def mask(self, segment, query_filter, start=0, stop=None):
+        """Булева маска строк сегмента [start, stop): фильтр и не удаленные"""
+        stop = segment.size if stop is None else stop
+        mask = segment.deleted[start:stop] == 0
+        if query_filter is not None:
+            mask &= self.filter_mask(segment, query_filter, start, stop)
+        return mask
+
+    def filter_mask(self, segment, query_filter, start, stop):
+        mask = np.ones(stop - start, dtype=bool)
+        for condition in _as_list(query_filter.must):
+            mask &= self.condition_mask(segment, condition, start, stop)
+        should = _as_list(query_filter.should)
+        if should:
+            any_mask = np.zeros(stop - start, dtype=bool)
+            for condition in should:
+                any_mask |= self.condition_mask(segment, condition, start, stop)
+            mask &= any_mask
+        for condition in _as_list(query_filter.must_not):
+            mask &= ~self.condition_mask(segment, condition, start, stop)
+        return mask
+
+    def condition_mask(self, segment, condition, start, stop):
+        size = stop - start
+        if isinstance(condition, models.Filter):
+            return self.filter_mask(segment, condition, start, stop)
+        if isinstance(condition, models.HasIdCondition):
+            return np.isin(segment.ids[start:stop],
+                           np.asarray(list(condition.has_id), dtype=np.int64))
+        if not isinstance(condition, models.FieldCondition):
+            raise NotImplementedError(f"Unsupported condition for embedded store: {condition}")
+
+        column = self.meta["columns"].get(condition.key)
+        if column is None:
+            # Нет колонки - построчная проверка по payload
+            check = _predicate(condition)
+            payloads = segment.payloads(range(start, stop))
+            return np.fromiter((check(p.get(condition.key)) for p in payloads), bool, size)
+
+        values = segment.columns[column["n"]][start:stop]
+        match = condition.match
+        if column["type"] == "keyword":
+            index = self.dictionary_index[column["n"]]
+            if isinstance(match, models.MatchValue):
+                code = index.get(match.value)
+                return values == code if code is not None else np.zeros(size, dtype=bool)
+            if isinstance(match, models.MatchAny):
+                codes = [index[v] for v in match.any if v in index]
+                return np.isin(values, codes)
+            # Остальные условия считаем по словарю, затем раскладываем по кодам
+            check = _predicate(condition)
+            allowed = np.fromiter((check(v) for v in self.dictionaries[column["n"]]), bool)
+            allowed = np.append(allowed, False)  # код -1 -> последний элемент -> False
+            return allowed[values]
+
+        if isinstance(match, models.MatchValue):
+            return values == float(match.value)
+        if isinstance(match, models.MatchAny):
+            return np.isin(values, [float(v) for v in match.any])
+        if isinstance(match, models.MatchExcept):
+            return ~np.isnan(values) & ~np.isin(values, [float(v) for v in match.except_])
+        rng = condition.range
+        if rng is None:
+            raise NotImplementedError(f"Unsupported condition for numeric column: {condition}")
+        mask = ~np.isnan(values)
+        if rng.gt is not None:
+            mask &= values > rng.gt
+        if rng.gte is not None:
+            mask &= values >= rng.gte
+        if rng.lt is not None:
+            mask &= values < rng.lt
+        if rng.lte is not None:
+            mask &= values <= rng.lte
+        return mask
+
+    # ---- чтение ----
+
+    def search(self, query_vector, query_filter=None, limit=10, offset=0, score_threshold=None):
+        """Top-k блочными матричными умножениями с pre-filter маской"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if self.distance == "Cosine":
+            norm = np.linalg.norm(query)
+            query = query / norm if norm else query
+        k = limit + (offset or 0)
+        if limit <= 0 or k <= 0:
+            return []
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_refs = np.empty((0, 2), dtype=np.int64)
+
+        for number, segment in enumerate(self.segments):
+            size = segment.size
+            if not size:
+                continue
+            mask = self.mask(segment, query_filter)
+            selected = np.flatnonzero(mask)
+            if not len(selected):
+                continue
+            dense = len(selected) > size * DENSE_MASK_RATIO
+
+            total = size if dense else len(selected)
+            for start in range(0, total, SEARCH_BLOCK):
+                if dense:
+                    stop = min(start + SEARCH_BLOCK, size)
+                    rows = np.arange(start, stop)
+                    scores = segment.vectors[start:stop].astype(np.float32) @ query
+                    scores[~mask[start:stop]] = -np.inf
+                else:
+                    rows = selected[start:start + SEARCH_BLOCK]
+                    scores = segment.vectors[rows].astype(np.float32) @ query
+                if score_threshold is not None:
+                    scores[scores < score_threshold] = -np.inf
+
+                if len(scores) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                else:
+                    top = np.arange(len(scores))
+                top = top[np.isfinite(scores[top])]
+                if not len(top):
+                    continue
+
+                best_scores = np.concatenate([best_scores, scores[top]])
+                refs = np.stack([np.full(len(top), number), rows[top]], axis=1)
+                best_refs = np.concatenate([best_refs, refs])
+                if len(best_scores) > k:
+                    keep = np.argpartition(-best_scores, k - 1)[:k]
+                    best_scores, best_refs = best_scores[keep], best_refs[keep]
+
+        order = np.argsort(-best_scores, kind="stable")[offset or 0:k]
+        return [(float(best_scores[i]), int(best_refs[i][0]), int(best_refs[i][1])) for i in order]
+
+    def matching_rows(self, query_filter=None, position=(0, 0)):
+        """(segment, row) строк под фильтром в порядке вставки, начиная с position
+
+        Фильтр считается блоками по SCROLL_BLOCK строк: страница scroll читает
+        только строки от своего offset до limit совпадений, а не всю коллекцию.
+        """
+        first, first_row = position
+        for number in range(first, len(self.segments)):
+            segment = self.segments[number]
+            start = first_row if number == first else 0
+            while start < segment.size:
+                stop = min(start + SCROLL_BLOCK, segment.size)
+                for row in np.flatnonzero(self.mask(segment, query_filter, start, stop)):
+                    yield number, start + int(row)
+                start = stop
+
+    def position(self, point_id):
+        """(segment, row) точки для offset scroll; удаленная - последняя ее строка
+
+        Строки не переиспользуются: после удаления (или перезаписи) точки
+        продолжаем со следующей живой строки. None - такой точки не было.
+        """
+        if point_id in self.id_map:
+            return self.id_map[point_id]
+        for number in range(len(self.segments) - 1, -1, -1):
+            segment = self.segments[number]
+            rows = np.flatnonzero(segment.ids[:segment.size] == point_id)
+            if len(rows):
+                return number, int(rows[-1])
+        return None
+
+    def order_values(self, key, refs):
+        column = self.meta["columns"].get(key)
+        values = np.empty(len(refs), dtype=np.float64)
+        for i, (number, row) in enumerate(refs):
+            segment = self.segments[number]
+            if column is not None and column["type"] != "keyword":
+                values[i] = segment.columns[column["n"]][row]
+            else:
+                value = segment.payloads([row])[0].get(key)
+                values[i] = value if isinstance(value, (int, float)) else np.nan
+        return values
+
+    def record(self, number, row, with_payload=True, with_vectors=False, score=None):
+        segment = self.segments[number]
+        payload = segment.payloads([row])[0] if with_payload else None
+        vector = segment.vectors[row].astype(np.float32).tolist() if with_vectors else None
+        point_id = int(segment.ids[row])
+        if score is None:
+            return models.Record(id=point_id, payload=payload, vector=vector)
+        return models.ScoredPoint(id=point_id, version=0, score=score,
+                                  payload=payload, vector=vector)
+
+    def live_count(self):
+        return len(self.id_map)
+
+    def close(self):
+        for segment in self.segments:
+            segment.flush()
+            segment.close()
+
+class EmbeddedVectorStore:
+    """Подмножество API QdrantClient поверх memory-mapped сегментов"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._collections = {}
+
+    def _collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            path = os.path.join(self.path, collection_name)
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise ValueError(f"Collection {collection_name} not found")
+            collection = self._collections[collection_name] = _Collection(path)
+        else:
+            # Под lock: параллельные запросы из пула потоков (AsyncClientAdapter)
+            # не должны видеть наполовину перечитанные метаданные
+            with collection.lock:
+                collection.refresh()
+        return collection
+
+    # ---- коллекции ----
+
+    def get_collections(self):
+        names = sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "meta.json"))
+        )
+        return SimpleNamespace(collections=[SimpleNamespace(name=n) for n in names])
+
+    def collection_exists(self, collection_name):
+        return os.path.exists(os.path.join(self.path, collection_name, "meta.json"))
+
+    def get_collection(self, collection_name):
+        collection = self._collection(collection_name)
+        count = collection.live_count()
+        return SimpleNamespace(
+            status=models.CollectionStatus.GREEN,
+            optimizer_status=models.OptimizersStatusOneOf.OK,
+            points_count=count,
+            vectors_count=count,
+            indexed_vectors_count=count,  # полный перебор - весь объем "проиндексирован"
+            segments_count=len(collection.segments),
+            payload_schema={key: c["type"] for key, c in collection.meta["columns"].items()},
+            config=SimpleNamespace(params=SimpleNamespace(vectors=models.VectorParams(
+                size=collection.dim, distance=models.Distance(collection.distance)
+            ))),
+        )
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        if self.collection_exists(collection_name):
+            raise ValueError(f"Collection {collection_name} already exists")
+        distance = models.Distance(vectors_config.distance).value
+        if distance not in ("Cosine", "Dot"):
+            raise ValueError(f"Embedded store supports Cosine and Dot distance, got {distance}")
+        self._collections[collection_name] = _Collection.create(
+            os.path.join(self.path, collection_name), vectors_config.size, distance
+        )
+        return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        collection = self._collections.pop(collection_name, None)
+        if collection is not None:
+            collection.close()
+        path = os.path.join(self.path, collection_name)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+            return True
+        return False
+
+    def create_payload_index(self, collection_name, field_name, field_schema=None, **kwargs):
+        collection = self._collection(collection_name)
+        schema = _schema_name(field_schema) if field_schema is not None else "keyword"
+        kind = "keyword" if schema in KEYWORD_SCHEMAS else "numeric"
+        with collection.lock:
+            handle = collection.writer_lock()
+            try:
+                collection.refresh()
+                collection.add_column(field_name, kind)
+            finally:
+                handle.close()
+
+    # ---- точки ----
+
+    def upsert(self, collection_name, points, **kwargs):
+        self._collection(collection_name).upsert(points)
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        collection = self._collection(collection_name)
+        if isinstance(points_selector, models.FilterSelector):
+            points_selector = points_selector.filter
+        if isinstance(points_selector, models.Filter):
+            collection.delete_matching(points_selector)
+            return
+        ids = getattr(points_selector, "points", points_selector)
+        collection.delete_rows([collection.id_map[i] for i in ids if i in collection.id_map])
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        collection = self._collection(collection_name)
+        return [
+            collection.record(*collection.id_map[i], with_payload, with_vectors)
+            for i in ids if i in collection.id_map
+        ]
+
+    def search(self, collection_name, query_vector, query_filter=None, limit=10, offset=0,
+               with_payload=True, with_vectors=False, score_threshold=None, **kwargs):
+        collection = self._collection(collection_name)
+        hits = collection.search(query_vector, query_filter, limit, offset, score_threshold)
+        return [
+            collection.record(number, row, with_payload, with_vectors, score=score)
+            for score, number, row in hits
+        ]
+
+    def search_groups(self, collection_name, query_vector, group_by, query_filter=None, limit=10,
+                      group_size=1, with_payload=True, with_vectors=False, score_threshold=None,
+                      **kwargs):
+        """Группы по значению payload поля; top-k расширяется, пока группы не заполнятся"""
+        collection = self._collection(collection_name)
+        k = limit * group_size * 4
+        while True:
+            hits = collection.search(query_vector, query_filter, k, 0, score_threshold)
+            groups = {}
+            for score, number, row in hits:
+                value = collection.segments[number].payloads([row])[0].get(group_by)
+                if value is None or isinstance(value, (dict, list)):
+                    continue
+                members = groups.setdefault(value, [])
+                if len(members) < group_size:
+                    members.append((score, number, row))
+            full = sum(len(members) == group_size for members in groups.values())
+            if len(hits) < k or full >= limit:
+                break
+            k *= 2
+
+        ranked = sorted(groups.items(), key=lambda item: -item[1][0][0])[:limit]
+        return models.GroupsResult(groups=[
+            models.PointGroup(id=value, hits=[
+                collection.record(number, row, with_payload, with_vectors, score=score)
+                for score, number, row in members
+            ])
+            for value, members in ranked
+        ])
+
+    def recommend(self, collection_name, positive, negative=None, query_filter=None, limit=10,
+                  offset=0, with_payload=True, with_vectors=False, score_threshold=None, **kwargs):
+        """Стратегия average_vector: avg(pos) + (avg(pos) - avg(neg)); примеры исключаются"""
+        collection = self._collection(collection_name)
+        negative = list(negative or [])
+        examples = list(positive) + negative
+
+        def average(ids):
+            refs = [collection.id_map[i] for i in ids if i in collection.id_map]
+            if not refs:
+                return None
+            return np.mean([collection.segments[n].vectors[r].astype(np.float32) for n, r in refs], axis=0)
+
+        query = average(positive)
+        if query is None:
+            raise ValueError(f"No positive examples found in {collection_name}: {list(positive)}")
+        if negative:
+            avoid = average(negative)
+            if avoid is not None:
+                query = query + (query - avoid)
+
+        exclude = models.Filter(
+            must=[query_filter] if query_filter is not None else None,
+            must_not=[models.HasIdCondition(has_id=examples)],
+        )
+        return self.search(collection_name, query, exclude, limit, offset,
+                           with_payload, with_vectors, score_threshold)
+
+    def recommend_batch(self, collection_name, requests, **kwargs):
+        return [
+            self.recommend(
+                collection_name, request.positive, request.negative, request.filter,
+                request.limit, request.offset or 0, request.with_payload or False,
+                request.with_vector or False, request.score_threshold,
+            )
+            for request in requests
+        ]
+
+    def count(self, collection_name, count_filter=None, exact=True, **kwargs):
+        collection = self._collection(collection_name)
+        if count_filter is None:
+            return models.CountResult(count=collection.live_count())
+        total = sum(int(collection.mask(s, count_filter).sum()) for s in collection.segments if s.size)
+        return models.CountResult(count=total)
+
+    def facet(self, collection_name, key, facet_filter=None, limit=10, exact=True, **kwargs):
+        """Количество точек по значениям колонки под фильтром (top limit)"""
+        collection = self._collection(collection_name)
+        column = collection.meta["columns"].get(key)
+        if column is None:
+            raise ValueError(f"Facet requires a payload index on {key}")
+        counts = {}
+        for segment in collection.segments:
+            if not segment.size:
+                continue
+            values = segment.columns[column["n"]][:segment.size][collection.mask(segment, facet_filter)]
+            if column["type"] == "keyword":
+                names = collection.dictionaries[column["n"]]
+                values, found = np.unique(values[values >= 0], return_counts=True)
+                values = [names[code] for code in values]
+            else:
+                values, found = np.unique(values[~np.isnan(values)], return_counts=True)
+                values = [int(value) for value in values]
+            for value, number in zip(values, found):
+                counts[value] = counts.get(value, 0) + int(number)
+
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+        return models.FacetResponse(hits=[
+            models.FacetValueHit(value=value, count=number) for value, number in ranked
+        ])
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, offset=None,
+               with_payload=True, with_vectors=False, order_by=None, **kwargs):
+        collection = self._collection(collection_name)
+
+        if order_by is not None:
+            refs = list(collection.matching_rows(scroll_filter))
+            if isinstance(order_by, str):
+                order_by = models.OrderBy(key=order_by)
+            values = collection.order_values(order_by.key, refs)
+            descending = str(getattr(order_by.direction, "value", order_by.direction)) == "desc"
+            valid = ~np.isnan(values)
+            if order_by.start_from is not None:
+                start = float(order_by.start_from)
+                valid &= values <= start if descending else values >= start
+            candidates = np.flatnonzero(valid)
+            order = np.argsort(values[candidates], kind="stable")
+            if descending:
+                order = order[::-1]
+            page = [refs[i] for i in candidates[order[:limit]]]
+            return [collection.record(n, r, with_payload, with_vectors) for n, r in page], None
+
+        position = (0, 0)
+        if offset is not None:
+            position = collection.position(offset)
+            if position is None:
+                return [], None
+        # limit + 1: следующая строка - offset следующей страницы
+        refs = list(islice(collection.matching_rows(scroll_filter, position), limit + 1))
+        page = refs[:limit]
+        next_offset = int(collection.segments[refs[limit][0]].ids[refs[limit][1]]) \
+            if len(refs) > limit else None
+        return [collection.record(n, r, with_payload, with_vectors) for n, r in page], next_offset
+
+    def close(self, **kwargs):
+        for collection in self._collections.values():
+            collection.close()
+        self._collections = {}
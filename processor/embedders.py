@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# embedders.py - Откуда брать эмбеддинги: своя копия модели или общий sidecar
+#
+#   create_embedder()                          - $EMBEDDING_SOCKET, если сокет есть,
+#                                                иначе локальная SentenceTransformer
+#   create_embedder("/run/semlog/embed.sock")  - sidecar (embedding_sidecar.py)
+#   embedder_for(client, "app-logs")           - модель, которой заполнена коллекция
+#                                                (reindex.py записывает ее в semlog-meta)
+#
+# Оба варианта отдают объект с encode(str | list[str]) -> numpy float32,
+# как у SentenceTransformer, поэтому процессоры и клиенты поиска не меняются.
+#
+# Протокол sidecar (Unix socket, big-endian заголовки):
+#   запрос:  u32 N, затем N раз: u32 длина + UTF-8 текст
+#   ответ:   u32 N, u32 dim, затем N*dim float32 little-endian
+#   ошибка:  u32 0xFFFFFFFF, u32 длина + UTF-8 сообщение
+import os
+import sys
+import socket
+import struct
+import threading
+import numpy as np
+from collection_meta import read_meta, write_meta
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_SOCKET = "/tmp/semlog-embed.sock"
+ERROR_MARKER = 0xFFFFFFFF
+
+META_KIND = "embedding"
+
+HEADER = struct.Struct(">I")
+RESPONSE_HEADER = struct.Struct(">II")
+
+def encode_request(texts):
+    parts = [HEADER.pack(len(texts))]
+    for text in texts:
+        raw = text.encode("utf-8")
+        parts.append(HEADER.pack(len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding sidecar closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+class SidecarEmbedder:
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.sock = None
+        self.lock = threading.Lock()  # процессор кодирует и из таймера, и из основного потока
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+    def request(self, texts):
+        if self.sock is None:
+            self.connect()
+        self.sock.sendall(encode_request(texts))
+        count, dim = RESPONSE_HEADER.unpack(_recv_exact(self.sock, RESPONSE_HEADER.size))
+        if count == ERROR_MARKER:
+            raise RuntimeError(f"embedding sidecar: {_recv_exact(self.sock, dim).decode('utf-8')}")
+        data = _recv_exact(self.sock, count * dim * 4)
+        return np.frombuffer(data, dtype="<f4").reshape(count, dim)
+
+    def encode(self, sentences, **kwargs):
+        """Интерфейс SentenceTransformer.encode: str -> [dim], list -> [N, dim]"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        with self.lock:
+            try:
+                vectors = self.request(texts)
+            except (ConnectionError, BrokenPipeError, socket.timeout):
+                # sidecar перезапускался - одно переподключение
+                self.close()
+                vectors = self.request(texts)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+def create_embedder(socket_path=None, model_name=DEFAULT_MODEL):
+    """Sidecar, если указан сокет ($EMBEDDING_SOCKET) и он существует; иначе своя модель"""
+    socket_path = socket_path or os.environ.get("EMBEDDING_SOCKET")
+    if socket_path:
+        if os.path.exists(socket_path):
+            return SidecarEmbedder(socket_path)
+        print(f"⚠️  Embedding sidecar {socket_path} not found, loading local model",
+              file=sys.stderr)
+    return load_local_model(model_name)
+
+def load_local_model(model_name=DEFAULT_MODEL):
+    """Своя копия модели в процессе (без sidecar)"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def collection_model(client, collection_name):
+    """Модель эмбеддингов коллекции (алиас разрешается); без записи - DEFAULT_MODEL"""
+    meta = read_meta(client, META_KIND, collection_name)
+    return meta["model"] if meta else DEFAULT_MODEL
+
+def save_collection_model(client, collection_name, model_name):
+    write_meta(client, META_KIND, collection_name, {"model": model_name})
+
+def load_embedder(model_name, socket_path=None):
+    """Эмбеддер модели model_name
+
+    Sidecar из $EMBEDDING_SOCKET обслуживает модель по умолчанию: для другой
+    модели берем свою копию, явному socket_path - доверяем оператору.
+    """
+    if model_name != DEFAULT_MODEL and not socket_path:
+        return load_local_model(model_name)
+    return create_embedder(socket_path, model_name)
+
+def embedder_for(client, collection_name, socket_path=None):
+    """Эмбеддер под модель, которой заполнена коллекция"""
+    return load_embedder(collection_model(client, collection_name), socket_path)
+
+class EmbedderRegistry:
+    """Эмбеддеры клиентов поиска по коллекциям: одна копия на модель"""
+
+    def __init__(self, client, socket_path=None, default=None):
+        self.client = client
+        self.socket_path = socket_path
+        self.models = {DEFAULT_MODEL: default} if default is not None else {}
+        self.collections = {}  # коллекция -> имя модели
+
+    def model_name(self, collection_name):
+        if collection_name not in self.collections:
+            self.collections[collection_name] = collection_model(self.client, collection_name)
+        return self.collections[collection_name]
+
+    def load(self, model_name=DEFAULT_MODEL):
+        if model_name not in self.models:
+            self.models[model_name] = load_embedder(model_name, self.socket_path)
+        return self.models[model_name]
+
+    def get(self, collection_name):
+        return self.load(self.model_name(collection_name))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# embedding_sidecar.py - Одна модель эмбеддингов на хост для всех процессоров
+#
+# Принимает запросы encode по Unix socket (протокол - в embedders.py), копит
+# запросы всех клиентов и кодирует их общим micro-batch'ем: батч уходит в модель,
+# когда набралось max_batch текстов или прошло max_wait с первого запроса.
+import os
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+from embedders import (DEFAULT_MODEL, DEFAULT_SOCKET, ERROR_MARKER, HEADER,
+                       RESPONSE_HEADER)
+
+class EmbeddingSidecar:
+    def __init__(self, socket_path=DEFAULT_SOCKET, model_name=DEFAULT_MODEL,
+                 max_batch=256, max_wait=0.01, model=None):
+        from sentence_transformers import SentenceTransformer
+        self.socket_path = socket_path
+        self.model = model or SentenceTransformer(model_name)
+        self.max_batch = max_batch
+        self.max_wait = max_wait  # секунды ожидания добора батча
+
+        self.pending = []  # (texts, future)
+        self.pending_texts = 0
+        self.wakeup = None
+
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self.encode_time = 0.0
+
+    async def read_request(self, reader):
+        (count,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        texts = []
+        for _ in range(count):
+            (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+            texts.append((await reader.readexactly(size)).decode("utf-8"))
+        return texts
+
+    async def handle(self, reader, writer):
+        """Соединение клиента: запросы идут последовательно, ответ - float32"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    texts = await self.read_request(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                future = loop.create_future()
+                self.pending.append((texts, future))
+                self.pending_texts += len(texts)
+                self.requests += 1
+                self.wakeup.set()
+
+                try:
+                    vectors = await future
+                    writer.write(RESPONSE_HEADER.pack(*vectors.shape))
+                    writer.write(vectors.astype("<f4", copy=False).tobytes())
+                except Exception as e:
+                    message = str(e).encode("utf-8")
+                    writer.write(RESPONSE_HEADER.pack(ERROR_MARKER, len(message)) + message)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def batcher(self):
+        """Собираем запросы всех клиентов в один батч модели"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            deadline = loop.time() + self.max_wait
+            while self.pending_texts < self.max_batch and loop.time() < deadline:
+                await asyncio.sleep(min(0.001, self.max_wait))
+
+            batch, self.pending, self.pending_texts = self.pending, [], 0
+            self.wakeup.clear()
+            if not batch:
+                continue
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            start = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(
+                    None, lambda: np.asarray(self.model.encode(texts, batch_size=self.max_batch),
+                                             dtype=np.float32)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.encode_time += time.perf_counter() - start
+            self.batches += 1
+            self.texts += len(texts)
+
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    async def report(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            self.print_stats()
+
+    def print_stats(self):
+        avg = self.texts / self.batches if self.batches else 0
+        rate = self.texts / self.encode_time if self.encode_time else 0
+        print(f"📊 {self.requests} requests, {self.texts} texts in {self.batches} batches "
+              f"(avg {avg:.1f}/batch, {rate:.0f} texts/sec of model time)", file=sys.stderr)
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # сокет от прошлого запуска
+        self.wakeup = asyncio.Event()
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o666)
+        print(f"🧠 Embedding sidecar: {self.socket_path} "
+              f"(batch {self.max_batch}, wait {self.max_wait * 1000:.0f} ms)", file=sys.stderr)
+        tasks = [asyncio.create_task(self.batcher()), asyncio.create_task(self.report())]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding sidecar")
+    parser.add_argument("--socket", default=os.environ.get("EMBEDDING_SOCKET", DEFAULT_SOCKET),
+                       help="Путь Unix socket (клиенты: EMBEDDING_SOCKET)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Модель SentenceTransformer")
+    parser.add_argument("--max-batch", type=int, default=256, help="Максимум текстов в батче")
+    parser.add_argument("--max-wait-ms", type=float, default=10,
+                       help="Сколько ждать добора батча после первого запроса")
+    args = parser.parse_args()
+
+    sidecar = EmbeddingSidecar(args.socket, args.model, args.max_batch, args.max_wait_ms / 1000)
+    try:
+        asyncio.run(sidecar.serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping sidecar...", file=sys.stderr)
+    finally:
+        sidecar.print_stats()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# event_assembler.py - Склейка многострочных событий (stack traces) до эмбеддинга
+import re
+import time
+
+# Строки, которые всегда продолжают текущее событие
+CONTINUATION_PATTERNS = [
+    r'^\s',                                           # отступ: "\tat ...", '  File "..."'
+    r'^(Caused by|Suppressed):',                      # Java цепочки исключений
+    r'^\.\.\. \d+ (more|common frames omitted)',
+    r'^During handling of the above exception',      # Python цепочки исключений
+    r'^The above exception was the direct cause',
+]
+
+# Заголовок Python трейса: продолжает событие только после error-строки или
+# цепочки исключений, иначе начинает новое
+TRACEBACK_PATTERN = re.compile(r'^Traceback \(most recent call last\):')
+
+# Строка с классом исключения: "ValueError: ...", "java.lang.NullPointerException: ..."
+EXCEPTION_PATTERN = re.compile(
+    r'^([A-Za-z_$][\w$]*\.)*[A-Za-z_$][\w$]*(Error|Exception|Throwable|Exit|Interrupt|Warning)\b(:|$)'
+)
+
+# Признак кадра стека (для сжатой "головы" события)
+FRAME_PATTERN = re.compile(r'^\s+(at |File ")')
+
+ERROR_HEAD_PATTERN = re.compile(r'error|exception|fatal|panic|traceback', re.IGNORECASE)
+
+class _PendingEvent:
+    __slots__ = ("lines", "last_seen", "expect_exception")
+
+    def __init__(self, line, now):
+        self.lines = [line]
+        self.last_seen = now
+        # Строка исключения ожидается после error-заголовка или кадров стека
+        self.expect_exception = bool(ERROR_HEAD_PATTERN.search(line))
+
+class EventAssembler:
+    def __init__(self, idle_timeout=1.0, max_lines=200, extra_patterns=None):
+        self.idle_timeout = idle_timeout  # секунды тишины, после которых событие завершено
+        self.max_lines = max_lines        # защита от бесконечных "событий"
+        self.continuation = re.compile(
+            "|".join(CONTINUATION_PATTERNS + list(extra_patterns or []))
+        )
+        self.pending = {}  # source -> _PendingEvent
+
+    def is_continuation(self, line, event):
+        if self.continuation.match(line):
+            return True
+        # Строку исключения и Traceback приклеиваем только сразу после трейса,
+        # error-заголовка или цепочки исключений
+        return event.expect_exception and bool(
+            EXCEPTION_PATTERN.match(line) or TRACEBACK_PATTERN.match(line)
+        )
+
+    def feed(self, line, source="stdin", now=None):
+        """Добавляем строку; возвращаем список завершенных событий"""
+        now = now if now is not None else time.monotonic()
+        event = self.pending.get(source)
+
+        if event is not None and len(event.lines) < self.max_lines \
+                and self.is_continuation(line, event):
+            event.lines.append(line)
+            event.last_seen = now
+            # После строки исключения трейс закончен; после кадров, Traceback,
+            # "Caused by" и цепочек - ждем исключение или следующий Traceback
+            event.expect_exception = not EXCEPTION_PATTERN.match(line)
+            return []
+
+        completed = [] if event is None else ["\n".join(event.lines)]
+        self.pending[source] = _PendingEvent(line, now)
+        return completed
+
+    def flush_idle(self, now=None):
+        """Завершаем события, по которым не было строк дольше idle_timeout"""
+        now = now if now is not None else time.monotonic()
+        idle = [source for source, event in self.pending.items()
+                if now - event.last_seen >= self.idle_timeout]
+        return ["\n".join(self.pending.pop(source).lines) for source in idle]
+
+    def flush_all(self):
+        """Завершаем все незаконченные события (остановка процессора)"""
+        events = ["\n".join(event.lines) for event in self.pending.values()]
+        self.pending.clear()
+        return events
+
+def condense_event(text, max_frames=3, max_chars=512):
+    """Сжатая "голова" события для эмбеддинга: заголовок, исключения, первые кадры"""
+    lines = text.split("\n")
+    if len(lines) == 1:
+        return text[:max_chars]
+
+    head = [lines[0]]
+    frames = []
+    for line in lines[1:]:
+        stripped = line.strip()
+        if EXCEPTION_PATTERN.match(stripped) or stripped.startswith(("Caused by", "Suppressed")):
+            head.append(stripped)
+        elif FRAME_PATTERN.match(line) and len(frames) < max_frames:
+            frames.append(stripped)
+
+    condensed = []
+    for line in head + frames:
+        if line not in condensed:
+            condensed.append(line)
+    return "\n".join(condensed)[:max_chars]
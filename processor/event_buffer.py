@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# event_buffer.py - Буфер событий перед эмбеддингом с бюджетом памяти
+#
+# События хранятся компактными записями (__slots__) в очередях по приоритету,
+# размер каждой записи оценивается при добавлении. При превышении бюджета:
+#   block - буфер принимает событие, процессор перестает читать вход,
+#           пока флаш не освободит место (backpressure в пайп)
+#   spill - новые события пишутся в файл на диске и возвращаются в память,
+#           когда буфер опустеет наполовину; файл переживает перезапуск
+#   drop  - вытесняются самые свежие события худшего приоритета
+# Батч, который не удалось записать, возвращается в начало очереди.
+import os
+import sys
+import json
+from collections import deque
+
+OVERFLOW_MODES = ("block", "spill", "drop")
+
+# Приоритеты уровней без политики маршрутизации (как в DEFAULT_POLICY)
+LEVEL_PRIORITY = {"FATAL": 0, "ERROR": 0, "WARN": 1, "INFO": 2, "DEBUG": 3, "TRACE": 3}
+
+# Поля, которые хранятся в слотах записи; остальное - в extra
+RECORD_FIELDS = ("message", "level", "source", "timestamp", "format", "embed_text", "lines")
+
+# Запись со слотами + ссылки на общие строки level/source/format
+RECORD_OVERHEAD = 160
+
+# Приоритет, который в режиме spill не встает в очередь за диском (ERROR/FATAL)
+SPILL_BYPASS_PRIORITY = 0
+
+def level_priority(level):
+    return LEVEL_PRIORITY.get(str(level).upper(), 2)
+
+class EventRecord:
+    __slots__ = RECORD_FIELDS + ("extra", "priority", "size")
+
+    def __init__(self, message, level, source, timestamp, format="plain", embed_text=None,
+                 lines=1, extra=None, priority=2):
+        self.message = message
+        self.level = level
+        self.source = source
+        self.timestamp = timestamp
+        self.format = format
+        self.embed_text = embed_text
+        self.lines = lines
+        self.extra = extra or None
+        self.priority = priority
+
+        size = RECORD_OVERHEAD + sys.getsizeof(message)
+        if embed_text is not None:
+            size += sys.getsizeof(embed_text)
+        if isinstance(timestamp, str):
+            size += sys.getsizeof(timestamp)
+        if self.extra:
+            size += sys.getsizeof(self.extra) + sum(
+                sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.extra.items()
+            )
+        self.size = size
+
+    @classmethod
+    def from_log(cls, log, priority=2):
+        """dict парсера -> запись; поля вне RECORD_FIELDS уходят в extra"""
+        extra = {k: v for k, v in log.items() if k not in RECORD_FIELDS}
+        return cls(log["message"], log["level"], log["source"], log.get("timestamp"),
+                   log.get("format", "plain"), log.get("embed_text"), log.get("lines", 1),
+                   extra, priority)
+
+    def to_log(self):
+        """Запись -> dict для encode_payload"""
+        log = dict(self.extra) if self.extra else {}
+        log.update(message=self.message, level=self.level, source=self.source,
+                   timestamp=self.timestamp, format=self.format)
+        if self.embed_text is not None:
+            log["embed_text"] = self.embed_text
+        if self.lines > 1:
+            log["lines"] = self.lines
+        return log
+
+    @property
+    def text(self):
+        """Текст для эмбеддинга"""
+        return self.embed_text if self.embed_text is not None else self.message
+
+class EventBuffer:
+    def __init__(self, max_bytes=64 * 1024 * 1024, overflow="block", spill_path=None):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_MODES}, got {overflow!r}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("overflow='spill' requires spill_path")
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.spill_path = spill_path
+
+        self.queues = {}  # priority -> deque[EventRecord]
+        self.count = 0
+        self.bytes = 0
+        self.peak_bytes = 0
+
+        self.dropped = 0
+        self.spilled = 0
+        self.spill_pending = 0
+        self.spill_file = None
+        self.spill_offset = 0
+
+        if overflow == "spill" and os.path.exists(spill_path):
+            # События, не записанные до прошлой остановки
+            self.spill_file = open(spill_path, "a+", encoding="utf-8")
+            self.spill_file.seek(0)
+            self.spill_pending = sum(1 for _ in self.spill_file)
+
+    def __len__(self):
+        return self.count + self.spill_pending
+
+    @property
+    def over_budget(self):
+        return self.bytes > self.max_bytes
+
+    def _push(self, record, front=False):
+        queue = self.queues.get(record.priority)
+        if queue is None:
+            queue = self.queues[record.priority] = deque()
+        if front:
+            queue.appendleft(record)
+        else:
+            queue.append(record)
+        self.count += 1
+        self.bytes += record.size
+        if self.bytes > self.peak_bytes:
+            self.peak_bytes = self.bytes
+
+    def _pop(self, worst=False):
+        priorities = [p for p, queue in self.queues.items() if queue]
+        if not priorities:
+            return None
+        if worst:
+            record = self.queues[max(priorities)].pop()
+        else:
+            record = self.queues[min(priorities)].popleft()
+        self.count -= 1
+        self.bytes -= record.size
+        return record
+
+    def append(self, record):
+        """Добавляем событие; возвращаем вытесненные записи (режим drop)"""
+        if self.overflow == "spill":
+            if record.priority <= SPILL_BYPASS_PRIORITY:
+                # Важные события не ждут за очередью на диске: место в памяти
+                # освобождаем, вытесняя на диск самые свежие из худшего приоритета.
+                # В потоке одних ERROR/FATAL на диск уходят и они - бюджет держится
+                self._push(record)
+                while self.bytes > self.max_bytes:
+                    self._spill(self._pop(worst=True))
+                return []
+            if self.spill_pending or self.bytes + record.size > self.max_bytes:
+                # Пока на диске есть события, новые тоже идут туда - порядок сохраняется
+                self._spill(record)
+                return []
+
+        self._push(record)
+        evicted = []
+        if self.overflow == "drop":
+            while self.bytes > self.max_bytes:
+                evicted.append(self._pop(worst=True))
+            self.dropped += len(evicted)
+        return evicted
+
+    def take(self, limit):
+        """До limit событий для батча: сначала важные уровни"""
+        self._unspill()
+        batch = []
+        while len(batch) < limit:
+            record = self._pop()
+            if record is None:
+                break
+            batch.append(record)
+        return batch
+
+    def requeue(self, records):
+        """Батч не записан - возвращаем в начало очередей"""
+        for record in reversed(records):
+            self._push(record, front=True)
+
+    def _spill(self, record):
+        if self.spill_file is None:
+            self.spill_file = open(self.spill_path, "a+", encoding="utf-8")
+        log = record.to_log()
+        log["_priority"] = record.priority
+        self.spill_file.write(json.dumps(log, ensure_ascii=False, default=str) + "\n")
+        self.spill_pending += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        """Возвращаем события с диска, когда в памяти освободилась половина бюджета"""
+        if not self.spill_pending or self.bytes > self.max_bytes // 2:
+            return
+        self.spill_file.flush()
+        self.spill_file.seek(self.spill_offset)
+        while self.spill_pending and self.bytes < self.max_bytes // 2:
+            line = self.spill_file.readline()
+            if not line:
+                break
+            log = json.loads(line)
+            self._push(EventRecord.from_log(log, log.pop("_priority", 2)))
+            self.spill_pending -= 1
+        self.spill_offset = self.spill_file.tell()
+
+        if not self.spill_pending:
+            self.spill_file.seek(0)
+            self.spill_file.truncate()
+            self.spill_offset = 0
+
+    def close(self):
+        """В режиме spill незаписанное из памяти уходит на диск до следующего запуска
+
+        Файл переписывается целиком: уже прочитанное начало (до spill_offset)
+        отбрасывается, иначе после перезапуска записанные события вернулись бы.
+        """
+        if self.overflow == "spill" and (self.count or self.spill_offset):
+            remaining = []
+            if self.spill_file is not None:
+                self.spill_file.flush()
+                self.spill_file.seek(self.spill_offset)
+                remaining = self.spill_file.readlines()
+                self.spill_file.close()
+                self.spill_file = None
+            tmp = self.spill_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                # Сначала события из памяти (они старше и важнее), затем остаток с диска
+                while self.count:
+                    record = self._pop()
+                    log = record.to_log()
+                    log["_priority"] = record.priority
+                    f.write(json.dumps(log, ensure_ascii=False, default=str) + "\n")
+                    self.spill_pending += 1
+                    self.spilled += 1
+                f.writelines(remaining)
+            os.replace(tmp, self.spill_path)
+            self.spill_offset = 0
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+        if self.overflow == "spill" and not self.spill_pending and os.path.exists(self.spill_path):
+            os.unlink(self.spill_path)
+
+    def stats(self):
+        return {
+            "events": len(self),
+            "bytes": self.bytes,
+            "peak_bytes": self.peak_bytes,
+            "max_bytes": self.max_bytes,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "spill_pending": self.spill_pending,
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# fanout_search.py - Один запрос сразу по многим коллекциям сервисов
+#
+# Коллекции выбираются glob-шаблонами (--collections "nginx-*,node-app")
+# или через алиасы (--aliases "logs-*"). Эмбеддинг запроса считается один раз
+# на модель коллекций (semlog-meta, обычно одна),
+# поиск по всем коллекциям идет параллельно через async клиент, у каждой
+# коллекции свой таймаут; результаты сливаются в общий top-k по score.
+import sys
+import time
+import heapq
+import asyncio
+from fnmatch import fnmatch
+from datetime import datetime, timedelta
+from storage_backend import create_async_client
+from payload_schema import build_filter, decode_results
+from collection_meta import META_COLLECTION, read_meta_async
+from projection import load_projection_async
+from bulk_load import META_KIND as BULK_LOAD_KIND, tail_parts, merge_hits
+from embedders import META_KIND as EMBEDDING_KIND, DEFAULT_MODEL, load_local_model
+
+def split_patterns(value):
+    """'a-*,b' / ['a-*', 'b'] -> ['a-*', 'b']"""
+    if isinstance(value, str):
+        value = [value]
+    return [p.strip() for item in value for p in item.split(",") if p.strip()]
+
+class FanoutSearch:
+    def __init__(self, location=None, port=6333, model=None, timeout=2.0):
+        self.client = create_async_client(location, port)
+        self.models = {DEFAULT_MODEL: model}  # имя модели -> эмбеддер
+        self.model_names = {}   # коллекция -> имя модели
+        self.timeout = timeout  # секунды на одну коллекцию
+        self.projections = {}   # коллекция -> Projection / None
+        self.tails = {}         # коллекция -> граница хвоста bulk-load / None
+
+    async def resolve_collections(self, patterns):
+        """Имена коллекций, подходящие под glob-шаблоны"""
+        response = await self.client.get_collections()
+        names = sorted(c.name for c in response.collections if c.name != META_COLLECTION)
+        return [name for name in names if any(fnmatch(name, p) for p in patterns)]
+
+    async def resolve_aliases(self, patterns):
+        """Алиасы, подходящие под шаблоны (запрос идет в коллекцию за алиасом)"""
+        # Встроенное хранилище алиасов не знает - ни один шаблон не совпадет
+        if not hasattr(self.client, "get_aliases"):
+            print("⚠️  Storage backend has no aliases, use --collections", file=sys.stderr)
+            return []
+        response = await self.client.get_aliases()
+        names = sorted(a.alias_name for a in response.aliases)
+        return [name for name in names if any(fnmatch(name, p) for p in patterns)]
+
+    async def project(self, collection_name, query_vector):
+        """Вектор запроса под PCA проекцию коллекции, если она есть"""
+        if collection_name not in self.projections:
+            self.projections[collection_name] = await load_projection_async(self.client, collection_name)
+        projection = self.projections[collection_name]
+        return projection.apply(query_vector).tolist() if projection else query_vector
+
+    async def model_name(self, collection_name):
+        """Модель, которой заполнена коллекция (reindex.py), читается один раз"""
+        if collection_name not in self.model_names:
+            meta = await read_meta_async(self.client, EMBEDDING_KIND, collection_name)
+            self.model_names[collection_name] = meta["model"] if meta else DEFAULT_MODEL
+        return self.model_names[collection_name]
+
+    async def embed(self, query, model_name):
+        if self.models.get(model_name) is None:
+            self.models[model_name] = await asyncio.to_thread(load_local_model, model_name)
+        return self.models[model_name].encode(query).tolist()
+
+    async def tail_since(self, collection_name):
+        """Граница непроиндексированного хвоста коллекции (bulk_load.py), читается один раз"""
+        if collection_name not in self.tails:
+            meta = await read_meta_async(self.client, BULK_LOAD_KIND, collection_name)
+            self.tails[collection_name] = meta["since"] if meta else None
+        return self.tails[collection_name]
+
+    async def query_one(self, collection_name, query_vector, search_filter, limit, min_score):
+        query_vector = await self.project(collection_name, query_vector)
+        parts = tail_parts(search_filter, await self.tail_since(collection_name))
+        responses = await asyncio.gather(*[
+            self.client.search(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                query_filter=part_filter,
+                search_params=params,
+                limit=limit,
+                with_payload=True,
+                score_threshold=min_score
+            )
+            for part_filter, params in parts
+        ])
+        return merge_hits(responses, limit)
+
+    async def search_one(self, collection_name, query_vector, search_filter, limit, min_score):
+        """Поиск в одной коллекции: (результаты, отчет с латентностью и статусом)"""
+        start = time.perf_counter()
+        report = {"collection": collection_name, "status": "ok", "hits": 0}
+        results = []
+        try:
+            # Чтение проекции и границы хвоста тоже идет в хранилище - под тем же таймаутом
+            results = await asyncio.wait_for(
+                self.query_one(collection_name, query_vector, search_filter, limit, min_score),
+                timeout=self.timeout
+            )
+            report["hits"] = len(results)
+        except asyncio.TimeoutError:
+            report["status"] = "timeout"
+        except Exception as e:
+            report["status"] = "error"
+            report["error"] = str(e)
+        report["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return results, report
+
+    async def search(self, query, collections, limit=10, min_score=0.3,
+                     level=None, source=None, hours=None):
+        """Общий top-k по всем коллекциям: ([(collection, result)], [отчеты])"""
+        model_names = await asyncio.gather(*[self.model_name(name) for name in collections])
+        vectors = {model_name: await self.embed(query, model_name) for model_name in set(model_names)}
+        since = datetime.now() - timedelta(hours=hours) if hours else None
+        search_filter = build_filter(level=level, source=source, since=since)
+
+        # Каждой коллекции нужен полный limit, иначе глобальный top-k неточен
+        responses = await asyncio.gather(*[
+            self.search_one(name, vectors[model_name], search_filter, limit, min_score)
+            for name, model_name in zip(collections, model_names)
+        ])
+
+        candidates = [
+            (name, result)
+            for name, (results, _) in zip(collections, responses)
+            for result in results
+        ]
+        merged = heapq.nlargest(limit, candidates, key=lambda item: item[1].score)
+        decode_results([result for _, result in merged])
+        return merged, [report for _, report in responses]
+
+    async def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+async def fanout_search(query, patterns=None, aliases=None, location=None, model=None,
+                        timeout=2.0, **search_kwargs):
+    """Разрешаем коллекции/алиасы и выполняем поиск; для CLI и скриптов"""
+    searcher = FanoutSearch(location, model=model, timeout=timeout)
+    try:
+        if aliases:
+            targets = await searcher.resolve_aliases(split_patterns(aliases))
+        else:
+            targets = await searcher.resolve_collections(split_patterns(patterns))
+        if not targets:
+            return [], []
+        return await searcher.search(query, targets, **search_kwargs)
+    finally:
+        await searcher.close()
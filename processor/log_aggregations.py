@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# log_aggregations.py - Гистограммы и facet-счетчики без выгрузки точек
+#
+# "ERROR в минуту по источникам за 6 часов" считается запросами count/facet
+# по индексированным полям ts/lvl/src: один запрос на корзину времени,
+# все корзины параллельно через async клиент. Payload и векторы не читаются.
+#
+# Закрытые корзины (целиком в прошлом с запасом на опоздавшие события) больше
+# не меняются и кэшируются в процессе: повторный график за те же 6 часов
+# запрашивает у хранилища только последние корзины.
+import time
+import asyncio
+from collections import OrderedDict
+from storage_backend import create_async_client
+from payload_schema import build_filter, to_epoch_ms, level_name
+
+# Поля, по которым строятся facet-разбивки
+FACET_FIELDS = {"source": "src", "level": "lvl"}
+
+def facet_field(name):
+    """source/level -> поле компактной схемы; src/lvl проходят как есть"""
+    if name in FACET_FIELDS.values():
+        return name
+    if name not in FACET_FIELDS:
+        raise ValueError(f"Unknown facet field: {name} (expected one of {', '.join(FACET_FIELDS)})")
+    return FACET_FIELDS[name]
+
+def _value_name(field, value):
+    return level_name(value) if field == "lvl" else value
+
+class LogAggregator:
+    def __init__(self, client, max_concurrency=16, settle=60.0, cache_size=50000, top=20):
+        self.client = client                  # async клиент (create_async_client)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.settle = settle                  # сек после конца корзины до ее "закрытия"
+        self.cache_size = cache_size
+        self.top = top                        # значений в facet-разбивке корзины
+        self.buckets = OrderedDict()          # ключ корзины -> (count, {значение: count})
+        self.cache_hits = 0
+        self.queries = 0
+
+    async def _count(self, collection_name, bucket_filter):
+        async with self.semaphore:
+            self.queries += 1
+            response = await self.client.count(
+                collection_name=collection_name, count_filter=bucket_filter, exact=True
+            )
+        return response.count
+
+    async def _facet(self, collection_name, field, bucket_filter, limit):
+        async with self.semaphore:
+            self.queries += 1
+            response = await self.client.facet(
+                collection_name=collection_name, key=field, facet_filter=bucket_filter,
+                limit=limit, exact=True
+            )
+        return {_value_name(field, hit.value): hit.count for hit in response.hits}
+
+    async def count_bucket(self, collection_name, start, end, level=None, source=None, field=None):
+        """(количество, разбивка) за [start, end) мс; закрытые корзины - из кэша"""
+        key = (collection_name, start, end, level, source, field)
+        cached = self.buckets.get(key)
+        if cached is not None:
+            self.buckets.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+
+        bucket_filter = build_filter(level=level, source=source, since=start, until=end)
+        if field:
+            count, groups = await asyncio.gather(
+                self._count(collection_name, bucket_filter),
+                self._facet(collection_name, field, bucket_filter, self.top),
+            )
+        else:
+            count, groups = await self._count(collection_name, bucket_filter), {}
+
+        if end <= (time.time() - self.settle) * 1000:
+            self.buckets[key] = (count, groups)
+            while len(self.buckets) > self.cache_size:
+                self.buckets.popitem(last=False)
+        return count, groups
+
+    async def histogram(self, collection_name, since, until=None, bucket=60,
+                        level=None, source=None, group_by=None):
+        """Гистограмма по времени: корзины по bucket секунд, выровненные по эпохе
+
+        since/until - datetime/ISO/epoch ms; group_by - source/level для разбивки.
+        """
+        step = int(bucket * 1000)
+        until_ms = to_epoch_ms(until) if until is not None else int(time.time() * 1000)
+        # Выравнивание по эпохе: одинаковые границы между запусками -> попадания в кэш
+        start_ms = to_epoch_ms(since) // step * step
+        edges = list(range(start_ms, until_ms, step))
+        field = facet_field(group_by) if group_by else None
+
+        started = time.perf_counter()
+        hits_before, queries_before = self.cache_hits, self.queries
+        counts = await asyncio.gather(*[
+            self.count_bucket(collection_name, edge, edge + step, level, source, field)
+            for edge in edges
+        ])
+
+        buckets = [
+            {"start": edge, "end": edge + step, "count": count, "groups": groups}
+            for edge, (count, groups) in zip(edges, counts)
+        ]
+        totals = {}
+        for item in buckets:
+            for value, count in item["groups"].items():
+                totals[value] = totals.get(value, 0) + count
+
+        return {
+            "collection": collection_name,
+            "bucket": bucket,
+            "group_by": group_by,
+            "buckets": buckets,
+            "total": sum(item["count"] for item in buckets),
+            "groups": dict(sorted(totals.items(), key=lambda item: -item[1])),
+            "stats": {
+                "buckets": len(buckets),
+                "cached": self.cache_hits - hits_before,
+                "queries": self.queries - queries_before,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            },
+        }
+
+    async def facet(self, collection_name, group_by, since=None, until=None,
+                    level=None, source=None, limit=20):
+        """Счетчики значений поля за период одним запросом (без корзин)"""
+        field = facet_field(group_by)
+        return await self._facet(collection_name, field,
+                                 build_filter(level=level, source=source, since=since, until=until),
+                                 limit)
+
+    async def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+async def log_histogram(collection_name, since, location=None, **kwargs):
+    """Разовая гистограмма для CLI и скриптов (свой async клиент)"""
+    aggregator = LogAggregator(create_async_client(location))
+    try:
+        return await aggregator.histogram(collection_name, since, **kwargs)
+    finally:
+        await aggregator.close()
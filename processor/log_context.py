@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# log_context.py - Соседние события вокруг найденных логов (как grep -C)
+#
+# Соседи ищутся по (src, ts): фильтр по источнику + сортировка по индексу ts.
+# Для всех хитов - один query_batch_points (по два запроса на хит: до и после),
+# векторы не запрашиваются. Если Query API нет (Qdrant < 1.10, embedded хранилище) -
+# по scroll с order_by на каждый хит.
+# (src, ts) хитов читаются одним retrieve из сырого payload: декодированный
+# timestamp - локальное время без зоны, по нему ts не восстановить.
+from qdrant_client import models
+from payload_schema import to_epoch_ms, decode_results
+
+def _context_filter(source, ts, hit_id, before):
+    # События с тем же ts, что у хита, попадают в "до"; сам хит исключаем
+    ts_range = models.Range(lte=ts) if before else models.Range(gt=ts)
+    return models.Filter(
+        must=[
+            models.FieldCondition(key="src", match=models.MatchValue(value=source)),
+            models.FieldCondition(key="ts", range=ts_range),
+        ],
+        must_not=[models.HasIdCondition(has_id=[hit_id])],
+    )
+
+def _order(before):
+    return models.OrderBy(
+        key="ts", direction=models.Direction.DESC if before else models.Direction.ASC
+    )
+
+def _anchor(payload):
+    """(src, ts epoch ms) по сырому payload точки"""
+    payload = payload or {}
+    if payload.get("ts") is not None:
+        return payload.get("src", "unknown"), payload["ts"]
+    # Старый читаемый формат без компактных полей
+    if payload.get("timestamp") is None:
+        return None
+    return payload.get("source", "unknown"), to_epoch_ms(payload["timestamp"])
+
+def _raw_anchors(client, collection_name, hits):
+    """hit.id -> (src, ts) хитов
+
+    Хиты обычно уже декодированы: timestamp там - ISO строка локального
+    времени, обратное преобразование неточно. src/ts берем у самих точек.
+    """
+    records = client.retrieve(collection_name=collection_name, ids=[hit.id for hit in hits],
+                              with_payload=["src", "ts", "source", "timestamp"],
+                              with_vectors=False)
+    return {record.id: _anchor(record.payload) for record in records}
+
+def fetch_context(client, collection_name, hits, before=20, after=20):
+    """hit.id -> {"before": [...], "after": [...]} в хронологическом порядке"""
+    plan = []  # (hit_id, side, filter, order_by, limit)
+    anchors = _raw_anchors(client, collection_name, hits) if hits else {}
+    for hit in hits:
+        anchor = anchors.get(hit.id)
+        if anchor is None:
+            continue
+        source, ts = anchor
+        if before:
+            plan.append((hit.id, "before", _context_filter(source, ts, hit.id, True), _order(True), before))
+        if after:
+            plan.append((hit.id, "after", _context_filter(source, ts, hit.id, False), _order(False), after))
+
+    context = {hit.id: {"before": [], "after": []} for hit in hits}
+    if not plan:
+        return context
+
+    pages = None
+    if hasattr(client, "query_batch_points"):
+        try:
+            responses = client.query_batch_points(
+                collection_name=collection_name,
+                requests=[
+                    models.QueryRequest(
+                        query=models.OrderByQuery(order_by=order_by), filter=query_filter,
+                        limit=limit, with_payload=True, with_vector=False,
+                    )
+                    for _, _, query_filter, order_by, limit in plan
+                ],
+            )
+            pages = [response.points for response in responses]
+        except Exception:
+            pages = None  # сервер без Query API - ниже fallback
+
+    if pages is None:
+        pages = [
+            client.scroll(
+                collection_name=collection_name, scroll_filter=query_filter, limit=limit,
+                order_by=order_by, with_payload=True, with_vectors=False,
+            )[0]
+            for _, _, query_filter, order_by, limit in plan
+        ]
+
+    for (hit_id, side, _, _, _), points in zip(plan, pages):
+        points = decode_results(list(points))
+        if side == "before":
+            points.reverse()  # шли по убыванию ts
+        context[hit_id][side] = points
+    return context
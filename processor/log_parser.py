@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# log_parser.py - Разбор строк логов: диспетчеризация по первому символу
+#
+#   '{'   -> JSON (все поля верхнего уровня переносятся в payload с типами)
+#   '['   -> [LEVEL] timestamp message
+#   цифра -> nginx/apache access log или "2024-01-15 10:30:00 LEVEL message"
+#   иначе -> plain текст с авто-определением уровня
+import re
+import json
+import time
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson опционален, стандартный json медленнее в разы
+    _loads = json.loads
+
+from payload_schema import RESERVED_FIELDS, LOG_FIELDS
+
+BRACKET_PATTERN = re.compile(
+    r'^\[(\w+)\]\s+(\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)\s+(.+)$'
+)
+WEB_PATTERN = re.compile(
+    r'^(\d{1,3}(?:\.\d{1,3}){3})\S*\s+\S+\s+\S+\s+\[([^\]]+)\]\s+'
+    r'"(GET|POST|PUT|DELETE|PATCH|HEAD|OPTIONS)\s+(\S+)[^"]*"'
+    r'(?:\s+(\d{3})\s+(\d+|-))?'
+)
+TIMESTAMPED_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)\s+'
+    r'\[?(TRACE|DEBUG|INFO|NOTICE|WARN|WARNING|ERROR|FATAL|CRITICAL)\]?:?\s+(.*)$',
+    re.IGNORECASE
+)
+
+ERROR_WORDS = re.compile(r'error|exception|failed|fatal|crash|panic', re.IGNORECASE)
+WARN_WORDS = re.compile(r'warn|deprecated|slow|timeout', re.IGNORECASE)
+DEBUG_WORDS = re.compile(r'debug|trace|verbose', re.IGNORECASE)
+
+# Синонимы основных полей в JSON логах разных библиотек
+JSON_MESSAGE_KEYS = ("message", "msg", "log", "text")
+JSON_LEVEL_KEYS = ("level", "severity", "levelname", "lvl")
+JSON_TIME_KEYS = ("timestamp", "time", "@timestamp", "ts")
+JSON_SOURCE_KEYS = ("source", "service", "logger", "app")
+
+# Поля, которые процессор добавляет сам и которые JSON не должен перетирать
+INTERNAL_FIELDS = {"lines", "embed_text", "client_ip"}
+
+def _first(data, keys):
+    for key in keys:
+        value = data.get(key)
+        if value is not None:
+            return key, value
+    return None, None
+
+class LogParser:
+    def __init__(self, default_source="stdin"):
+        self.default_source = default_source
+        self.taken_fields = RESERVED_FIELDS | LOG_FIELDS | INTERNAL_FIELDS
+
+    def parse(self, line):
+        """Строка лога -> dict(message, level, timestamp, source, format, ...)"""
+        line = line.strip()
+        first = line[:1]
+
+        if first == "{":
+            parsed = self.parse_json(line)
+        elif first == "[":
+            parsed = self.parse_bracket(line)
+        elif first.isdigit():
+            parsed = self.parse_web(line) or self.parse_timestamped(line)
+        else:
+            parsed = None
+
+        return parsed or self.parse_plain(line)
+
+    def parse_json(self, line):
+        """JSON лог: основные поля по синонимам, остальные - как есть"""
+        try:
+            data = _loads(line)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        message_key, message = _first(data, JSON_MESSAGE_KEYS)
+        level_key, level = _first(data, JSON_LEVEL_KEYS)
+        time_key, timestamp = _first(data, JSON_TIME_KEYS)
+        source_key, source = _first(data, JSON_SOURCE_KEYS)
+
+        log = {
+            "message": message if isinstance(message, str) else line,
+            "level": str(level).upper() if level is not None else self.detect_log_level(line),
+            "timestamp": timestamp if timestamp is not None else time.time(),
+            "source": str(source) if source is not None else "unknown",
+            "format": "json",
+        }
+
+        # service/logger остаются отдельными полями, даже если пошли в source
+        consumed = {message_key, level_key, time_key, "source"}
+        for key, value in data.items():
+            if key in consumed:
+                continue
+            # Конфликт с полями схемы - сохраняем под префиксом
+            log[f"json_{key}" if key in self.taken_fields else key] = value
+        return log
+
+    def parse_bracket(self, line):
+        """[LEVEL] timestamp message"""
+        match = BRACKET_PATTERN.match(line)
+        if not match:
+            return None
+        return {
+            "message": match.group(3),
+            "level": match.group(1).upper(),
+            "timestamp": match.group(2),
+            "source": "application",
+            "format": "bracketed"
+        }
+
+    def parse_web(self, line):
+        """nginx/apache access log; уровень по HTTP статусу"""
+        match = WEB_PATTERN.match(line)
+        if not match:
+            return None
+        log = {
+            "message": line,
+            "level": "INFO",
+            "timestamp": match.group(2),
+            "source": "web_server",
+            "client_ip": match.group(1),
+            "format": "web",
+            "method": match.group(3),
+            "path": match.group(4),
+        }
+        if match.group(5):
+            status = int(match.group(5))
+            log["status"] = status
+            log["level"] = "ERROR" if status >= 500 else "WARN" if status >= 400 else "INFO"
+        if match.group(6) and match.group(6) != "-":
+            log["bytes"] = int(match.group(6))
+        return log
+
+    def parse_timestamped(self, line):
+        """2024-01-15 10:30:00 ERROR message"""
+        match = TIMESTAMPED_PATTERN.match(line)
+        if not match:
+            return None
+        return {
+            "message": match.group(3),
+            "level": match.group(2).upper(),
+            "timestamp": match.group(1),
+            "source": "application",
+            "format": "timestamped"
+        }
+
+    def parse_plain(self, line):
+        """Fallback: простой текст"""
+        return {
+            "message": line,
+            "level": self.detect_log_level(line),
+            "timestamp": time.time(),
+            "source": self.default_source,
+            "format": "plain"
+        }
+
+    def detect_log_level(self, message):
+        """Авто-определение уровня лога"""
+        if ERROR_WORDS.search(message):
+            return "ERROR"
+        if WARN_WORDS.search(message):
+            return "WARN"
+        if DEBUG_WORDS.search(message):
+            return "DEBUG"
+        return "INFO"
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# log_templates.py - Шаблоны сообщений: переменные части заменяются плейсхолдерами
+import re
+import zlib
+
+TEMPLATE_PATTERNS = [
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '<uuid>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), '<ip>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b|\b[0-9a-fA-F]{12,}\b'), '<hex>'),
+    (re.compile(r'"[^"]*"|\'[^\']*\''), '<str>'),
+    (re.compile(r'\d+(?:\.\d+)?'), '<num>'),
+]
+
+def message_template(message, max_chars=256):
+    """'User 42 logged in from 10.0.0.1' -> 'User <num> logged in from <ip>'"""
+    template = message[:max_chars]
+    for pattern, placeholder in TEMPLATE_PATTERNS:
+        template = pattern.sub(placeholder, template)
+    return template
+
+def template_id(message):
+    """Стабильный числовой id шаблона (для payload и счетчиков)"""
+    return zlib.crc32(message_template(message).encode("utf-8"))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# migrate_payloads.py - Перевод коллекции на компактную схему payload
+import sys
+import json
+import argparse
+from qdrant_client import models
+from storage_backend import create_client, default_location
+from payload_schema import encode_payload, create_payload_indexes
+
+VECTOR_JSON_BYTES_PER_DIM = 10  # ~ "-0.0123456," в JSON теле upsert
+
+def payload_bytes(payload):
+    return len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+class PayloadMigrator:
+    def __init__(self, client, collection_name, compress_threshold=None, batch_size=256):
+        self.client = client
+        self.collection_name = collection_name
+        self.compress_threshold = compress_threshold
+        self.batch_size = batch_size
+
+        # Объемы считаем только по переписанным точкам
+        self.stats = {"scanned": 0, "migrated": 0, "bytes_before": 0, "bytes_after": 0}
+
+    def convert(self, payload):
+        """Старый payload -> компактный (None если уже в новой схеме)"""
+        if not payload or "v" in payload:
+            return None
+        return encode_payload(payload, self.compress_threshold)
+
+    def write(self, updates):
+        """Перезаписываем payload пачкой; без вектора, если бэкенд умеет"""
+        if not updates:
+            return
+        if hasattr(self.client, "batch_update_points"):
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    models.OverwritePayloadOperation(
+                        overwrite_payload=models.SetPayload(payload=payload, points=[point.id])
+                    )
+                    for point, payload in updates
+                ]
+            )
+        else:
+            # Встроенное хранилище append-only: переписываем точку целиком
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    models.PointStruct(id=point.id, vector=point.vector, payload=payload)
+                    for point, payload in updates
+                ]
+            )
+
+    def run(self, dry_run=False, sample=None):
+        """Проходим коллекцию scroll'ом; dry_run/sample - только оценка"""
+        need_vectors = not hasattr(self.client, "batch_update_points")
+        offset = None
+
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=need_vectors and not dry_run
+            )
+
+            updates = []
+            for point in points:
+                self.stats["scanned"] += 1
+                converted = self.convert(point.payload)
+                if converted is None:
+                    continue
+                self.stats["bytes_before"] += payload_bytes(point.payload)
+                self.stats["bytes_after"] += payload_bytes(converted)
+                updates.append((point, converted))
+
+            if not dry_run:
+                self.write(updates)
+            self.stats["migrated"] += len(updates)
+
+            print(f"🔄 Scanned {self.stats['scanned']} points, "
+                  f"{'would migrate' if dry_run else 'migrated'} {self.stats['migrated']}",
+                  file=sys.stderr)
+
+            if offset is None or (sample and self.stats["scanned"] >= sample):
+                break
+
+        if not dry_run:
+            create_payload_indexes(self.client, self.collection_name,
+                                   ttl=self.has_ttl())
+        return self.report()
+
+    def has_ttl(self):
+        points, _ = self.client.scroll(collection_name=self.collection_name, limit=1,
+                                       with_payload=True)
+        return bool(points) and "exp" in (points[0].payload or {})
+
+    def report(self):
+        """Сравнение объема payload и трафика upsert до/после"""
+        migrated = max(self.stats["migrated"], 1)
+        info = self.client.get_collection(self.collection_name)
+        dim = info.config.params.vectors.size
+        vector_bytes = dim * VECTOR_JSON_BYTES_PER_DIM
+        total = info.points_count or self.stats["scanned"]
+
+        before = self.stats["bytes_before"] / migrated
+        after = self.stats["bytes_after"] / migrated
+        return {
+            "collection": self.collection_name,
+            "scanned": self.stats["scanned"],
+            "migrated": self.stats["migrated"],
+            "payload_bytes_per_point": {"before": round(before, 1), "after": round(after, 1)},
+            "payload_saving": round(1 - after / before, 3) if before else 0.0,
+            "estimated_payload_storage_mb": {
+                "before": round(before * total / 2**20, 2),
+                "after": round(after * total / 2**20, 2),
+            },
+            "upsert_body_bytes_per_point": {
+                "before": round(before + vector_bytes, 1),
+                "after": round(after + vector_bytes, 1),
+            },
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate payloads to the compact schema")
+    parser.add_argument("collection", help="Имя коллекции")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL или embedded:/path")
+    parser.add_argument("--compress-threshold", type=int,
+                       help="Сжимать zstd сообщения длиннее N байт")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true",
+                       help="Только оценить экономию, ничего не переписывать")
+    parser.add_argument("--sample", type=int, help="Оценка по первым N точкам (с --dry-run)")
+    args = parser.parse_args()
+
+    migrator = PayloadMigrator(create_client(args.location), args.collection,
+                               args.compress_threshold, args.batch_size)
+    report = migrator.run(dry_run=args.dry_run, sample=args.sample if args.dry_run else None)
+    print("📊 Payload comparison:")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,351 @@
 #!/usr/bin/env python3
-# monitor_processor.py - Мониторинг состояния процессора
+# monitor_processor.py - Мониторинг коллекций Qdrant и процессоров
+#
+# Каждый интервал все коллекции опрашиваются параллельно (aiohttp): статус,
+# оптимизатор, сегменты, проиндексировано/всего векторов и латентность
+# canary поиска (случайный вектор, limit=1). По приросту points_count между
+# опросами ловится остановившаяся запись. Итог - Prometheus метрики
+# (--metrics-port) и компактная таблица в терминале.
+# Просадка throughput процессоров - по их /metrics (ThroughputMonitor).
 import time
-import requests
+import random
+import asyncio
+import argparse
 from datetime import datetime
+import aiohttp
+from prometheus_client import Gauge, Enum, start_http_server
+from prometheus_client.parser import text_string_to_metric_families
+from collection_meta import META_COLLECTION
 
-def check_processor_health():
-    """Проверка здоровья Qdrant и коллекций"""
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=5)
+STATUSES = ["green", "yellow", "grey", "red", "error"]
+
+QDRANT_UP = Gauge(
+    "semlog_qdrant_up",
+    "Qdrant отвечает на /collections"
+)
+COLLECTION_STATUS = Enum(
+    "semlog_collection_status",
+    "Статус коллекции (error - коллекция не ответила)",
+    ["collection"],
+    states=STATUSES
+)
+OPTIMIZER_OK = Gauge(
+    "semlog_collection_optimizer_ok",
+    "Оптимизатор коллекции без ошибок",
+    ["collection"]
+)
+SEGMENTS = Gauge(
+    "semlog_collection_segments",
+    "Сегментов в коллекции",
+    ["collection"]
+)
+POINTS = Gauge(
+    "semlog_collection_points",
+    "Точек в коллекции",
+    ["collection"]
+)
+INDEXED_VECTORS = Gauge(
+    "semlog_collection_indexed_vectors",
+    "Векторов в HNSW индексе",
+    ["collection"]
+)
+POINTS_RATE = Gauge(
+    "semlog_collection_points_rate",
+    "Прирост точек в секунду между опросами",
+    ["collection"]
+)
+STALLED = Gauge(
+    "semlog_collection_stalled",
+    "Запись в коллекцию остановилась (points_count не растет)",
+    ["collection"]
+)
+CANARY_LATENCY = Gauge(
+    "semlog_canary_search_seconds",
+    "Латентность canary поиска",
+    ["collection"]
+)
+
+async def fetch_result(session, method, url, **kwargs):
+    """JSON поле result ответа Qdrant REST API"""
+    async with session.request(method, url, **kwargs) as response:
+        response.raise_for_status()
+        return (await response.json())["result"]
+
+def _optimizer_state(value):
+    """optimizer_status: "ok" или {"error": "..."}"""
+    if isinstance(value, dict):
+        return f"error: {value.get('error', value)}"
+    return value or "unknown"
+
+def _canary_query(info):
+    """Тело canary поиска под конфиг векторов коллекции (None - не знаем размерность)"""
+    vectors = info.get("config", {}).get("params", {}).get("vectors") or {}
+    name = None
+    if "size" not in vectors and vectors:
+        # Именованные векторы - ищем по первому
+        name, vectors = next(iter(vectors.items()))
+    size = vectors.get("size")
+    if not size:
+        return None
+    vector = [random.gauss(0, 1) for _ in range(size)]
+    return {"vector": {"name": name, "vector": vector} if name else vector,
+            "limit": 1, "with_payload": False, "with_vector": False}
+
+class CollectionProbe:
+    def __init__(self, qdrant_url="http://localhost:6333", stall_after=300.0, canary=True):
+        self.qdrant_url = qdrant_url.rstrip("/")
+        self.stall_after = stall_after  # сек без прироста точек -> stalled
+        self.canary = canary
+        self.last_points = {}   # коллекция -> (points_count, time)
+        self.last_growth = {}   # коллекция -> время последнего прироста
+
+    async def list_collections(self, session):
+        result = await fetch_result(session, "GET", f"{self.qdrant_url}/collections")
+        return sorted(c["name"] for c in result.get("collections", []) if c["name"] != META_COLLECTION)
+
+    async def probe_collection(self, session, name):
+        report = {"collection": name}
+        try:
+            info = await fetch_result(session, "GET", f"{self.qdrant_url}/collections/{name}")
+        except Exception as e:
+            report.update(status="error", error=str(e))
+            return report
+
+        report.update(
+            status=info.get("status", "error"),
+            optimizer=_optimizer_state(info.get("optimizer_status")),
+            segments=info.get("segments_count") or 0,
+            points=info.get("points_count") or 0,
+            indexed=info.get("indexed_vectors_count") or 0,
+        )
+
+        query = _canary_query(info) if self.canary else None
+        if query is not None:
+            start = time.perf_counter()
+            try:
+                await fetch_result(session, "POST",
+                                   f"{self.qdrant_url}/collections/{name}/points/search", json=query)
+                report["canary_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            except Exception as e:
+                report["canary_error"] = str(e)
+
+        self.track_growth(report, time.time())
+        return report
+
+    def track_growth(self, report, now):
+        """rate и stalled: коллекция, которая росла и перестала, дольше stall_after"""
+        name, points = report["collection"], report["points"]
+        previous = self.last_points.get(name)
+        self.last_points[name] = (points, now)
+        report["rate"], report["stalled"] = None, False
+        if previous is None:
+            return
+        prev_points, prev_time = previous
+        report["rate"] = (points - prev_points) / max(now - prev_time, 1e-6)
+        if points > prev_points:
+            self.last_growth[name] = now
+            return
+        # Коллекции, не росшие за время наблюдения (архивы), не считаем остановившимися
+        growth = self.last_growth.get(name)
+        report["stalled"] = growth is not None and now - growth >= self.stall_after
+
+    async def probe(self, session):
+        """Отчеты по всем коллекциям (параллельно)"""
+        names = await self.list_collections(session)
+        return await asyncio.gather(*[self.probe_collection(session, name) for name in names])
+
+def export_metrics(reports):
+    for report in reports:
+        name = report["collection"]
+        status = report["status"] if report["status"] in STATUSES else "error"
+        COLLECTION_STATUS.labels(name).state(status)
+        if status == "error":
+            continue
+        OPTIMIZER_OK.labels(name).set(1 if report["optimizer"] == "ok" else 0)
+        SEGMENTS.labels(name).set(report["segments"])
+        POINTS.labels(name).set(report["points"])
+        INDEXED_VECTORS.labels(name).set(report["indexed"])
+        STALLED.labels(name).set(1 if report["stalled"] else 0)
+        if report["rate"] is not None:
+            POINTS_RATE.labels(name).set(report["rate"])
+        if "canary_ms" in report:
+            CANARY_LATENCY.labels(name).set(report["canary_ms"] / 1000)
+
+def collection_alerts(reports, canary_slow_ms=500.0):
+    alerts = []
+    for report in reports:
+        name = report["collection"]
+        if report["status"] == "error":
+            alerts.append((name, f"unreachable: {report.get('error')}"))
+            continue
+        if report["status"] == "red":
+            alerts.append((name, "status red"))
+        if report["optimizer"] != "ok":
+            alerts.append((name, f"optimizer {report['optimizer']}"))
+        if report["stalled"]:
+            alerts.append((name, "ingestion stalled (points_count not growing)"))
+        if "canary_error" in report:
+            alerts.append((name, f"canary search failed: {report['canary_error']}"))
+        elif report.get("canary_ms", 0) > canary_slow_ms:
+            alerts.append((name, f"canary search {report['canary_ms']:.0f} ms"))
+    return alerts
+
+def render_dashboard(reports, alerts):
+    """Компактная таблица: строка на коллекцию"""
+    flagged = {name for name, _ in alerts}
+    lines = [f"   {'COLLECTION':<28} {'STATUS':<7} {'OPT':<4} {'SEG':>4} {'POINTS':>11} "
+             f"{'INDEXED':>8} {'RATE/s':>9} {'CANARY':>9}"]
+    for report in reports:
+        mark = "🚨" if report["collection"] in flagged else "✅"
+        if report["status"] == "error":
+            lines.append(f"{mark} {report['collection']:<28} {'error':<7}")
+            continue
+        indexed = f"{report['indexed'] / report['points']:.0%}" if report["points"] else "-"
+        rate = f"{report['rate']:.1f}" if report["rate"] is not None else "-"
+        canary = f"{report['canary_ms']:.1f}ms" if "canary_ms" in report else "-"
+        optimizer = "ok" if report["optimizer"] == "ok" else "ERR"
+        lines.append(f"{mark} {report['collection']:<28} {report['status']:<7} {optimizer:<4} "
+                     f"{report['segments']:>4} {report['points']:>11} {indexed:>8} "
+                     f"{rate:>9} {canary:>9}")
+    return "\n".join(lines)
+
+async def scrape_ingested_lines(session, metrics_url):
+    """Суммарное число принятых строк по коллекциям из /metrics процессора"""
+    async with session.get(metrics_url) as response:
+        response.raise_for_status()
+        text = await response.text()
+
+    totals = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "semlog_lines_ingested":
+            continue
+        for sample in family.samples:
+            if sample.name != "semlog_lines_ingested_total":
+                continue
+            collection = sample.labels.get("collection", "unknown")
+            totals[collection] = totals.get(collection, 0) + sample.value
+    return totals
+
+class ThroughputMonitor:
+    def __init__(self, targets, drop_ratio=0.5, min_rate=1.0, smoothing=0.3):
+        self.targets = targets
+        self.drop_ratio = drop_ratio  # алерт если rate < baseline * drop_ratio
+        self.min_rate = min_rate      # не алертим на почти пустых потоках
+        self.smoothing = smoothing    # вес нового замера в EWMA baseline
+
+        self.last_totals = {}   # (target, collection) -> (count, time)
+        self.baselines = {}     # (target, collection) -> rate EWMA
+
+    async def poll(self, session):
+        """Один проход по всем процессорам (эндпоинты опрашиваются параллельно)"""
+        alerts = []
+        now = time.time()
+        scraped = await asyncio.gather(
+            *[scrape_ingested_lines(session, target) for target in self.targets],
+            return_exceptions=True
+        )
+
+        for target, totals in zip(self.targets, scraped):
+            if isinstance(totals, Exception):
+                print(f"❌ {target}: scrape failed: {totals}")
+                alerts.append((target, None, "unreachable"))
+                continue
+
+            for collection, count in totals.items():
+                key = (target, collection)
+                previous = self.last_totals.get(key)
+                self.last_totals[key] = (count, now)
+                if previous is None:
+                    continue
+
+                prev_count, prev_time = previous
+                if count < prev_count:
+                    # Процессор перезапустился - счетчик сбросился
+                    continue
+                rate = (count - prev_count) / max(now - prev_time, 1e-6)
+                baseline = self.baselines.get(key)
+
+                status = "✅"
+                if (baseline is not None and baseline >= self.min_rate
+                        and rate < baseline * self.drop_ratio):
+                    status = "🚨"
+                    alerts.append((target, collection,
+                                   f"throughput drop {rate:.1f}/sec (baseline {baseline:.1f}/sec)"))
+
+                print(f"{status} {collection} @ {target}: {rate:.1f} logs/sec"
+                      + (f" (baseline {baseline:.1f})" if baseline is not None else ""))
+
+                # Просадку не подмешиваем в baseline, иначе он быстро "привыкнет"
+                if status == "✅":
+                    self.baselines[key] = rate if baseline is None else (
+                        self.smoothing * rate + (1 - self.smoothing) * baseline
+                    )
+
+        for target, collection, reason in alerts:
+            print(f"🚨 ALERT {collection or '-'} @ {target}: {reason}")
+        return alerts
+
+async def check_collections(probe, session, canary_slow_ms=500.0):
+    """Проход по коллекциям: метрики, таблица, алерты; None - Qdrant недоступен"""
+    start = time.perf_counter()
     try:
-        # Проверяем доступность Qdrant
-        response = requests.get("http://localhost:6333/collections")
-        if response.status_code == 200:
-            collections = response.json().get('result', {}).get('collections', [])
-            print(f"✅ Qdrant healthy. Collections: {[c['name'] for c in collections]}")
-            return True
-        else:
-            print("❌ Qdrant not responding")
-            return False
+        reports = await probe.probe(session)
     except Exception as e:
-        print(f"❌ Health check failed: {e}")
-        return False
+        QDRANT_UP.set(0)
+        print(f"❌ Qdrant {probe.qdrant_url} unreachable: {e}")
+        return None
+    QDRANT_UP.set(1)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    export_metrics(reports)
+    alerts = collection_alerts(reports, canary_slow_ms)
+    print(f"✅ Qdrant healthy: {len(reports)} collections probed in {elapsed:.0f} ms")
+    if reports:
+        print(render_dashboard(reports, alerts))
+    for name, reason in alerts:
+        print(f"🚨 ALERT {name} @ {probe.qdrant_url}: {reason}")
+    return reports
+
+async def run(args):
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+        print(f"📈 Metrics: http://0.0.0.0:{args.metrics_port}/metrics")
+
+    probe = CollectionProbe(args.qdrant_url, args.stall_after, canary=not args.no_canary)
+    monitor = ThroughputMonitor(args.targets, args.drop_ratio, args.min_rate)
+    async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+        while True:
+            started = time.monotonic()
+            print(f"\n[{datetime.now().isoformat()}] Health Check:")
+            await check_collections(probe, session, args.canary_slow_ms)
+            if monitor.targets:
+                await monitor.poll(session)
+            if args.once:
+                return
+            await asyncio.sleep(max(args.interval - (time.monotonic() - started), 0))
 
 if __name__ == "__main__":
-    while True:
-        print(f"\n[{datetime.now().isoformat()}] Health Check:")
-        check_processor_health()
-        time.sleep(30)
+    parser = argparse.ArgumentParser(description="Processor monitor")
+    parser.add_argument("--targets", nargs="*", default=["http://localhost:9100/metrics"],
+                       help="/metrics эндпоинты процессоров")
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    parser.add_argument("--interval", type=int, default=30, help="Интервал опроса, сек")
+    parser.add_argument("--drop-ratio", type=float, default=0.5,
+                       help="Алерт при падении rate ниже baseline * ratio")
+    parser.add_argument("--min-rate", type=float, default=1.0,
+                       help="Минимальный baseline (logs/sec) для алертов")
+    parser.add_argument("--stall-after", type=float, default=300,
+                       help="Алерт, если росшая коллекция не растет N секунд")
+    parser.add_argument("--canary-slow-ms", type=float, default=500,
+                       help="Алерт, если canary поиск дольше N мс")
+    parser.add_argument("--no-canary", action="store_true", help="Не выполнять canary поиск")
+    parser.add_argument("--metrics-port", type=int,
+                       help="Порт для /metrics монитора (Prometheus)")
+    parser.add_argument("--once", action="store_true", help="Один проход и выход")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# payload_schema.py - Компактная версионированная схема payload точек
+#
+# Версия 1:
+#   v     - версия схемы
+#   msg   - текст сообщения (или msg_z - zstd + base64 для длинных сообщений)
+#   lvl   - уровень, код из LEVEL_CODES
+#   src   - источник
+#   fmt   - формат исходной строки, код из FORMAT_CODES
+#   ts    - время события, epoch миллисекунды
+#   exp   - время истечения TTL, epoch миллисекунды (только TTL коллекции)
+#   tpl   - id шаблона сообщения (log_templates.template_id), для группировки
+#
+# Точки без поля v - старый формат (message/level/timestamp строками),
+# decode_payload читает оба варианта, migrate_payloads.py переписывает старые.
+import re
+import base64
+from datetime import datetime
+from qdrant_client import models
+from log_templates import template_id
+
+try:
+    import zstandard
+except ImportError:  # сжатие опционально
+    zstandard = None
+
+SCHEMA_VERSION = 1
+
+LEVEL_CODES = {"TRACE": 0, "DEBUG": 1, "INFO": 2, "WARN": 3, "ERROR": 4, "FATAL": 5}
+LEVEL_ALIASES = {"WARNING": "WARN", "ERR": "ERROR", "CRITICAL": "FATAL", "CRIT": "FATAL",
+                 "PANIC": "FATAL", "NOTICE": "INFO", "VERBOSE": "DEBUG"}
+LEVEL_NAMES = {code: name for name, code in LEVEL_CODES.items()}
+
+FORMAT_CODES = {"plain": 0, "json": 1, "bracketed": 2, "web": 3, "timestamped": 4}
+FORMAT_NAMES = {code: name for name, code in FORMAT_CODES.items()}
+
+# Поля, которые схема занимает сама; остальные поля лога переносятся как есть
+RESERVED_FIELDS = {"v", "msg", "msg_z", "lvl", "src", "fmt", "ts", "exp", "tpl"}
+
+# Поля лога процессора, которые схема кодирует сама (или отбрасывает как избыточные)
+LOG_FIELDS = {"message", "level", "timestamp", "source", "format", "expires_at",
+              "ttl_days", "processed_at", "batch_size", "embed_text", "template_id"}
+
+WEB_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S"
+WEB_TIME_PATTERN = re.compile(r"^(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})(?:\s+([+-]\d{4}))?$")
+
+_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+def level_code(level):
+    """Имя уровня -> код (неизвестные считаем INFO)"""
+    name = str(level or "INFO").upper()
+    name = LEVEL_ALIASES.get(name, name)
+    return LEVEL_CODES.get(name, LEVEL_CODES["INFO"])
+
+def level_name(code):
+    return LEVEL_NAMES.get(code, "INFO")
+
+def format_code(log_format):
+    return FORMAT_CODES.get(log_format, FORMAT_CODES["plain"])
+
+def format_name(code):
+    return FORMAT_NAMES.get(code, "plain")
+
+def to_epoch_ms(value, default=None):
+    """ISO строка / nginx время / datetime / число -> epoch миллисекунды"""
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    if isinstance(value, bool):
+        value = None
+    if isinstance(value, (int, float)):
+        # Эвристика: секунды, миллисекунды или микросекунды
+        if value > 1e14:
+            return int(value / 1000)
+        if value > 1e11:
+            return int(value)
+        return int(value * 1000)
+    if isinstance(value, str) and value:
+        text = value.strip()
+        try:
+            return int(datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp() * 1000)
+        except ValueError:
+            pass
+        match = WEB_TIME_PATTERN.match(text)
+        if match:
+            parsed = datetime.strptime(match.group(1), WEB_TIME_FORMAT)
+            if match.group(2):
+                parsed = datetime.strptime(match.group(1) + match.group(2), WEB_TIME_FORMAT + "%z")
+            return int(parsed.timestamp() * 1000)
+    if default is not None:
+        return default
+    return int(datetime.now().timestamp() * 1000)
+
+def from_epoch_ms(ms):
+    return datetime.fromtimestamp(ms / 1000).isoformat(timespec="milliseconds")
+
+def compress_message(message, threshold):
+    """zstd + base64, если сообщение длинное и это реально экономит место"""
+    if not threshold or _compressor is None:
+        return None
+    raw = message.encode("utf-8")
+    if len(raw) < threshold:
+        return None
+    packed = base64.b64encode(_compressor.compress(raw)).decode("ascii")
+    return packed if len(packed) < len(raw) else None
+
+def decompress_message(packed):
+    if _decompressor is None:
+        raise RuntimeError("zstandard is required to read compressed messages")
+    return _decompressor.decompress(base64.b64decode(packed)).decode("utf-8")
+
+def encode_payload(log, compress_threshold=None):
+    """Лог процессора (message/level/timestamp/...) -> компактный payload"""
+    payload = {
+        "v": SCHEMA_VERSION,
+        "lvl": level_code(log.get("level")),
+        "src": log.get("source", "unknown"),
+        "fmt": format_code(log.get("format", "plain")),
+        "ts": to_epoch_ms(log.get("timestamp")),
+    }
+
+    message = log.get("message", "")
+    payload["tpl"] = template_id(message)
+    packed = compress_message(message, compress_threshold)
+    if packed is not None:
+        payload["msg_z"] = packed
+    else:
+        payload["msg"] = message
+
+    if log.get("expires_at") is not None:
+        payload["exp"] = to_epoch_ms(log["expires_at"])
+
+    for key, value in log.items():
+        if key not in LOG_FIELDS and key not in RESERVED_FIELDS:
+            payload[key] = value
+    return payload
+
+def payload_message(payload):
+    """Текст сообщения из payload любой версии (без декодирования остальных полей)"""
+    if not payload:
+        return ""
+    if "v" not in payload:
+        return payload.get("message") or ""
+    if "msg_z" in payload:
+        return decompress_message(payload["msg_z"])
+    return payload.get("msg", "")
+
+def decode_payload(payload):
+    """Компактный payload -> читаемый вид (message/level/timestamp/...)"""
+    if not payload or "v" not in payload:
+        return payload  # старый формат уже читаемый
+
+    message = payload_message(payload)
+
+    log = {
+        "message": message,
+        "level": level_name(payload.get("lvl")),
+        "source": payload.get("src", "unknown"),
+        "format": format_name(payload.get("fmt")),
+        "timestamp": from_epoch_ms(payload["ts"]) if "ts" in payload else None,
+    }
+    if "exp" in payload:
+        log["expires_at"] = from_epoch_ms(payload["exp"])
+    if "tpl" in payload:
+        log["template_id"] = payload["tpl"]
+    for key, value in payload.items():
+        if key not in RESERVED_FIELDS:
+            log[key] = value
+    return log
+
+def decode_results(results):
+    """Декодируем payload у результатов search/retrieve/scroll на месте"""
+    for result in results:
+        result.payload = decode_payload(result.payload)
+    return results
+
+def build_filter(level=None, source=None, since=None, until=None):
+    """Фильтр Qdrant по полям компактной схемы; since/until - datetime/ISO/epoch ms"""
+    conditions = []
+    if level:
+        conditions.append(models.FieldCondition(
+            key="lvl", match=models.MatchValue(value=level_code(level))
+        ))
+    if source:
+        conditions.append(models.FieldCondition(
+            key="src", match=models.MatchValue(value=source)
+        ))
+    if since is not None or until is not None:
+        conditions.append(models.FieldCondition(
+            key="ts",
+            range=models.Range(
+                gte=to_epoch_ms(since) if since is not None else None,
+                lt=to_epoch_ms(until) if until is not None else None,
+            )
+        ))
+    return models.Filter(must=conditions) if conditions else None
+
+def create_payload_indexes(client, collection_name, ttl=False):
+    """Индексы под фильтры схемы"""
+    fields = [
+        ("lvl", models.PayloadSchemaType.INTEGER),
+        ("src", models.PayloadSchemaType.KEYWORD),
+        ("ts", models.PayloadSchemaType.INTEGER),
+        ("tpl", models.PayloadSchemaType.INTEGER),
+    ]
+    if ttl:
+        fields.append(("exp", models.PayloadSchemaType.INTEGER))
+    for field_name, field_schema in fields:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema
+        )
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# processor_metrics.py - Prometheus метрики для процессоров логов
+import os
+import sys
+import time
+import fcntl
+import termios
+import struct
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Метрики общие для всех процессоров в процессе, различаются лейблом collection
+LINES_INGESTED = Counter(
+    "semlog_lines_ingested_total",
+    "Строки логов, принятые процессором",
+    ["collection", "source", "level"]
+)
+POINTS_WRITTEN = Counter(
+    "semlog_points_written_total",
+    "Точки, успешно записанные в Qdrant",
+    ["collection"]
+)
+LINES_DROPPED = Counter(
+    "semlog_lines_dropped_total",
+    "Строки, отброшенные политикой сэмплирования",
+    ["collection", "source", "level"]
+)
+ERRORS = Counter(
+    "semlog_errors_total",
+    "Ошибки обработки по стадиям",
+    ["collection", "stage"]
+)
+STAGE_LATENCY = Histogram(
+    "semlog_stage_latency_seconds",
+    "Время выполнения стадий parse/encode/upsert",
+    ["collection", "stage"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+             0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+BATCH_SIZE = Histogram(
+    "semlog_batch_size",
+    "Размер отправляемых батчей",
+    ["collection"],
+    buckets=(1, 2, 5, 10, 15, 20, 50, 100, 200, 500, 1000)
+)
+ALERTS = Counter(
+    "semlog_standing_query_alerts_total",
+    "Алерты постоянных запросов",
+    ["collection", "query"]
+)
+BUFFER_DEPTH = Gauge(
+    "semlog_buffer_depth",
+    "Логи в буфере, ожидающие отправки",
+    ["collection"]
+)
+EMBED_UTILIZATION = Gauge(
+    "semlog_embed_utilization",
+    "Доля времени, занятая стадиями encode/upsert (EWMA)",
+    ["collection"]
+)
+BUFFER_BYTES = Gauge(
+    "semlog_buffer_bytes",
+    "Оценка памяти, занятой буфером событий",
+    ["collection"]
+)
+QUEUE_DEPTH = Gauge(
+    "semlog_stdin_queue_bytes",
+    "Байты, ожидающие чтения во входном пайпе",
+    ["collection"]
+)
+
+class ProcessorMetrics:
+    def __init__(self, collection_name, port=None):
+        self.collection_name = collection_name
+        self.port = port
+
+        if port:
+            try:
+                start_http_server(port)
+                print(f"📈 Metrics: http://0.0.0.0:{port}/metrics", file=sys.stderr)
+            except OSError as e:
+                # Порт занят другим процессором - работаем без эндпоинта
+                print(f"⚠️  Metrics endpoint disabled: {e}", file=sys.stderr)
+
+    def observe_line(self, source, level, count=1):
+        """Учет принятых строк (многострочное событие - count строк)"""
+        LINES_INGESTED.labels(self.collection_name, source, level).inc(count)
+
+    def observe_drop(self, source, level, count=1):
+        """Учет строк, отброшенных политикой"""
+        LINES_DROPPED.labels(self.collection_name, source, level).inc(count)
+
+    def set_utilization(self, utilization):
+        EMBED_UTILIZATION.labels(self.collection_name).set(utilization)
+
+    def observe_batch(self, size):
+        """Учет отправленного батча"""
+        BATCH_SIZE.labels(self.collection_name).observe(size)
+        POINTS_WRITTEN.labels(self.collection_name).inc(size)
+
+    def observe_error(self, stage):
+        """Учет ошибки на стадии"""
+        ERRORS.labels(self.collection_name, stage).inc()
+
+    def observe_alert(self, query):
+        ALERTS.labels(self.collection_name, query).inc()
+
+    def set_buffer_depth(self, depth, nbytes=None):
+        BUFFER_DEPTH.labels(self.collection_name).set(depth)
+        if nbytes is not None:
+            BUFFER_BYTES.labels(self.collection_name).set(nbytes)
+
+    def sample_queue_depth(self, stream=sys.stdin):
+        """Сколько байт ждет во входном пайпе (только для pipe/tty)"""
+        try:
+            raw = fcntl.ioctl(stream.fileno(), termios.FIONREAD, b"\0\0\0\0")
+            QUEUE_DEPTH.labels(self.collection_name).set(struct.unpack("I", raw)[0])
+        except (OSError, ValueError, AttributeError):
+            # Файл, закрытый поток или платформа без FIONREAD
+            pass
+
+    @contextmanager
+    def time_stage(self, stage):
+        """Замер времени стадии; исключения учитываются как ошибки стадии"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.observe_error(stage)
+            raise
+        finally:
+            STAGE_LATENCY.labels(self.collection_name, stage).observe(
+                time.perf_counter() - start
+            )
+
+def metrics_port_from_env(default=None):
+    """Порт метрик из переменной окружения METRICS_PORT"""
+    value = os.environ.get("METRICS_PORT")
+    return int(value) if value else default
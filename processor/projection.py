@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# projection.py - PCA проекция эмбеддингов: меньше измерений - меньше RAM в Qdrant
+#
+#   python3 projection.py report app-logs --sample 20000
+#       recall@k проекций 64/128/192 против полных 384 измерений
+#   python3 projection.py fit-projection app-logs --dim 128 --target app-logs-pca128
+#       обучаем PCA на выборке, переносим векторы в новую коллекцию
+#       (проекция сохраненных векторов, без повторного эмбеддинга)
+#
+# Проекция хранится в semlog-meta для коллекции, в которой лежат спроецированные
+# векторы. Процессоры и клиенты поиска находят ее по имени коллекции и
+# применяют к эмбеддингам сами.
+import sys
+import json
+import time
+import base64
+import argparse
+import numpy as np
+from qdrant_client import models
+from storage_backend import create_client, default_location
+from collection_meta import read_meta, read_meta_async, write_meta
+from payload_schema import create_payload_indexes
+
+META_KIND = "projection"
+REPORT_DIMS = (64, 128, 192)
+
+def _pack(array):
+    return base64.b64encode(np.ascontiguousarray(array, dtype="<f4").tobytes()).decode("ascii")
+
+def _unpack(text, shape):
+    return np.frombuffer(base64.b64decode(text), dtype="<f4").reshape(shape)
+
+def _normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+class Projection:
+    def __init__(self, mean, components):
+        self.mean = np.asarray(mean, dtype=np.float32)               # [input_dim]
+        self.components = np.asarray(components, dtype=np.float32)   # [dim, input_dim]
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @property
+    def input_dim(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, vectors, dim):
+        """PCA по выборке векторов (нормированных, как при cosine поиске)"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if dim >= vectors.shape[1]:
+            raise ValueError(f"dim {dim} must be below input dimension {vectors.shape[1]}")
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(mean, vt[:dim])
+
+    def apply(self, vectors):
+        """[..., input_dim] -> [..., dim], нормированные под cosine"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        return _normalize((vectors - self.mean) @ self.components.T)
+
+    def to_payload(self):
+        return {
+            "dim": self.dim,
+            "input_dim": self.input_dim,
+            "mean": _pack(self.mean),
+            "components": _pack(self.components),
+            "fitted_at": int(time.time()),
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(_unpack(payload["mean"], (payload["input_dim"],)),
+                   _unpack(payload["components"], (payload["dim"], payload["input_dim"])))
+
+def save_projection(client, collection_name, projection, **info):
+    write_meta(client, META_KIND, collection_name, {**projection.to_payload(), **info})
+
+def load_projection(client, collection_name):
+    """Проекция коллекции или None (коллекция с полными векторами)"""
+    payload = read_meta(client, META_KIND, collection_name)
+    return Projection.from_payload(payload) if payload else None
+
+async def load_projection_async(client, collection_name):
+    payload = await read_meta_async(client, META_KIND, collection_name)
+    return Projection.from_payload(payload) if payload else None
+
+class ProjectionRegistry:
+    """Проекции по коллекциям для клиентов поиска (загружаются один раз)"""
+
+    def __init__(self, client):
+        self.client = client
+        self.projections = {}
+
+    def get(self, collection_name):
+        if collection_name not in self.projections:
+            self.projections[collection_name] = load_projection(self.client, collection_name)
+        return self.projections[collection_name]
+
+    def project(self, collection_name, vector):
+        """Вектор запроса (list) под размерность коллекции"""
+        projection = self.get(collection_name)
+        if projection is None:
+            return vector
+        return projection.apply(vector).tolist()
+
+def sample_vectors(client, collection_name, size, page=1024, seed=0):
+    """Равномерная выборка size векторов коллекции (reservoir sampling по scroll)
+
+    Первые size точек scroll - самые старые id: базис PCA по ним не видел бы
+    свежих логов. Коллекция читается целиком, в памяти - только выборка.
+    """
+    rng = np.random.default_rng(seed)
+    sample, seen, offset = [], 0, None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=page, offset=offset,
+                                       with_payload=False, with_vectors=True)
+        for point in points:
+            if seen < size:
+                sample.append(point.vector)
+            else:
+                slot = rng.integers(0, seen + 1)
+                if slot < size:
+                    sample[slot] = point.vector
+            seen += 1
+        if offset is None:
+            break
+    return np.asarray(sample, dtype=np.float32)
+
+def recall_report(vectors, dims=REPORT_DIMS, k=10, queries=200, seed=0):
+    """recall@k поиска в проекции против точного поиска по полным векторам
+
+    Из выборки откладываем queries векторов-запросов, PCA учим на остальных;
+    истинные соседи - top-k по cosine в полной размерности.
+    """
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    queries = min(queries, len(vectors) // 5)
+    query_vectors, base = vectors[order[:queries]], vectors[order[queries:]]
+    k = min(k, len(base))
+
+    truth = np.argsort(-(query_vectors @ base.T), axis=1)[:, :k]
+    report = {"sample": len(vectors), "queries": queries, "k": k,
+              "input_dim": vectors.shape[1], "dims": {}}
+    for dim in dims:
+        if dim >= vectors.shape[1] or dim > len(base):
+            continue
+        projection = Projection.fit(base, dim)
+        found = np.argsort(-(projection.apply(query_vectors) @ projection.apply(base).T), axis=1)[:, :k]
+        recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+        report["dims"][dim] = {
+            "recall_at_k": round(float(recall), 4),
+            "vector_bytes": dim * 4,
+            "memory_saving": round(1 - dim / vectors.shape[1], 3),
+        }
+    return report
+
+def reindex_projected(client, source, target, projection, batch_size=512):
+    """Переносим точки source -> target, проецируя сохраненные векторы"""
+    info = client.get_collection(source)
+    if not client.collection_exists(target):
+        client.create_collection(
+            collection_name=target,
+            vectors_config=models.VectorParams(size=projection.dim, distance=models.Distance.COSINE)
+        )
+        create_payload_indexes(client, target, ttl="exp" in (info.payload_schema or {}))
+    save_projection(client, target, projection, source=source)
+
+    copied, offset = 0, None
+    while True:
+        points, offset = client.scroll(collection_name=source, limit=batch_size, offset=offset,
+                                       with_payload=True, with_vectors=True)
+        if points:
+            projected = projection.apply([point.vector for point in points])
+            client.upsert(collection_name=target, points=[
+                models.PointStruct(id=point.id, vector=vector.tolist(), payload=point.payload)
+                for point, vector in zip(points, projected)
+            ])
+            copied += len(points)
+            print(f"📦 {copied} points -> {target}", file=sys.stderr)
+        if offset is None:
+            return copied
+
+def main():
+    parser = argparse.ArgumentParser(description="PCA projection for stored log vectors")
+    parser.add_argument("command", choices=["fit-projection", "report"])
+    parser.add_argument("collection", help="Коллекция с полными векторами")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL, :memory: или embedded:/path")
+    parser.add_argument("--sample", type=int, default=20000, help="Векторов для обучения/оценки")
+    parser.add_argument("--dim", type=int, default=128, help="Размерность проекции")
+    parser.add_argument("--dims", type=int, nargs="+", default=list(REPORT_DIMS),
+                       help="Размерности для отчета recall@k")
+    parser.add_argument("--k", type=int, default=10, help="k для recall@k")
+    parser.add_argument("--target", help="Коллекция для спроецированных векторов "
+                                         "(по умолчанию <collection>-pca<dim>)")
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+
+    client = create_client(args.location)
+    vectors = sample_vectors(client, args.collection, args.sample)
+    if not len(vectors):
+        print(f"❌ No vectors in {args.collection}")
+        sys.exit(1)
+
+    dims = args.dims if args.command == "report" else sorted(set(args.dims) | {args.dim})
+    report = recall_report(vectors, dims, args.k)
+    print(f"📊 recall@{report['k']} vs full {report['input_dim']} dims:")
+    print(json.dumps(report, indent=2))
+    if args.command == "report":
+        return
+
+    target = args.target or f"{args.collection}-pca{args.dim}"
+    projection = Projection.fit(vectors, args.dim)
+    copied = reindex_projected(client, args.collection, target, projection, args.batch_size)
+    print(f"✅ {copied} points projected to {args.dim} dims in {target}; "
+          f"processors and search clients pick up the projection by collection name")
+
+if __name__ == "__main__":
+    main()
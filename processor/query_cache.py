@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# query_cache.py - Кэш результатов поиска для интерактивного режима и дашбордов
+#
+# Ключ: (коллекция, хэш эмбеддинга запроса, фильтры, limit, min_score).
+# TTL зависит от временного окна запроса:
+#   открытое окно (до "сейчас")  - open_ttl, сбрасывается при появлении новых точек
+#   закрытое окно в прошлом      - closed_ttl, новые точки в него уже не попадают
+# Версия коллекции - (points_count, максимальный ts), проверяется не чаще
+# version_check_interval: удаления TTL вместе с новыми точками не дают
+# прежний points_count незамеченными - новые точки двигают максимальный ts.
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from qdrant_client import models
+
+class QueryResultCache:
+    def __init__(self, client, max_entries=256, open_ttl=10.0, closed_ttl=600.0,
+                 closed_after=300.0, version_check_interval=1.0, embedding_cache_size=512):
+        self.client = client
+        self.max_entries = max_entries
+        self.open_ttl = open_ttl
+        self.closed_ttl = closed_ttl
+        self.closed_after = closed_after  # окно, закончившееся раньше - считаем неизменным
+        self.version_check_interval = version_check_interval
+        self.embedding_cache_size = embedding_cache_size
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()      # key -> (results, expires_at, version or None)
+        self.embeddings = OrderedDict()   # (модель, текст запроса) -> вектор
+        self.versions = {}                # collection -> (версия, checked_at)
+
+        self.hits = 0
+        self.misses = 0
+        self.last_hit = False
+
+    def embed(self, model, query):
+        """Эмбеддинг запроса с LRU - повторный запрос не гоняет модель"""
+        key = (id(model), query)  # у коллекций могут быть разные модели
+        with self.lock:
+            vector = self.embeddings.get(key)
+            if vector is not None:
+                self.embeddings.move_to_end(key)
+                return vector
+        vector = model.encode(query).tolist()
+        with self.lock:
+            self.embeddings[key] = vector
+            if len(self.embeddings) > self.embedding_cache_size:
+                self.embeddings.popitem(last=False)
+        return vector
+
+    @staticmethod
+    def make_key(collection_name, query_vector, filters, limit, min_score):
+        digest = hashlib.blake2b(
+            np.asarray(query_vector, dtype=np.float32).tobytes(), digest_size=16
+        ).hexdigest()
+        frozen = tuple(sorted((k, v) for k, v in (filters or {}).items() if v is not None))
+        return (collection_name, digest, frozen, limit, min_score)
+
+    def latest_ts(self, collection_name):
+        """Максимальный ts коллекции (одна точка по индексу ts) или None"""
+        try:
+            points, _ = self.client.scroll(
+                collection_name=collection_name, limit=1, with_payload=["ts"], with_vectors=False,
+                order_by=models.OrderBy(key="ts", direction=models.Direction.DESC)
+            )
+        except Exception:
+            return None  # нет индекса ts с сортировкой - остается только points_count
+        return points[0].payload.get("ts") if points else None
+
+    def collection_version(self, collection_name):
+        """(points_count, максимальный ts); запрос к хранилищу не чаще интервала"""
+        now = time.monotonic()
+        cached = self.versions.get(collection_name)
+        if cached is not None and now - cached[1] < self.version_check_interval:
+            return cached[0]
+        try:
+            version = (self.client.get_collection(collection_name).points_count,
+                       self.latest_ts(collection_name))
+        except Exception:
+            version = None  # хранилище недоступно - кэшу открытых окон не доверяем
+        self.versions[collection_name] = (version, now)
+        return version
+
+    def get(self, key):
+        collection_name = key[0]
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            results, expires_at, version = entry
+            valid = time.monotonic() < expires_at
+            if valid and version is not None:
+                valid = self.collection_version(collection_name) == version
+            if valid:
+                with self.lock:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                self.last_hit = True
+                return list(results)
+            with self.lock:
+                self.entries.pop(key, None)
+
+        with self.lock:
+            self.misses += 1
+        self.last_hit = False
+        return None
+
+    def put(self, key, results, until=None):
+        """until - конец временного окна запроса (epoch секунды), None - "сейчас" """
+        closed = until is not None and until < time.time() - self.closed_after
+        if closed:
+            expires_at, version = time.monotonic() + self.closed_ttl, None
+        else:
+            expires_at = time.monotonic() + self.open_ttl
+            version = self.collection_version(key[0])
+            if version is None:
+                return
+        with self.lock:
+            self.entries[key] = (list(results), expires_at, version)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, collection_name=None):
+        with self.lock:
+            for key in [k for k in self.entries if collection_name in (None, k[0])]:
+                del self.entries[key]
+            self.versions.pop(collection_name, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
@@ -1,21 +1,27 @@
 #!/usr/bin/env python3
 # quick_search.py - Для интеграции в скрипты
 
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+from storage_backend import create_client
+from payload_schema import decode_results
+from embedders import embedder_for
+from projection import load_projection
+from bulk_load import IndexingTail, tail_search
 
-def quick_search(query, collection="universal-logs", limit=5):
+def quick_search(query, collection="universal-logs", limit=5, location=None):
     """Быстрый поиск для использования в других скриптах"""
-    client = QdrantClient("localhost")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    client = create_client(location)
+    model = embedder_for(client, collection)
     
-    vector = model.encode(query).tolist()
-    results = client.search(
-        collection_name=collection,
-        query_vector=vector,
-        limit=limit,
-        with_payload=True
-    )
+    vector = model.encode(query)
+    projection = load_projection(client, collection)
+    if projection:
+        vector = projection.apply(vector)
+    vector = vector.tolist()
+    # Коллекция в bulk-load: непроиндексированный хвост - точным поиском
+    results = decode_results(tail_search(
+        client, collection, vector, limit=limit,
+        since=IndexingTail(client).since(collection)
+    ))
     
     return [{
         'message': r.payload.get('message'),
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# reindex.py - Пересборка коллекции с новыми эмбеддингами (смена модели/параметров векторов)
+#
+#   python3 reindex.py app-logs app-logs-v2 --alias app-logs-live --workers 4
+#
+# Источник читается scroll'ом большими страницами без векторов, сообщения
+# заново кодируются параллельно (с кэшем повторяющихся текстов), точки пишутся
+# в новую коллекцию с выключенной индексацией; после загрузки индексация
+# включается и алиас атомарно переключается на новую коллекцию.
+# Прогресс (offset scroll) сохраняется в checkpoint файл после каждой страницы -
+# прерванный запуск продолжается с того же места.
+#
+# Payload переносится как есть (ts/exp/src/lvl - сырые значения), из него
+# берется только текст для эмбеддинга. Модель новой коллекции записывается в
+# semlog-meta - клиенты поиска и процессоры кодируют запросы ею же.
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from qdrant_client import models
+from storage_backend import create_client, default_location
+from payload_schema import encode_payload, payload_message, compress_message, create_payload_indexes
+from event_assembler import condense_event
+from embedders import (create_embedder, load_local_model, save_collection_model,
+                       SidecarEmbedder, DEFAULT_MODEL)
+from projection import load_projection
+
+# Индексация после загрузки (значение Qdrant по умолчанию), во время загрузки - выключена
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+class EmbeddingCache:
+    """LRU текст -> вектор: шаблонные логи повторяются, модель считаем один раз"""
+
+    def __init__(self, size=100000):
+        self.size = size
+        self.vectors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def split(self, texts):
+        """(вектора из кэша по позициям, уникальные тексты для модели)"""
+        cached, missing = {}, []
+        for i, text in enumerate(texts):
+            vector = self.vectors.get(text)
+            if vector is not None:
+                self.vectors.move_to_end(text)
+                cached[i] = vector
+                self.hits += 1
+            elif text not in missing:
+                missing.append(text)
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached, missing
+
+    def add(self, texts, vectors):
+        for text, vector in zip(texts, vectors):
+            self.vectors[text] = vector
+        while len(self.vectors) > self.size:
+            self.vectors.popitem(last=False)
+
+class Reindexer:
+    def __init__(self, client, source, target, embedder, batch_size=1024, workers=4,
+                 checkpoint_path=None, compress_threshold=None, cache_size=100000,
+                 model_name=DEFAULT_MODEL):
+        self.client = client
+        self.source = source
+        self.target = target
+        self.embedder = embedder
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.compress_threshold = compress_threshold
+        self.checkpoint_path = checkpoint_path or f".reindex-{source}-{target}.json"
+        self.cache = EmbeddingCache(cache_size)
+        self.projection = load_projection(client, target)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+
+    # ---- checkpoint ----
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {"offset": None, "copied": 0, "done": False}
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_checkpoint(self, state):
+        # Пишем во временный файл и переименовываем - checkpoint не бьется при падении
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # ---- коллекция ----
+
+    def prepare_target(self, dim):
+        """Новая коллекция с выключенной индексацией на время загрузки"""
+        if self.client.collection_exists(self.target):
+            return
+        source_info = self.client.get_collection(self.source)
+        self.client.create_collection(
+            collection_name=self.target,
+            vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
+        )
+        create_payload_indexes(self.client, self.target,
+                               ttl="exp" in (source_info.payload_schema or {}))
+        print(f"✅ Created {self.target} ({dim} dims, indexing off during load)", file=sys.stderr)
+
+    def finish_target(self):
+        """Включаем индексацию обратно"""
+        if hasattr(self.client, "update_collection"):
+            self.client.update_collection(
+                collection_name=self.target,
+                optimizer_config=models.OptimizersConfigDiff(
+                    indexing_threshold=DEFAULT_INDEXING_THRESHOLD
+                )
+            )
+
+    def switch_alias(self, alias):
+        """Алиас -> новая коллекция одной операцией: поиск не видит промежуточного состояния"""
+        if not hasattr(self.client, "update_collection_aliases"):
+            print(f"⚠️  Storage backend has no aliases, {alias} not switched", file=sys.stderr)
+            return
+        existing = {a.alias_name for a in self.client.get_aliases().aliases}
+        operations = []
+        if alias in existing:
+            operations.append(models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=alias)
+            ))
+        operations.append(models.CreateAliasOperation(create_alias=models.CreateAlias(
+            collection_name=self.target, alias_name=alias
+        )))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"🔀 Alias {alias} -> {self.target}", file=sys.stderr)
+
+    # ---- эмбеддинги ----
+
+    def encode_chunk(self, texts):
+        # У sidecar клиента один сокет под lock - каждому потоку свое соединение
+        if isinstance(self.embedder, SidecarEmbedder):
+            if not hasattr(self.local, "embedder"):
+                self.local.embedder = SidecarEmbedder(self.embedder.socket_path)
+            return self.local.embedder.encode(texts)
+        return self.embedder.encode(texts)
+
+    def embed(self, texts):
+        """Параллельное кодирование уникальных текстов страницы"""
+        cached, missing = self.cache.split(texts)
+        fresh = {}
+        if missing:
+            chunk = max(1, -(-len(missing) // self.workers))
+            chunks = [missing[i:i + chunk] for i in range(0, len(missing), chunk)]
+            encoded = np.concatenate(list(self.pool.map(self.encode_chunk, chunks)))
+            if self.projection:
+                encoded = self.projection.apply(encoded)
+            self.cache.add(missing, encoded)
+            fresh = dict(zip(missing, encoded))
+        return [cached[i] if i in cached else fresh[text] for i, text in enumerate(texts)]
+
+    @staticmethod
+    def embed_text(payload):
+        message = payload_message(payload)
+        return condense_event(message) if "\n" in message else message
+
+    def copy_payload(self, payload):
+        """Payload для новой коллекции без перекодирования времени"""
+        if not payload or "v" not in payload:
+            return encode_payload(payload or {}, self.compress_threshold)  # старый формат
+        payload = dict(payload)
+        if "msg" in payload:
+            packed = compress_message(payload["msg"], self.compress_threshold)
+            if packed is not None:
+                payload["msg_z"] = packed
+                del payload["msg"]
+        return payload
+
+    # ---- основной цикл ----
+
+    def run(self, alias=None):
+        state = self.load_checkpoint()
+        if state["done"]:
+            print(f"✅ {self.source} -> {self.target} already finished", file=sys.stderr)
+        else:
+            if state["offset"] is not None:
+                print(f"⏯️  Resuming from offset {state['offset']} ({state['copied']} copied)",
+                      file=sys.stderr)
+            probe = self.embed(["probe"])[0]
+            self.prepare_target(len(probe))
+            save_collection_model(self.client, self.target, self.model_name)
+            self.copy(state)
+            self.finish_target()
+
+        if alias:
+            self.switch_alias(alias)
+        self.pool.shutdown()
+        return state
+
+    def copy(self, state):
+        start = time.time()
+        copied_at_start = state["copied"]
+        total = self.client.count(self.source).count
+
+        while True:
+            points, next_offset = self.client.scroll(
+                collection_name=self.source,
+                limit=self.batch_size,
+                offset=state["offset"],
+                with_payload=True,
+                with_vectors=False
+            )
+            if points:
+                vectors = self.embed([self.embed_text(point.payload) for point in points])
+                self.client.upsert(
+                    collection_name=self.target,
+                    points=[
+                        models.PointStruct(
+                            id=point.id,
+                            vector=np.asarray(vector).tolist(),
+                            payload=self.copy_payload(point.payload)
+                        )
+                        for point, vector in zip(points, vectors)
+                    ]
+                )
+                state["copied"] += len(points)
+
+            state["offset"] = next_offset
+            state["done"] = next_offset is None
+            self.save_checkpoint(state)
+
+            elapsed = max(time.time() - start, 1e-6)
+            rate = (state["copied"] - copied_at_start) / elapsed
+            hit_rate = self.cache.hits / max(self.cache.hits + self.cache.misses, 1)
+            print(f"📦 {state['copied']}/{total} points ({rate:.0f}/sec, "
+                  f"embedding cache hit {hit_rate:.0%})", file=sys.stderr)
+            if state["done"]:
+                return
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a log collection with new embeddings")
+    parser.add_argument("source", help="Исходная коллекция (или алиас)")
+    parser.add_argument("target", help="Новая коллекция")
+    parser.add_argument("--alias", help="Переключить алиас на новую коллекцию по завершении")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL, :memory: или embedded:/path")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Модель для новых эмбеддингов")
+    parser.add_argument("--embedding-socket",
+                       help="Sidecar эмбеддингов; только явно - $EMBEDDING_SOCKET не используется, "
+                            "у sidecar может быть другая модель, чем --model")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Точек на страницу scroll")
+    parser.add_argument("--workers", type=int, default=4, help="Параллельных запросов encode")
+    parser.add_argument("--checkpoint", help="Файл прогресса (по умолчанию .reindex-<src>-<dst>.json)")
+    parser.add_argument("--compress-threshold", type=int,
+                       help="Сжимать zstd сообщения длиннее N байт")
+    args = parser.parse_args()
+
+    # Переиндексация обычно и нужна для смены модели: sidecar из окружения
+    # молча подменил бы --model старой моделью
+    if args.embedding_socket:
+        embedder = create_embedder(args.embedding_socket, args.model)
+    else:
+        embedder = load_local_model(args.model)
+    reindexer = Reindexer(
+        create_client(args.location), args.source, args.target,
+        embedder,
+        batch_size=args.batch_size, workers=args.workers,
+        checkpoint_path=args.checkpoint, compress_threshold=args.compress_threshold,
+        model_name=args.model
+    )
+    state = reindexer.run(alias=args.alias)
+    print(f"✅ Reindexed {state['copied']} points: {args.source} -> {args.target}")
+
+if __name__ == "__main__":
+    main()
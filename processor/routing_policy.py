@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# routing_policy.py - Сэмплирование и приоритеты уровней перед стадией эмбеддинга
+#
+# Политика задается YAML (см. routing_policy.yaml):
+#   levels:   уровень -> priority / sample / rate / burst
+#   sources:  источник -> переопределения уровней для него
+#   adaptive: снижение sample при высокой загрузке стадии encode/upsert
+#
+# Уровни без sample/rate пропускаются всегда (ERROR/WARN по умолчанию).
+# Отброшенное не теряется бесследно: считается по источникам и шаблонам.
+import time
+import random
+import yaml
+from log_templates import message_template, template_id
+
+DEFAULT_POLICY = {
+    "levels": {
+        "FATAL": {"priority": 0},
+        "ERROR": {"priority": 0},
+        "WARN": {"priority": 1},
+        "INFO": {"priority": 2, "rate": 100, "burst": 500},
+        "DEBUG": {"priority": 3, "rate": 10, "burst": 50},
+        "TRACE": {"priority": 3, "rate": 10, "burst": 50},
+    },
+    "sources": {},
+    "adaptive": {"high_watermark": 0.8, "min_sample": 0.05},
+    "priority_flush_timeout": 0.5,
+    "priority_threshold": 1,
+    "max_drop_templates": 1000,
+}
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate          # токенов в секунду
+        self.capacity = capacity  # максимальный "всплеск"
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class RoutingPolicy:
+    def __init__(self, config=None, rng=None):
+        config = config or DEFAULT_POLICY
+        self.levels = {k.upper(): v for k, v in config.get("levels", {}).items()}
+        self.sources = {
+            source: {k.upper(): v for k, v in levels.items()}
+            for source, levels in (config.get("sources") or {}).items()
+        }
+        adaptive = config.get("adaptive") or {}
+        self.high_watermark = adaptive.get("high_watermark", 0.8)
+        self.min_sample = adaptive.get("min_sample", 0.05)
+        self.priority_flush_timeout = config.get("priority_flush_timeout", 0.5)
+        self.priority_threshold = config.get("priority_threshold", 1)
+        # Шаблонов отброшенного в памяти: сверх этого редкие сворачиваются в "прочие"
+        self.max_drop_templates = config.get("max_drop_templates", 1000)
+
+        self.random = rng or random.Random()
+        self.buckets = {}       # (source, level) -> TokenBucket
+        self.pressure = 0.0     # загрузка стадии embed, 0..1+
+        self.adaptive_factor = 1.0
+
+        self.dropped_by_source = {}    # (source, level) -> count
+        self.dropped_by_template = {}  # template_id -> [count, template, source, level]
+        self.dropped_other_templates = 0  # отброшенные события свернутых шаблонов
+        self.kept = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_yaml(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(yaml.safe_load(f))
+
+    def rule(self, source, level):
+        overrides = self.sources.get(source, {})
+        return overrides.get(level) or self.levels.get(level) or {}
+
+    def priority(self, level, source=None):
+        """Чем меньше число, тем важнее уровень"""
+        return self.rule(source, str(level).upper()).get("priority", 2)
+
+    def is_priority(self, log_data):
+        return self.priority(log_data["level"], log_data["source"]) <= self.priority_threshold
+
+    def update_pressure(self, utilization):
+        """Загрузка стадии encode/upsert (доля времени); выше watermark - режем sample"""
+        self.pressure = utilization
+        if utilization > self.high_watermark:
+            self.adaptive_factor = max(self.min_sample, self.high_watermark / utilization)
+        else:
+            self.adaptive_factor = 1.0
+
+    def decide(self, log_data, now=None):
+        """True - событие идет на эмбеддинг, False - отбрасываем с учетом в сводке"""
+        now = now if now is not None else time.monotonic()
+        level = str(log_data["level"]).upper()
+        source = log_data["source"]
+        rule = self.rule(source, level)
+
+        keep = True
+        if "sample" in rule or "rate" in rule:
+            sample = rule.get("sample", 1.0) * self.adaptive_factor
+            if sample < 1.0 and self.random.random() >= sample:
+                keep = False
+            elif "rate" in rule:
+                key = (source, level)
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    bucket = self.buckets[key] = TokenBucket(
+                        rule["rate"], rule.get("burst", rule["rate"]), now
+                    )
+                keep = bucket.take(now)
+
+        if keep:
+            self.kept += 1
+        else:
+            self.record_drop(log_data, source, level)
+        return keep
+
+    def record_drop(self, log_data, source, level):
+        self.dropped += 1
+        key = (source, level)
+        self.dropped_by_source[key] = self.dropped_by_source.get(key, 0) + 1
+
+        message = log_data["message"]
+        tid = template_id(message)
+        entry = self.dropped_by_template.get(tid)
+        if entry is None:
+            self.dropped_by_template[tid] = [1, message_template(message), source, level]
+            if len(self.dropped_by_template) > 2 * self.max_drop_templates:
+                self.prune_templates()
+        else:
+            entry[0] += 1
+
+    def prune_templates(self):
+        """Оставляем max_drop_templates самых частых шаблонов, остальные - в счетчик прочих
+
+        Чистка раз в max_drop_templates новых шаблонов: при высокой кардинальности
+        (id, хэши в сообщениях) память не растет, а частые шаблоны остаются.
+        """
+        ranked = sorted(self.dropped_by_template.items(), key=lambda item: -item[1][0])
+        self.dropped_by_template = dict(ranked[:self.max_drop_templates])
+        self.dropped_other_templates += sum(entry[0] for _, entry in ranked[self.max_drop_templates:])
+
+    def summary(self, top=10):
+        """Сводка отброшенного: по источникам и самые частые шаблоны"""
+        templates = sorted(self.dropped_by_template.items(), key=lambda item: -item[1][0])
+        return {
+            "kept": self.kept,
+            "dropped": self.dropped,
+            "adaptive_factor": round(self.adaptive_factor, 3),
+            "by_source": {f"{s}/{l}": c for (s, l), c in sorted(self.dropped_by_source.items())},
+            "top_templates": [
+                {"template_id": tid, "count": count, "template": template,
+                 "source": source, "level": level}
+                for tid, (count, template, source, level) in templates[:top]
+            ],
+            "other_templates": self.dropped_other_templates,
+        }
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# standing_queries.py - Постоянные семантические запросы, проверяемые при записи
+#
+# Реестр запросов (см. standing_queries.yaml): текст + фильтры + порог.
+# Эмбеддинги запросов считаются один раз и лежат матрицей [запросы, dim];
+# каждый батч процессора проверяется одним умножением матриц, совпадения
+# уходят в sinks: stdout, webhook, файл (JSON lines).
+import sys
+import json
+import time
+import queue
+import threading
+import numpy as np
+import yaml
+
+class StdoutSink:
+    def emit(self, alert):
+        print(json.dumps(alert, ensure_ascii=False), flush=True)
+
+    def close(self):
+        pass
+
+class FileSink:
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def emit(self, alert):
+        self.file.write(json.dumps(alert, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class WebhookSink:
+    """POST JSON в фоновом потоке: медленный получатель не тормозит запись логов"""
+
+    def __init__(self, url, timeout=5.0, max_pending=1000):
+        import requests
+        self.session = requests.Session()
+        self.url = url
+        self.timeout = timeout
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.failed = 0
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+
+    def emit(self, alert):
+        try:
+            self.pending.put_nowait(alert)
+        except queue.Full:
+            self.failed += 1
+
+    def worker(self):
+        while True:
+            alert = self.pending.get()
+            if alert is None:
+                return
+            try:
+                self.session.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️  Webhook {self.url} failed: {e}", file=sys.stderr)
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join(timeout=self.timeout)
+
+def create_sink(config):
+    kind = config.get("type", "stdout")
+    if kind == "stdout":
+        return StdoutSink()
+    if kind == "file":
+        return FileSink(config["path"])
+    if kind == "webhook":
+        return WebhookSink(config["url"], config.get("timeout", 5.0))
+    raise ValueError(f"Unknown sink type: {kind}")
+
+def _as_set(value, upper=False):
+    if value is None:
+        return None
+    values = [value] if isinstance(value, str) else value
+    return {str(v).upper() if upper else str(v) for v in values}
+
+class StandingQueries:
+    def __init__(self, config, embedder, sinks=None):
+        queries = config.get("queries") or []
+        if not queries:
+            raise ValueError("standing queries config has no queries")
+        self.names = [q["name"] for q in queries]
+        self.texts = [q["text"] for q in queries]
+        self.thresholds = np.array([q.get("threshold", 0.6) for q in queries], dtype=np.float32)
+        self.levels = [_as_set(q.get("level"), upper=True) for q in queries]
+        self.sources = [_as_set(q.get("source")) for q in queries]
+        self.cooldowns = [q.get("cooldown", 0) for q in queries]
+
+        # Матрица нормированных эмбеддингов запросов [n, dim]
+        matrix = np.asarray(embedder.encode(self.texts), dtype=np.float32)
+        self.matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        self.sinks = sinks if sinks is not None else [
+            create_sink(sink) for sink in (config.get("sinks") or [{"type": "stdout"}])
+        ]
+        self.last_alert = [0.0] * len(queries)
+        self.matched = [0] * len(queries)
+        self.suppressed = [0] * len(queries)
+
+    @classmethod
+    def from_yaml(cls, path, embedder):
+        with open(path, encoding="utf-8") as f:
+            return cls(yaml.safe_load(f), embedder)
+
+    def score(self, records, embeddings, collection_name=None):
+        """Батч [b, dim] против всех запросов; возвращаем отправленные алерты"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        scores = (embeddings / norms) @ self.matrix.T  # [b, n]
+
+        alerts = []
+        now = time.time()
+        for row, column in zip(*np.nonzero(scores >= self.thresholds)):
+            record = records[row]
+            if self.levels[column] and str(record.level).upper() not in self.levels[column]:
+                continue
+            if self.sources[column] and record.source not in self.sources[column]:
+                continue
+
+            self.matched[column] += 1
+            if now - self.last_alert[column] < self.cooldowns[column]:
+                self.suppressed[column] += 1
+                continue
+            self.last_alert[column] = now
+
+            alert = {
+                "query": self.names[column],
+                "score": round(float(scores[row, column]), 4),
+                "collection": collection_name,
+                "level": record.level,
+                "source": record.source,
+                "timestamp": record.timestamp,
+                "message": record.message,
+                "alerted_at": now,
+            }
+            for sink in self.sinks:
+                sink.emit(alert)
+            alerts.append(alert)
+        return alerts
+
+    def summary(self):
+        return {name: {"matched": matched, "suppressed": suppressed}
+                for name, matched, suppressed in zip(self.names, self.matched, self.suppressed)
+                if matched}
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# storage_backend.py - Выбор хранилища векторов по адресу
+#
+#   localhost / qdrant         - сервер Qdrant (host, port)
+#   http://host:6333           - сервер Qdrant по URL
+#   :memory:                   - in-memory Qdrant (без персистентности)
+#   embedded:/var/lib/semlog   - встроенное хранилище на memmap-сегментах (embedded_store.py)
+#
+# Все варианты отдают объект с API QdrantClient, поэтому процессоры и клиенты
+# поиска работают с любым из них без изменений. create_async_client() - то же
+# для AsyncQdrantClient (встроенное хранилище оборачивается в пул потоков).
+import os
+import asyncio
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
+EMBEDDED_PREFIX = "embedded:"
+
+def default_location():
+    """Адрес хранилища из окружения ($QDRANT_HOST) или localhost"""
+    return os.environ.get("QDRANT_HOST", "localhost")
+
+def create_client(location=None, port=6333):
+    """Клиент хранилища по адресу"""
+    location = location or default_location()
+
+    if location.startswith(EMBEDDED_PREFIX):
+        # Импорт здесь, чтобы серверным установкам не требовался numpy-бэкенд
+        from embedded_store import EmbeddedVectorStore
+        path = location[len(EMBEDDED_PREFIX):]
+        if path.startswith("//"):
+            path = path[2:]
+        return EmbeddedVectorStore(path)
+
+    if location == ":memory:":
+        return QdrantClient(":memory:")
+
+    if "://" in location:
+        return QdrantClient(url=location)
+
+    return QdrantClient(host=location, port=port)
+
+class AsyncClientAdapter:
+    """Синхронный клиент (встроенное хранилище) с async API: вызовы в пуле потоков"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+def create_async_client(location=None, port=6333):
+    """Async клиент хранилища по адресу (для параллельных запросов)"""
+    location = location or default_location()
+
+    if location.startswith(EMBEDDED_PREFIX):
+        return AsyncClientAdapter(create_client(location, port))
+
+    if location == ":memory:":
+        return AsyncQdrantClient(":memory:")
+
+    if "://" in location:
+        return AsyncQdrantClient(url=location)
+
+    return AsyncQdrantClient(host=location, port=port)
@@ -0,0 +1,5 @@
+# conftest.py - модули процессора импортируются напрямую (как при запуске из processor/)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+import time
+from types import SimpleNamespace
+from qdrant_client import QdrantClient, models
+from bulk_load import BulkLoadController, has_bulk_state, tail_search, META_KIND
+from collection_meta import read_meta
+
+def make_client():
+    client = QdrantClient(":memory:")
+    client.create_collection("logs", models.VectorParams(size=2, distance=models.Distance.COSINE))
+    return client
+
+def test_tail_search_keeps_points_without_ts():
+    client = make_client()
+    now = int(time.time() * 1000)
+    client.upsert("logs", [
+        models.PointStruct(id=1, vector=[1.0, 0.0], payload={"ts": now - 3600_000}),
+        models.PointStruct(id=2, vector=[1.0, 0.1], payload={"ts": now}),
+        models.PointStruct(id=3, vector=[1.0, 0.2], payload={"msg": "legacy point"}),
+    ])
+    hits = tail_search(client, "logs", [1.0, 0.0], limit=10, since=now - 60_000)
+    assert sorted(hit.id for hit in hits) == [1, 2, 3]
+
+def test_close_in_bulk_mode_restores_indexing():
+    client = make_client()
+    controller = BulkLoadController(client, "logs", enter_rate=10, interval=3600)
+    controller.observe(1000)
+    controller.tick()
+    assert controller.state == "bulk"
+
+    controller.close()
+    assert controller.state == "indexing"
+    assert read_meta(client, META_KIND, "logs")["state"] == "indexing"
+
+    # Следующий процессор без --bulk-load-rate подхватывает незавершенное состояние
+    assert has_bulk_state(client, "logs")
+    recovery = BulkLoadController(client, "logs", interval=3600)
+    recovery.hold = 0
+    recovery.tick()
+    assert recovery.state == "normal" and not has_bulk_state(client, "logs")
+    recovery.close()
+
+def test_saved_settings_keep_zero_indexing_threshold():
+    config = SimpleNamespace(indexing_threshold=0, default_segment_number=4)
+    info = SimpleNamespace(config=SimpleNamespace(optimizer_config=config))
+    controller = BulkLoadController(SimpleNamespace(get_collection=lambda name: info), "logs")
+    assert controller.optimizer_settings() == {"indexing_threshold": 0, "default_segment_number": 4}
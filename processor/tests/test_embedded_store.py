@@ -0,0 +1,97 @@
+from qdrant_client import models
+import embedded_store
+from embedded_store import EmbeddedVectorStore
+
+def make_store(path, points=6):
+    store = EmbeddedVectorStore(str(path))
+    store.create_collection("logs", models.VectorParams(size=2, distance=models.Distance.COSINE))
+    store.upsert("logs", [
+        models.PointStruct(id=i, vector=[1.0, 0.1 * i], payload={"n": i}) for i in range(points)
+    ])
+    return store
+
+def make_logs(path, points=30):
+    store = EmbeddedVectorStore(str(path))
+    store.create_collection("logs", models.VectorParams(size=2, distance=models.Distance.COSINE))
+    store.create_payload_index("logs", "src", models.PayloadSchemaType.KEYWORD)
+    store.create_payload_index("logs", "ts", models.PayloadSchemaType.INTEGER)
+    store.upsert("logs", [
+        models.PointStruct(id=i, vector=[1.0, 0.1 * i], payload={
+            "src": "api" if i % 3 else "db", "ts": 1000 + (i * 7) % 30, "note": f"n{i % 2}",
+        })
+        for i in range(points)
+    ])
+    return store
+
+def ids(points):
+    return [point.id for point in points]
+
+def test_filter_paths(tmp_path):
+    store = make_logs(tmp_path)
+    db = models.FieldCondition(key="src", match=models.MatchValue(value="db"))
+    late = models.FieldCondition(key="ts", range=models.Range(gte=1020))
+    odd = models.FieldCondition(key="note", match=models.MatchValue(value="n1"))  # без индекса
+
+    def matching(query_filter):
+        return sorted(ids(store.scroll("logs", scroll_filter=query_filter, limit=100)[0]))
+
+    assert matching(models.Filter(must=[db])) == list(range(0, 30, 3))
+    assert matching(models.Filter(must=[db, late])) == \
+        [i for i in range(0, 30, 3) if 1000 + (i * 7) % 30 >= 1020]
+    assert matching(models.Filter(should=[db, odd])) == \
+        [i for i in range(30) if i % 3 == 0 or i % 2]
+    assert matching(models.Filter(must_not=[db], must=[odd])) == \
+        [i for i in range(30) if i % 3 and i % 2]
+    assert store.count("logs", count_filter=models.Filter(must=[db])).count == 10
+
+    hits = store.search("logs", [1.0, 0.0], query_filter=models.Filter(must=[db]), limit=3)
+    assert ids(hits) == [0, 3, 6]
+
+    store.delete("logs", models.FilterSelector(filter=models.Filter(must=[db])))
+    assert store.count("logs").count == 20
+    assert matching(models.Filter(must=[db])) == []
+
+def test_order_by_and_facet(tmp_path):
+    store = make_logs(tmp_path)
+    api = models.Filter(must=[models.FieldCondition(key="src", match=models.MatchValue(value="api"))])
+    ts = {i: 1000 + (i * 7) % 30 for i in range(30) if i % 3}
+
+    page, _ = store.scroll("logs", scroll_filter=api, limit=5, order_by="ts")
+    assert [ts[i] for i in ids(page)] == sorted(ts.values())[:5]
+    page, _ = store.scroll("logs", scroll_filter=api, limit=5, order_by=models.OrderBy(
+        key="ts", direction=models.Direction.DESC, start_from=1020))
+    assert [ts[i] for i in ids(page)] == sorted(v for v in ts.values() if v <= 1020)[::-1][:5]
+
+    facet = store.facet("logs", "src", limit=10)
+    assert [(hit.value, hit.count) for hit in facet.hits] == [("api", 20), ("db", 10)]
+    facet = store.facet("logs", "src", facet_filter=models.Filter(must=[
+        models.FieldCondition(key="ts", range=models.Range(lt=1010))]))
+    assert sum(hit.count for hit in facet.hits) == sum(1 for i in range(30) if (i * 7) % 30 < 10)
+
+def test_scroll_pages_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedded_store, "SCROLL_BLOCK", 4)
+    store = make_logs(tmp_path)
+    db = models.Filter(must=[models.FieldCondition(key="src", match=models.MatchValue(value="db"))])
+    seen, offset = [], None
+    while True:
+        page, offset = store.scroll("logs", scroll_filter=db, limit=3, offset=offset)
+        seen += ids(page)
+        if offset is None:
+            break
+    assert seen == list(range(0, 30, 3))
+
+def test_search_with_zero_limit(tmp_path):
+    store = make_store(tmp_path)
+    assert store.search("logs", [1.0, 0.0], limit=0) == []
+
+def test_scroll_resumes_after_deleted_offset(tmp_path):
+    store = make_store(tmp_path)
+    page, offset = store.scroll("logs", limit=2)
+    assert [point.id for point in page] == [0, 1] and offset == 2
+
+    # Точку-offset удалили между страницами: продолжаем со следующей, а не с начала
+    store.delete("logs", models.PointIdsList(points=[2]))
+    page, offset = store.scroll("logs", limit=2, offset=offset)
+    assert [point.id for point in page] == [3, 4] and offset == 5
+
+    assert store.scroll("logs", limit=2, offset=100) == ([], None)
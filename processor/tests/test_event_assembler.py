@@ -0,0 +1,38 @@
+from event_assembler import EventAssembler
+
+def feed_all(assembler, lines, source="stdin"):
+    events = []
+    for line in lines:
+        events += assembler.feed(line, source)
+    return events + assembler.flush_all()
+
+def test_traceback_after_info_starts_new_event():
+    events = feed_all(EventAssembler(), [
+        "INFO request served",
+        "Traceback (most recent call last):",
+        '  File "app.py", line 3, in <module>',
+        "ValueError: bad value",
+    ])
+    assert events[0] == "INFO request served"
+    assert events[1].startswith("Traceback") and events[1].endswith("ValueError: bad value")
+
+def test_chained_traceback_stays_in_one_event():
+    events = feed_all(EventAssembler(), [
+        "ERROR job failed",
+        "Traceback (most recent call last):",
+        '  File "a.py", line 1',
+        "KeyError: 'x'",
+        "During handling of the above exception, another exception occurred:",
+        "Traceback (most recent call last):",
+        '  File "b.py", line 2',
+        "RuntimeError: wrapped",
+    ])
+    assert len(events) == 1 and events[0].endswith("RuntimeError: wrapped")
+
+def test_sources_are_assembled_separately():
+    assembler = EventAssembler()
+    assert assembler.feed("ERROR a failed", "a") == []
+    assert assembler.feed("ERROR b failed", "b") == []
+    assert assembler.feed("\tat com.a.Main.run(Main.java:1)", "a") == []
+    assert sorted(assembler.flush_all()) == ["ERROR a failed\n\tat com.a.Main.run(Main.java:1)",
+                                             "ERROR b failed"]
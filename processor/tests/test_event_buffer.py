@@ -0,0 +1,48 @@
+from event_buffer import EventBuffer, EventRecord, level_priority
+
+def make_record(i, level="INFO"):
+    return EventRecord(f"event {i:03d} " + "x" * 100, level, "app", None,
+                       priority=level_priority(level))
+
+def test_spill_restart_does_not_redeliver(tmp_path):
+    path = str(tmp_path / "buffer.spill")
+    buffer = EventBuffer(max_bytes=2000, overflow="spill", spill_path=path)
+    for i in range(40):
+        buffer.append(make_record(i))
+
+    delivered = []
+    for _ in range(3):
+        delivered += [record.message for record in buffer.take(5)]
+    buffer.close()
+
+    restarted = EventBuffer(max_bytes=2000, overflow="spill", spill_path=path)
+    while len(restarted):
+        delivered += [record.message for record in restarted.take(5)]
+    restarted.close()
+
+    assert sorted(delivered) == sorted(make_record(i).message for i in range(40))
+    assert len(delivered) == len(set(delivered))
+
+def test_priority_records_bypass_spill(tmp_path):
+    buffer = EventBuffer(max_bytes=2000, overflow="spill", spill_path=str(tmp_path / "b.spill"))
+    for i in range(40):
+        buffer.append(make_record(i))
+    assert buffer.spill_pending
+
+    buffer.append(make_record(99, "ERROR"))
+    assert buffer.take(1)[0].message == make_record(99).message
+    buffer.close()
+
+def test_priority_flood_stays_within_budget(tmp_path):
+    buffer = EventBuffer(max_bytes=2000, overflow="spill", spill_path=str(tmp_path / "b.spill"))
+    for i in range(200):
+        buffer.append(make_record(i, "ERROR"))
+        assert buffer.bytes <= buffer.max_bytes
+    assert buffer.spill_pending
+
+    delivered = []
+    while len(buffer):
+        delivered += [record.message for record in buffer.take(5)]
+        assert buffer.bytes <= buffer.max_bytes
+    assert sorted(delivered) == sorted(make_record(i).message for i in range(200))
+    buffer.close()
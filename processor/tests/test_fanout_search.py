@@ -0,0 +1,26 @@
+import asyncio
+from fanout_search import FanoutSearch
+
+def test_aliases_on_embedded_store_match_nothing(tmp_path):
+    async def run():
+        searcher = FanoutSearch(f"embedded:{tmp_path}")
+        try:
+            return await searcher.resolve_aliases(["logs-*"])
+        finally:
+            await searcher.close()
+    assert asyncio.run(run()) == []
+
+def test_slow_projection_load_hits_collection_timeout(tmp_path):
+    async def run():
+        searcher = FanoutSearch(f"embedded:{tmp_path}", timeout=0.05)
+
+        async def slow_project(collection_name, query_vector):
+            await asyncio.sleep(1)
+            return query_vector
+        searcher.project = slow_project
+        try:
+            return await searcher.search_one("logs", [1.0, 0.0], None, 10, None)
+        finally:
+            await searcher.close()
+    results, report = asyncio.run(run())
+    assert results == [] and report["status"] == "timeout"
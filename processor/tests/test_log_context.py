@@ -0,0 +1,29 @@
+import time
+from datetime import datetime, timezone
+from qdrant_client import QdrantClient, models
+from payload_schema import encode_payload, decode_results
+from log_context import fetch_context
+
+def test_context_anchor_uses_raw_ts(monkeypatch):
+    # Второй проход 02:30 при переходе на зимнее время: по ISO строке не восстановить
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    try:
+        anchor = datetime(2025, 10, 26, 1, 30, tzinfo=timezone.utc)
+        client = QdrantClient(":memory:")
+        client.create_collection("logs", models.VectorParams(size=2, distance=models.Distance.COSINE))
+        client.create_payload_index("logs", "ts", models.PayloadSchemaType.INTEGER)
+        client.upsert("logs", [
+            models.PointStruct(id=i, vector=[1.0, 0.1 * i], payload=encode_payload({
+                "message": f"event {i}", "source": "api",
+                "timestamp": anchor.timestamp() + (i - 2) * 60,
+            }))
+            for i in range(5)
+        ])
+        hits = decode_results(client.retrieve("logs", [2], with_payload=True))
+        context = fetch_context(client, "logs", hits, before=5, after=5)[2]
+        assert [point.id for point in context["before"]] == [0, 1]
+        assert [point.id for point in context["after"]] == [3, 4]
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
@@ -0,0 +1,12 @@
+from qdrant_client import QdrantClient, models
+from projection import sample_vectors
+
+def test_sample_covers_whole_collection():
+    client = QdrantClient(":memory:")
+    client.create_collection("logs", models.VectorParams(size=2, distance=models.Distance.EUCLID))
+    client.upsert("logs", [models.PointStruct(id=i, vector=[float(i), 1.0]) for i in range(500)])
+
+    sample = sample_vectors(client, "logs", 50, page=64)
+    ids = sorted(int(vector[0]) for vector in sample)
+    assert len(ids) == len(set(ids)) == 50
+    assert ids[-1] >= 250  # не только первые 50 точек scroll
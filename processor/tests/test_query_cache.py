@@ -0,0 +1,47 @@
+import time
+import numpy as np
+from qdrant_client import QdrantClient, models
+from payload_schema import encode_payload, create_payload_indexes
+from query_cache import QueryResultCache
+from advanced_search import AdvancedLogSearchClient
+
+class FakeModel:
+    def encode(self, texts):
+        return np.ones(4, dtype=np.float32) if isinstance(texts, str) else np.ones((len(texts), 4))
+
+def make_client(points=3):
+    client = QdrantClient(":memory:")
+    client.create_collection("logs", models.VectorParams(size=4, distance=models.Distance.COSINE))
+    create_payload_indexes(client, "logs")
+    now = int(time.time() * 1000)
+    client.upsert("logs", [
+        models.PointStruct(id=i, vector=[1.0, 0.0, 0.0, 0.1 * i],
+                           payload=encode_payload({"message": f"event {i}", "timestamp": now - i}))
+        for i in range(points)
+    ])
+    return client
+
+def test_open_window_invalidated_when_count_is_unchanged():
+    client = make_client()
+    cache = QueryResultCache(client, version_check_interval=0)
+    key = cache.make_key("logs", [1.0, 0.0, 0.0, 0.0], None, 10, 0.3)
+    cache.put(key, ["cached"])
+    assert cache.get(key) == ["cached"]
+
+    # TTL удалил точку, процессор записал новую - points_count прежний
+    client.delete("logs", models.PointIdsList(points=[2]))
+    client.upsert("logs", [models.PointStruct(id=10, vector=[1.0, 0.0, 0.0, 0.0], payload=encode_payload(
+        {"message": "fresh", "timestamp": int(time.time() * 1000) + 1000}))])
+    assert client.count("logs").count == 3
+    assert cache.get(key) is None
+
+def test_closed_window_is_cached_without_version_checks():
+    client = make_client()
+    search = AdvancedLogSearchClient(client=client, model=FakeModel())
+    until = int(time.time() * 1000) - 3600 * 1000
+    search.search_logs("event", "logs", hours=24, until=until, min_score=0)
+    (results, _, version), = search.cache.entries.values()
+    assert version is None
+
+    search.search_logs("event", "logs", hours=24, until=until, min_score=0)
+    assert search.cache.last_hit
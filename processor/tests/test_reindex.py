@@ -0,0 +1,52 @@
+import time
+import numpy as np
+from qdrant_client import QdrantClient, models
+from payload_schema import encode_payload
+from projection import Projection, save_projection, load_projection
+from embedders import collection_model
+from reindex import Reindexer
+
+class FakeModel:
+    def encode(self, texts):
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+def make_source(payloads):
+    client = QdrantClient(":memory:")
+    client.create_collection("app-logs", models.VectorParams(size=8, distance=models.Distance.COSINE))
+    client.upsert("app-logs", [
+        models.PointStruct(id=i, vector=[1.0] * 8, payload=payload)
+        for i, payload in enumerate(payloads)
+    ])
+    return client
+
+def test_reindex_keeps_raw_timestamps(tmp_path, monkeypatch):
+    # 02:30 второго прохода при переходе на зимнее время: через ISO строку сдвигается на час
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    try:
+        payload = encode_payload({"message": "disk full", "source": "api", "level": "ERROR",
+                                  "timestamp": 1761442200000, "expires_at": 1761442200000})
+        client = make_source([payload])
+        Reindexer(client, "app-logs", "app-logs-v2", FakeModel(), workers=1,
+                  checkpoint_path=str(tmp_path / "checkpoint.json")).run()
+        copied = client.retrieve("app-logs-v2", [0], with_payload=True)[0].payload
+        assert copied["ts"] == payload["ts"] == 1761442200000
+        assert copied["exp"] == payload["exp"]
+        assert (copied["src"], copied["lvl"], copied["msg"]) == ("api", payload["lvl"], "disk full")
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+
+def test_meta_follows_alias(tmp_path):
+    client = make_source([encode_payload({"message": "disk full", "timestamp": 1761442200000})])
+    reindexer = Reindexer(client, "app-logs", "app-logs-v2", FakeModel(), workers=1,
+                          checkpoint_path=str(tmp_path / "checkpoint.json"), model_name="other-model")
+    reindexer.run(alias="app-logs-live")
+    save_projection(client, "app-logs-live",
+                    Projection.fit(np.random.default_rng(0).random((16, 8)), 4))
+
+    # Записано через алиас - видно по физическому имени, и наоборот
+    assert load_projection(client, "app-logs-v2").dim == 4
+    assert load_projection(client, "app-logs-live").dim == 4
+    assert collection_model(client, "app-logs-live") == "other-model"
+    assert collection_model(client, "app-logs") == "all-MiniLM-L6-v2"
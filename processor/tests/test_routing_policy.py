@@ -0,0 +1,17 @@
+import random
+import string
+from routing_policy import RoutingPolicy, DEFAULT_POLICY
+
+def test_drop_templates_stay_bounded():
+    policy = RoutingPolicy({**DEFAULT_POLICY, "max_drop_templates": 10})
+    words = random.Random(0)
+    for i in range(1000):
+        noise = "".join(words.choice(string.ascii_lowercase) for _ in range(12))
+        policy.record_drop({"message": f"cache miss for {noise}"}, "api", "DEBUG")
+        policy.record_drop({"message": "health check ok"}, "api", "DEBUG")
+
+    assert len(policy.dropped_by_template) <= 20
+    summary = policy.summary(top=1)
+    assert summary["top_templates"][0]["count"] == 1000
+    counted = sum(entry[0] for entry in policy.dropped_by_template.values())
+    assert counted + summary["other_templates"] == policy.dropped == 2000
@@ -0,0 +1,67 @@
+import time
+import numpy as np
+from routing_policy import RoutingPolicy
+from universal_processor import UniversalLogProcessor
+
+class FakeModel:
+    def encode(self, texts):
+        return np.random.default_rng(len(texts)).random((len(texts), 384), dtype=np.float32)
+
+def make_processor(collection, **kwargs):
+    return UniversalLogProcessor(collection, location=":memory:", model=FakeModel(), **kwargs)
+
+def wait_for_points(processor, expected, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if processor.client.count(processor.collection_name).count >= expected:
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_last_event_flushes_after_priority_timer():
+    # Таймер приоритетного флаша (0.5 с) короче idle timeout сборщика (1 с)
+    processor = make_processor("priority-timer", routing_policy=RoutingPolicy())
+    try:
+        processor.process_line("ERROR disk full on /var\n")
+        processor.process_line("INFO user logged in\n")
+        assert wait_for_points(processor, 2, timeout=5)
+        assert not processor.assembler.pending
+    finally:
+        processor.drain()
+
+def test_last_event_flushes_when_idle_timeout_exceeds_batch_timeout():
+    processor = make_processor("idle-timer", event_idle_timeout=1.0)
+    processor.batch_timeout = 0.3
+    try:
+        processor.process_line("WARN slow request\n")
+        assert wait_for_points(processor, 1, timeout=5)
+    finally:
+        processor.drain()
+
+def test_structured_lines_group_by_source():
+    processor = make_processor("sources")
+    try:
+        processor.process_line('{"source": "api", "level": "ERROR", "message": "boom"}\n')
+        processor.process_line('{"source": "worker", "level": "INFO", "message": "tick"}\n')
+        processor.process_line("    at Worker.run(Worker.java:10)\n")
+        assert set(processor.assembler.pending) == {"api", "worker"}
+        assert len(processor.assembler.pending["worker"].lines) == 2
+    finally:
+        processor.drain()
+
+def test_structured_lines_are_parsed_once():
+    processor = make_processor("parse-once")
+    calls = []
+    parse = processor.parser.parse
+    processor.parser.parse = lambda line: calls.append(line) or parse(line)
+    try:
+        for i in range(3):
+            processor.process_line('{"level": "info", "message": "request %d", "service": "api"}\n' % i)
+        processor.process_line("Traceback (most recent call last):\n")
+        processor.process_line('  File "app.py", line 1, in <module>\n')
+        processor.process_line("ValueError: boom\n")
+    finally:
+        processor.drain()
+    assert len(calls) == 4  # 3 JSON строки + первая строка трейса
+    assert not processor.heads
+    assert processor.client.count("parse-once").count == 4
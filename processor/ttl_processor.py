@@ -2,15 +2,24 @@
 import sys
 import time
 import datetime
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient, models
+import argparse
+from qdrant_client import models
+from storage_backend import create_client, default_location
+from payload_schema import encode_payload, create_payload_indexes
+from processor_metrics import ProcessorMetrics, metrics_port_from_env
+from embedders import embedder_for
+from projection import load_projection
 
 class TTLEnabledLogProcessor:
-    def __init__(self, collection_name="logs-ttl", ttl_days=7):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.client = QdrantClient("localhost")
+    def __init__(self, collection_name="logs-ttl", ttl_days=7, metrics_port=None,
+                 location=None, compress_threshold=None, model=None, embedding_socket=None):
+        self.client = create_client(location)
+        self.model = model or embedder_for(self.client, collection_name, embedding_socket)
         self.collection_name = collection_name
         self.ttl_days = ttl_days
+        self.compress_threshold = compress_threshold
+        self.metrics = ProcessorMetrics(collection_name, metrics_port)
+        self.projection = load_projection(self.client, collection_name)
         
         # Инициализируем коллекцию с TTL
         self.init_collection_with_ttl()
@@ -29,17 +38,13 @@ class TTLEnabledLogProcessor:
             self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
-                    size=384,
+                    size=self.projection.dim if self.projection else 384,
                     distance=models.Distance.COSINE
                 )
             )
             
-            # Создаем индекс для TTL поля
-            self.client.create_payload_index(
-                collection_name=self.collection_name,
-                field_name="expires_at",
-                field_schema=models.PayloadSchemaType.DATETIME
-            )
+            # Создаем индексы для фильтров и TTL поля (exp)
+            create_payload_indexes(self.client, self.collection_name, ttl=True)
             
             print(f"✅ Создана коллекция {self.collection_name} с TTL {self.ttl_days} дней")
     
@@ -53,16 +58,18 @@ class TTLEnabledLogProcessor:
         if not line.strip():
             return
             
-        log_data = {
-            "message": line.strip(),
-            "level": self.detect_log_level(line),
-            "timestamp": datetime.datetime.now().isoformat(),
-            "source": "stdin",
-            "expires_at": self.calculate_expires_at(),  # ✅ TTL поле
-            "ttl_days": self.ttl_days
-        }
+        with self.metrics.time_stage("parse"):
+            log_data = {
+                "message": line.strip(),
+                "level": self.detect_log_level(line),
+                "timestamp": datetime.datetime.now().isoformat(),
+                "source": "stdin",
+                "expires_at": self.calculate_expires_at()  # ✅ TTL поле
+            }
         
         self.batch_buffer.append(log_data)
+        self.metrics.observe_line(log_data["source"], log_data["level"])
+        self.metrics.set_buffer_depth(len(self.batch_buffer))
         
         if len(self.batch_buffer) >= self.batch_size:
             self.flush_batch()
@@ -74,20 +81,25 @@ class TTLEnabledLogProcessor:
             
         try:
             messages = [log["message"] for log in self.batch_buffer]
-            embeddings = self.model.encode(messages)
+            with self.metrics.time_stage("encode"):
+                embeddings = self.model.encode(messages)
+                if self.projection:
+                    embeddings = self.projection.apply(embeddings)
             
             points = []
             for i, (log, embedding) in enumerate(zip(self.batch_buffer, embeddings)):
                 points.append(models.PointStruct(
                     id=int(time.time() * 1000000) + i,
                     vector=embedding.tolist(),
-                    payload=log  # ✅ Включаем expires_at в payload
+                    payload=encode_payload(log, self.compress_threshold)  # ✅ expires_at -> exp
                 ))
             
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
+            with self.metrics.time_stage("upsert"):
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
+            self.metrics.observe_batch(len(points))
             
             print(f"✅ Saved {len(points)} logs with TTL {self.ttl_days} days")
             
@@ -95,6 +107,7 @@ class TTLEnabledLogProcessor:
             print(f"❌ Error: {e}", file=sys.stderr)
         finally:
             self.batch_buffer.clear()
+            self.metrics.set_buffer_depth(0)
     
     def detect_log_level(self, message):
         """Определение уровня лога"""
@@ -123,9 +136,24 @@ class TTLEnabledLogProcessor:
 
 if __name__ == "__main__":
     # Можно указать TTL через аргументы
-    import sys
-    ttl_days = int(sys.argv[1]) if len(sys.argv) > 1 else 7
-    collection_name = sys.argv[2] if len(sys.argv) > 2 else f"logs-ttl-{ttl_days}d"
+    parser = argparse.ArgumentParser(description="TTL Log Processor")
+    parser.add_argument("ttl_days", nargs="?", type=int, default=7,
+                       help="Время жизни логов в днях")
+    parser.add_argument("collection", nargs="?", help="Имя коллекции")
+    parser.add_argument("--metrics-port", type=int, default=metrics_port_from_env(),
+                       help="Порт для /metrics (по умолчанию $METRICS_PORT)")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL, :memory: или embedded:/path (по умолчанию $QDRANT_HOST)")
+    parser.add_argument("--compress-threshold", type=int,
+                       help="Сжимать zstd сообщения длиннее N байт")
+    parser.add_argument("--embedding-socket",
+                       help="Sidecar эмбеддингов (по умолчанию $EMBEDDING_SOCKET, иначе своя модель)")
+    args = parser.parse_args()
+    collection_name = args.collection or f"logs-ttl-{args.ttl_days}d"
     
-    processor = TTLEnabledLogProcessor(collection_name, ttl_days)
+    processor = TTLEnabledLogProcessor(collection_name, args.ttl_days,
+                                       metrics_port=args.metrics_port,
+                                       location=args.location,
+                                       compress_threshold=args.compress_threshold,
+                                       embedding_socket=args.embedding_socket)
     processor.run()
@@ -1,31 +1,80 @@
 #!/usr/bin/env python3
 import sys
 import time
-import re
-from datetime import datetime
-from threading import Timer
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient, models
+import argparse
+from threading import Timer, RLock
+from qdrant_client import models
+from storage_backend import create_client, default_location
+from payload_schema import encode_payload, create_payload_indexes
+from processor_metrics import ProcessorMetrics, metrics_port_from_env
+from log_parser import LogParser
+from event_assembler import EventAssembler, condense_event
+from routing_policy import RoutingPolicy
+from embedders import embedder_for
+from projection import load_projection
+from standing_queries import StandingQueries
+from bulk_load import BulkLoadController, has_bulk_state
+from event_buffer import EventBuffer, EventRecord, OVERFLOW_MODES, level_priority
 
 class UniversalLogProcessor:
-    def __init__(self, collection_name="universal-logs"):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.client = QdrantClient("localhost")
+    def __init__(self, collection_name="universal-logs", metrics_port=None,
+                 location=None, model=None, compress_threshold=None,
+                 multiline=True, event_idle_timeout=1.0, routing_policy=None,
+                 buffer_bytes=64 * 1024 * 1024, overflow="block", spill_path=None,
+                 standing_queries=None, bulk_load_rate=None, default_source="stdin",
+                 embedding_socket=None):
+        self.client = create_client(location)
+        # Модель коллекции из semlog-meta: после reindex.py --model запись идет ею же
+        self.model = model or embedder_for(self.client, collection_name, embedding_socket)
         self.collection_name = collection_name
+        self.compress_threshold = compress_threshold  # байты; None - без сжатия
+        self.metrics = ProcessorMetrics(collection_name, metrics_port)
+        self.parser = LogParser(default_source)
+        
+        # PCA проекция коллекции (projection.py fit-projection) - None для полных 384
+        self.projection = load_projection(self.client, collection_name)
+        self.vector_size = self.projection.dim if self.projection else 384
         
         # Инициализируем коллекцию если её нет
         self.init_collection()
         
+        # Bulk-load: при скорости записи выше порога индексация откладывается.
+        # Без --bulk-load-rate контроллер нужен, чтобы завершить bulk-load прошлого запуска
+        self.bulk_load = None
+        if bulk_load_rate or has_bulk_state(self.client, collection_name):
+            self.bulk_load = BulkLoadController(self.client, collection_name, bulk_load_rate)
+        
+        # Склейка многострочных событий (stack traces)
+        self.assembler = EventAssembler(idle_timeout=event_idle_timeout) if multiline else None
+        self.last_source = default_source  # источник, который продолжают plain строки
+        self.heads = {}  # первая строка незавершенного события -> результат парсера
+        
+        # Политика сэмплирования/приоритетов (None - все события на эмбеддинг)
+        self.policy = routing_policy
+        
+        # Постоянные запросы: каждый записанный батч проверяется на совпадения
+        self.standing_queries = standing_queries
+        self.priority_pending = False  # в буфере есть ERROR/WARN - флашим быстрее
+        
         # Конфигурация батчинга
         self.batch_size = 15
         self.batch_timeout = 3  # секунды
-        self.batch_buffer = []
+        # Бюджет памяти буфера и поведение при переполнении (см. event_buffer.py)
+        self.buffer = EventBuffer(buffer_bytes, overflow, spill_path)
+        self.retry_delay = 0.0  # backoff после неудачного флаша
+        self.retry_at = 0.0
+        self.flush_failures = 0
+        self.lock = RLock()  # таймер флашит из своего потока
         self.flush_timer = None
         self.reset_timer()
         
         # Счетчики для мониторинга
         self.processed_count = 0
         self.start_time = time.time()
+        
+        # Загрузка стадии embed: доля времени в flush_batch (EWMA)
+        self.utilization = 0.0
+        self.last_flush_end = time.monotonic()
     
     def init_collection(self):
         """Создаем коллекцию если не существует"""
@@ -36,108 +85,62 @@ class UniversalLogProcessor:
             self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
-                    size=384,  # all-MiniLM-L6-v2 dimension
+                    size=self.vector_size,  # all-MiniLM-L6-v2: 384, меньше с проекцией
                     distance=models.Distance.COSINE
                 )
             )
+            
+            # Индексы для фильтров поиска
+            create_payload_indexes(self.client, self.collection_name)
             print(f"✅ Created collection: {self.collection_name}")
     
     def reset_timer(self):
         """Сбрасываем таймер для принудительной отправки батча"""
         if self.flush_timer:
             self.flush_timer.cancel()
-        self.flush_timer = Timer(self.batch_timeout, self.flush_batch)
+        timeout = self.batch_timeout
+        if self.priority_pending:
+            timeout = min(timeout, self.policy.priority_flush_timeout)
+        self.flush_timer = Timer(timeout, self.on_timer)
         self.flush_timer.start()
     
-    def extract_log_metadata(self, line):
-        """Извлекаем метаданные из строки лога"""
-        # Паттерны для различных форматов логов
-        patterns = [
-            # JSON логи: {"timestamp": "...", "level": "ERROR", "message": "..."}
-            (r'^{.*"level"\s*:\s*"(\w+)".*"message"\s*:\s*"([^"]+)".*}$', self.parse_json_log),
-            
-            # Стандартные логи: [INFO] 2024-01-15 message
-            (r'^\[(\w+)\]\s+(\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2})\s+(.+)$', self.parse_bracket_log),
-            
-            # Nginx/Apache: 192.168.1.1 - - [15/Jan/2024:10:30:00] "GET /"
-            (r'^(\d+\.\d+\.\d+\.\d+).*\[(.+?)\].*"(GET|POST|PUT|DELETE)', self.parse_web_log),
-        ]
-        
-        for pattern, parser in patterns:
-            match = re.match(pattern, line.strip())
-            if match:
-                return parser(match, line)
-        
-        # Fallback: простой текст
-        return {
-            "message": line.strip(),
-            "level": self.detect_log_level(line),
-            "timestamp": datetime.now().isoformat(),
-            "source": "stdin",
-            "format": "plain"
-        }
-    
-    def parse_json_log(self, match, original_line):
-        """Парсим JSON логи"""
-        try:
-            data = json.loads(original_line)
-            return {
-                "message": data.get("message", original_line),
-                "level": data.get("level", "INFO"),
-                "timestamp": data.get("timestamp", datetime.now().isoformat()),
-                "source": data.get("source", "unknown"),
-                "format": "json"
-            }
-        except:
-            return self.fallback_parse(original_line)
+    def on_timer(self):
+        """По таймеру: завершаем "затихшие" события и отправляем батч"""
+        with self.lock:
+            if self.assembler:
+                for event in self.assembler.flush_idle():
+                    self.process_event(event)
+            self.flush_pending()
+            if len(self.buffer) or (self.assembler and self.assembler.pending):
+                # Флаш не удался или событие еще не "затихло" (таймер короче
+                # idle timeout) - повторим по таймеру, даже если вход затих
+                self.reset_timer()
     
-    def parse_bracket_log(self, match, original_line):
-        """Парсим логи в формате [LEVEL] timestamp message"""
-        return {
-            "message": match.group(3),
-            "level": match.group(1),
-            "timestamp": match.group(2),
-            "source": "application", 
-            "format": "bracketed"
-        }
-    
-    def parse_web_log(self, match, original_line):
-        """Парсим веб-логи"""
-        return {
-            "message": original_line.strip(),
-            "level": "INFO",  # web logs обычно INFO
-            "timestamp": match.group(2),
-            "source": "web_server",
-            "client_ip": match.group(1),
-            "format": "web"
-        }
+    def drain(self):
+        """Завершаем все незаконченные события и отправляем остаток буфера"""
+        with self.lock:
+            if self.flush_timer:
+                self.flush_timer.cancel()
+            if self.assembler:
+                for event in self.assembler.flush_all():
+                    self.process_event(event)
+            if len(self.buffer):
+                print(f"💾 Flushing {len(self.buffer)} remaining logs...", 
+                      file=sys.stderr)
+                self.retry_at = 0.0
+                self.flush_pending()
+            if len(self.buffer):
+                kept = "kept on disk" if self.buffer.overflow == "spill" else "lost"
+                print(f"⚠️  {len(self.buffer)} logs not saved ({kept})", file=sys.stderr)
+            self.buffer.close()
     
-    def fallback_parse(self, line):
-        """Fallback парсинг для неизвестных форматов"""
-        return {
-            "message": line.strip(),
-            "level": self.detect_log_level(line),
-            "timestamp": datetime.now().isoformat(), 
-            "source": "unknown",
-            "format": "plain"
-        }
+    def extract_log_metadata(self, line):
+        """Извлекаем метаданные из строки лога"""
+        return self.parser.parse(line)
     
     def detect_log_level(self, message):
         """Авто-определение уровня лога"""
-        message_lower = message.lower()
-        
-        error_keywords = ['error', 'exception', 'failed', 'fatal', 'crash', 'panic']
-        warn_keywords = ['warn', 'warning', 'deprecated', 'slow', 'timeout']
-        debug_keywords = ['debug', 'trace', 'verbose']
-        
-        if any(word in message_lower for word in error_keywords):
-            return "ERROR"
-        elif any(word in message_lower for word in warn_keywords):
-            return "WARN" 
-        elif any(word in message_lower for word in debug_keywords):
-            return "DEBUG"
-        else:
-            return "INFO"
+        return self.parser.detect_log_level(message)
     
     def process_line(self, line):
         """Обработка одной строки из stdin"""
@@ -145,16 +148,16 @@ class UniversalLogProcessor:
             return
             
         try:
-            # Извлекаем метаданные
-            log_data = self.extract_log_metadata(line)
-            self.batch_buffer.append(log_data)
-            
-            # Обновляем таймер
-            self.reset_timer()
-            
-            # Проверяем размер батча
-            if len(self.batch_buffer) >= self.batch_size:
-                self.flush_batch()
+            with self.lock:
+                # Строки продолжения (stack trace) копятся в assembler
+                line = line.rstrip("\n")
+                events = self.assembler.feed(line, self.event_source(line)) \
+                    if self.assembler else [line]
+                for event in events:
+                    self.process_event(event)
+                
+                # Обновляем таймер
+                self.reset_timer()
                 
             self.processed_count += 1
             
@@ -162,54 +165,165 @@ class UniversalLogProcessor:
             if self.processed_count % 100 == 0:
                 elapsed = time.time() - self.start_time
                 rate = self.processed_count / elapsed
-                print(f"📊 Processed {self.processed_count} logs ({rate:.1f}/sec)", 
+                dropped = f", dropped {self.policy.dropped}" if self.policy else ""
+                buffer = self.buffer.stats()
+                print(f"📊 Processed {self.processed_count} logs ({rate:.1f}/sec{dropped}, "
+                      f"buffer {buffer['events']} events / {buffer['bytes'] / 1048576:.1f} MB, "
+                      f"overflow dropped {buffer['dropped']}, spilled {buffer['spilled']})", 
                       file=sys.stderr)
+                self.metrics.sample_queue_depth()
                       
         except Exception as e:
+            self.metrics.observe_error("process")
             print(f"❌ Error processing line: {e}", file=sys.stderr)
     
+    def event_source(self, line):
+        """Источник для сборки событий: структурированные строки (JSON, [..], web)
+        задают свой источник, plain строки и кадры стека продолжают последний"""
+        first = line[:1]
+        if first and (first in "{[" or first.isdigit()):
+            with self.metrics.time_stage("parse"):
+                log = self.parser.parse(line)
+            if log["format"] != "plain":
+                self.last_source = log["source"]
+            # Такая строка не бывает продолжением - она начинает событие,
+            # и process_event берет готовый разбор вместо повторного
+            self.heads[line] = log
+        return self.last_source
+    
+    def process_event(self, event):
+        """Разбор завершенного события: одна строка или склеенный stack trace"""
+        first_line, _, rest = event.partition("\n")
+        
+        # Извлекаем метаданные по первой строке события
+        log_data = self.heads.pop(first_line, None)
+        if log_data is None:
+            with self.metrics.time_stage("parse"):
+                log_data = self.extract_log_metadata(first_line)
+        
+        line_count = 1
+        if rest:
+            line_count = event.count("\n") + 1
+            log_data["message"] = log_data["message"] + "\n" + rest
+            log_data["lines"] = line_count
+            # Эмбеддинг по сжатой голове события, в payload - полный трейс
+            log_data["embed_text"] = condense_event(log_data["message"])
+            if log_data["format"] == "plain":
+                log_data["level"] = self.detect_log_level(event)
+        
+        if self.policy:
+            if not self.policy.decide(log_data):
+                self.metrics.observe_drop(log_data["source"], log_data["level"], line_count)
+                return
+            if self.policy.is_priority(log_data):
+                self.priority_pending = True
+        
+        if self.policy:
+            priority = self.policy.priority(log_data["level"], log_data["source"])
+        else:
+            priority = level_priority(log_data["level"])
+        evicted = self.buffer.append(EventRecord.from_log(log_data, priority))
+        self.metrics.observe_line(log_data["source"], log_data["level"], line_count)
+        for record in evicted:
+            self.metrics.observe_drop(record.source, record.level, record.lines)
+        self.metrics.set_buffer_depth(len(self.buffer), self.buffer.bytes)
+        
+        # Проверяем размер батча
+        if len(self.buffer) >= self.batch_size:
+            self.flush_pending(full_only=True)
+        
+        # block: не читаем вход, пока флаш не вернет буфер в бюджет
+        if self.buffer.overflow == "block":
+            while self.buffer.over_budget:
+                if not self.flush_batch():
+                    time.sleep(max(self.retry_at - time.monotonic(), 0.01))
+    
+    def flush_pending(self, full_only=False):
+        """Флашим батчи, пока буфер не опустеет (или до первой ошибки)"""
+        while len(self.buffer) and (not full_only or len(self.buffer) >= self.batch_size):
+            if not self.flush_batch():
+                break
+    
     def flush_batch(self):
-        """Отправка накопленного батча в Qdrant"""
-        if not self.batch_buffer:
-            return
-            
+        """Отправка батча в Qdrant; False - не удалось, события остались в буфере"""
+        if not len(self.buffer) or time.monotonic() < self.retry_at:
+            return False
+        
+        flush_start = time.monotonic()
+        records = self.buffer.take(self.batch_size)
         try:
             # Создаем эмбеддинги для всех сообщений в батче
-            messages = [log["message"] for log in self.batch_buffer]
-            embeddings = self.model.encode(messages)
+            messages = [record.text for record in records]
+            with self.metrics.time_stage("encode"):
+                raw_embeddings = self.model.encode(messages)
+                embeddings = raw_embeddings
+                if self.projection:
+                    embeddings = self.projection.apply(raw_embeddings)
             
             # Подготавливаем точки для Qdrant
             points = []
-            for i, (log, embedding) in enumerate(zip(self.batch_buffer, embeddings)):
+            for i, (record, embedding) in enumerate(zip(records, embeddings)):
                 point_id = int(time.time() * 1000000) + i  # microsecond precision
                 
                 points.append(models.PointStruct(
                     id=point_id,
                     vector=embedding.tolist(),
-                    payload={
-                        "message": log["message"],
-                        "level": log["level"],
-                        "timestamp": log["timestamp"],
-                        "source": log["source"],
-                        "format": log["format"],
-                        "processed_at": datetime.now().isoformat(),
-                        "batch_size": len(self.batch_buffer)
-                    }
+                    payload=encode_payload(record.to_log(), self.compress_threshold)
                 ))
             
             # Сохраняем в Qdrant
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
+            with self.metrics.time_stage("upsert"):
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
+            self.metrics.observe_batch(len(points))
+            if self.bulk_load:
+                self.bulk_load.observe(len(points))
             
             print(f"✅ Saved {len(points)} logs to {self.collection_name}", 
                   file=sys.stderr)
+            self.retry_delay = 0.0
+            self.check_standing_queries(records, raw_embeddings)
+            return True
             
         except Exception as e:
-            print(f"❌ Batch flush error: {e}", file=sys.stderr)
+            # Батч возвращается в буфер, повтор - с экспоненциальной паузой
+            self.buffer.requeue(records)
+            self.flush_failures += 1
+            self.retry_delay = min(max(self.retry_delay * 2, 0.5), 30.0)
+            self.retry_at = time.monotonic() + self.retry_delay
+            print(f"❌ Batch flush error: {e} (retry in {self.retry_delay:.1f}s, "
+                  f"{len(self.buffer)} logs buffered)", file=sys.stderr)
+            return False
         finally:
-            self.batch_buffer.clear()
+            if not self.buffer.count:
+                self.priority_pending = False
+            self.metrics.set_buffer_depth(len(self.buffer), self.buffer.bytes)
+            self.update_utilization(flush_start)
+    
+    def check_standing_queries(self, records, embeddings):
+        """Одно умножение матриц на батч; ошибка алертинга не откатывает запись"""
+        if not self.standing_queries:
+            return
+        try:
+            with self.metrics.time_stage("alert"):
+                alerts = self.standing_queries.score(records, embeddings, self.collection_name)
+            for alert in alerts:
+                self.metrics.observe_alert(alert["query"])
+        except Exception as e:
+            print(f"❌ Standing query error: {e}", file=sys.stderr)
+    
+    def update_utilization(self, flush_start):
+        """Доля времени в encode/upsert; около 1 - вход упирается в эмбеддинг"""
+        now = time.monotonic()
+        wall = max(now - self.last_flush_end, 1e-6)
+        busy = min((now - flush_start) / wall, 1.0)
+        self.utilization = 0.3 * busy + 0.7 * self.utilization
+        self.last_flush_end = now
+        self.metrics.set_utilization(self.utilization)
+        if self.policy:
+            self.policy.update_pressure(self.utilization)
     
     def run(self):
         """Основной цикл обработки stdin"""
@@ -230,21 +344,90 @@ class UniversalLogProcessor:
             print(f"💥 Fatal error: {e}", file=sys.stderr)
         finally:
             # Гарантированно сохраняем оставшиеся логи
-            if self.flush_timer:
-                self.flush_timer.cancel()
-            if self.batch_buffer:
-                print(f"💾 Flushing {len(self.batch_buffer)} remaining logs...", 
-                      file=sys.stderr)
-                self.flush_batch()
+            self.drain()
             
             elapsed = time.time() - self.start_time
             print(f"👋 Processor stopped. Stats:", file=sys.stderr)
             print(f"   Total processed: {self.processed_count} logs", file=sys.stderr)
             print(f"   Duration: {elapsed:.1f} seconds", file=sys.stderr)
             print(f"   Rate: {self.processed_count/elapsed:.1f} logs/sec", file=sys.stderr)
+            buffer = self.buffer.stats()
+            print(f"   Buffer peak: {buffer['peak_bytes'] / 1048576:.1f} MB "
+                  f"of {buffer['max_bytes'] / 1048576:.0f} MB ({self.buffer.overflow}), "
+                  f"overflow dropped: {buffer['dropped']}, spilled: {buffer['spilled']}, "
+                  f"flush failures: {self.flush_failures}", file=sys.stderr)
+            if self.bulk_load:
+                bulk = self.bulk_load.stats()
+                print(f"   Bulk-load: {bulk['state']}, switches: {bulk['switches']}",
+                      file=sys.stderr)
+                self.bulk_load.close()
+            if self.standing_queries:
+                for name, counts in self.standing_queries.summary().items():
+                    print(f"   Standing query {name}: {counts['matched']} matches "
+                          f"({counts['suppressed']} within cooldown)", file=sys.stderr)
+                self.standing_queries.close()
+            if self.policy:
+                summary = self.policy.summary()
+                print(f"   Embedded: {summary['kept']} events, dropped: {summary['dropped']}",
+                      file=sys.stderr)
+                for source, count in summary["by_source"].items():
+                    print(f"   Dropped {source}: {count}", file=sys.stderr)
+                for entry in summary["top_templates"]:
+                    print(f"   Dropped x{entry['count']} [{entry['level']}] {entry['template']}",
+                          file=sys.stderr)
+                if summary["other_templates"]:
+                    print(f"   Dropped x{summary['other_templates']} in rare templates",
+                          file=sys.stderr)
 
 if __name__ == "__main__":
     # Можно указать имя коллекции через аргумент
-    collection_name = sys.argv[1] if len(sys.argv) > 1 else "universal-logs"
-    processor = UniversalLogProcessor(collection_name)
+    parser = argparse.ArgumentParser(description="Universal Log Processor")
+    parser.add_argument("collection", nargs="?", default="universal-logs",
+                       help="Имя коллекции")
+    parser.add_argument("--metrics-port", type=int, default=metrics_port_from_env(),
+                       help="Порт для /metrics (по умолчанию $METRICS_PORT)")
+    parser.add_argument("--location", default=default_location(),
+                       help="Qdrant host/URL, :memory: или embedded:/path (по умолчанию $QDRANT_HOST)")
+    parser.add_argument("--compress-threshold", type=int,
+                       help="Сжимать zstd сообщения длиннее N байт")
+    parser.add_argument("--source", default="stdin",
+                       help="Источник для строк без своего (plain логи, stack traces)")
+    parser.add_argument("--no-multiline", action="store_true",
+                       help="Не склеивать stack traces в одно событие")
+    parser.add_argument("--event-idle-timeout", type=float, default=1.0,
+                       help="Через сколько секунд тишины событие считается завершенным")
+    parser.add_argument("--routing-policy",
+                       help="YAML политика сэмплирования (см. routing_policy.yaml)")
+    parser.add_argument("--embedding-socket",
+                       help="Sidecar эмбеддингов (по умолчанию $EMBEDDING_SOCKET, иначе своя модель)")
+    parser.add_argument("--standing-queries",
+                       help="YAML постоянных запросов для алертов (см. standing_queries.yaml)")
+    parser.add_argument("--buffer-mb", type=float, default=64,
+                       help="Бюджет памяти буфера событий, MB")
+    parser.add_argument("--overflow", choices=OVERFLOW_MODES, default="block",
+                       help="При переполнении: block - не читать вход, spill - на диск, "
+                            "drop - вытеснять низкий приоритет")
+    parser.add_argument("--spill-path",
+                       help="Файл для --overflow spill (по умолчанию /tmp/semlog-<collection>.spill)")
+    parser.add_argument("--bulk-load-rate", type=float,
+                       help="Откладывать индексацию, пока запись быстрее N точек/сек")
+    args = parser.parse_args()
+    
+    policy = RoutingPolicy.from_yaml(args.routing_policy) if args.routing_policy else None
+    processor = UniversalLogProcessor(args.collection, metrics_port=args.metrics_port,
+                                      location=args.location,
+                                      embedding_socket=args.embedding_socket,
+                                      compress_threshold=args.compress_threshold,
+                                      multiline=not args.no_multiline,
+                                      event_idle_timeout=args.event_idle_timeout,
+                                      routing_policy=policy,
+                                      buffer_bytes=int(args.buffer_mb * 1024 * 1024),
+                                      overflow=args.overflow,
+                                      spill_path=args.spill_path or f"/tmp/semlog-{args.collection}.spill",
+                                      bulk_load_rate=args.bulk_load_rate,
+                                      default_source=args.source)
+    # Постоянные запросы кодируются той же моделью, что и события коллекции
+    if args.standing_queries:
+        processor.standing_queries = StandingQueries.from_yaml(args.standing_queries,
+                                                               processor.model)
     processor.run()